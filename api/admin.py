@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Product, AddCustomers, AddVendor, BillSettings, DataBackup
+from .models import User, Product, AddCustomers, AddVendor, BillSettings, DataBackup, HsnCode
 
 # Unregister the default User admin if it's registered
 # admin.site.unregister(User)
@@ -63,4 +63,11 @@ class DataBackupAdmin(admin.ModelAdmin):
     list_filter = ('backup_type', 'is_active')
     search_fields = ('user__username', 'user__email')
     readonly_fields = ('created_at',)
-    date_hierarchy = 'created_at'
\ No newline at end of file
+    date_hierarchy = 'created_at'
+
+@admin.register(HsnCode)
+class HsnCodeAdmin(admin.ModelAdmin):
+    list_display = ('code', 'kind', 'tax_rate', 'description', 'updated_at')
+    list_filter = ('kind', 'tax_rate')
+    search_fields = ('code', 'description')
+    readonly_fields = ('updated_at',)
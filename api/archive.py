@@ -0,0 +1,52 @@
+from django.db import transaction
+
+from .models import Sale, SaleArchive, SaleItem, SaleItemArchive, SaleSyncKey
+from .routers import shop_db
+
+
+# Sales older than this move to the archive tables. Must stay above the
+# forecast history (api.forecast.HISTORY_DAYS), which reads recent sales only.
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 1000
+
+# Sale actions that may be answered from the archive.
+ARCHIVE_READ_ACTIONS = ('retrieve', 'sale_pdf', 'receipt')
+
+
+def _copy(instance, model):
+    return model(**{field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields})
+
+
+def archive_sales(before, user=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move sales dated before ``before`` and their items into SaleArchive /
+    SaleItemArchive, oldest first, one transaction per batch. Ids are kept,
+    so invoice links and receipts keep working. Returns the sales moved.
+    """
+    sales = Sale.objects.filter(sale_date__lt=before)
+    if user is not None:
+        sales = sales.filter(sold_by=user)
+
+    alias = shop_db()
+    moved = 0
+    while True:
+        with transaction.atomic(using=alias):
+            batch = list(sales.order_by('sale_date', 'id')[:batch_size])
+            if not batch:
+                return moved
+            ids = [sale.pk for sale in batch]
+            SaleArchive.objects.bulk_create([_copy(sale, SaleArchive) for sale in batch])
+            SaleItemArchive.objects.bulk_create([_copy(item, SaleItemArchive) for item in SaleItem.objects.filter(sale_id__in=ids)])
+            # Raw deletes: the sale_deleted receiver must not take archived
+            # sales out of their customers' stats.
+            SaleSyncKey.objects.filter(sale_id__in=ids)._raw_delete(alias)
+            SaleItem.objects.filter(sale_id__in=ids)._raw_delete(alias)
+            Sale.objects.filter(pk__in=ids)._raw_delete(alias)
+        moved += len(batch)
+
+
+def archived_sale(user, pk):
+    return (
+        SaleArchive.objects.filter(sold_by=user, pk=pk)
+        .select_related('sold_by').prefetch_related('items__product').first()
+    )
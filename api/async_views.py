@@ -0,0 +1,209 @@
+"""
+Async read endpoints for the hottest lookups, served natively under ASGI
+(see gunicorn.conf.py). They use the async ORM directly instead of DRF, so
+a request waiting on the database does not hold a worker thread.
+"""
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import APIException
+
+from .authentication import AsyncShopJWTAuthentication
+from .events import await_publish, broker, sales_channel
+from .live import LIVE_SALE_FIELDS, SALE_TOTALS, format_totals, sales_after, todays_sales
+from .models import AddCustomers, LowStockEntry, Product, Sale, SaleArchive, SaleItem, SaleItemArchive
+from .reports import _day_start
+from .routers import read_from_replica, shop_db, use_database
+
+
+PRODUCT_LOOKUP_FIELDS = [
+    'id', 'product_code', 'product_name', 'category', 'unit', 'selling_price', 'stock_quantity',
+    'min_stock_level', 'barcode', 'hsn_code', 'tax_rate', 'discount', 'expiry_date', 'is_active',
+]
+
+# Same shape as SaleSerializer / SaleItemSerializer.
+SALE_FIELDS = [
+    'id', 'invoice_number', 'sale_date', 'customer_name', 'customer_phone', 'customer_address',
+    'customer_gst', 'customer_state', 'customer_state_code', 'discount', 'tax_amount', 'taxable_amount',
+    'total_amount', 'cgst_amount', 'sgst_amount', 'igst_amount', 'tax_breakdown', 'payment_method',
+    'notes', 'include_gst', 'customer',
+]
+SALE_ITEM_FIELDS = [
+    'id', 'product', 'quantity', 'sale_price', 'tax_rate', 'tax_amount', 'taxable_amount', 'total_amount',
+    'cgst_amount', 'sgst_amount', 'igst_amount',
+]
+
+DASHBOARD_RECENT_SALES = 5
+EXPIRING_SOON_DAYS = 7
+SALES_FEED_KEEPALIVE = 15
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder, safe=False)
+
+
+def shop_endpoint(replica=True):
+    """
+    Authenticate an async view with the shop's JWT and route it to the
+    shop's database; ``replica`` serves it from the read replica on the same
+    terms as ReplicaReadMixin.
+    """
+    def decorator(view):
+        @require_safe
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                result = await AsyncShopJWTAuthentication().aauthenticate(request)
+            except APIException as exc:
+                # Same body as DRF's exception handler.
+                data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+                return _json(data, status=exc.status_code)
+            if result is None:
+                return _json({'detail': 'Authentication credentials were not provided.'}, status=401)
+            request.user, request.auth, wrote_recently = result
+            if replica and not wrote_recently:
+                read_from_replica()
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@shop_endpoint()
+async def product_lookup(request):
+    """A barcode scan or typed product code at the counter."""
+    barcode = request.GET.get('barcode')
+    code = request.GET.get('code')
+    if not barcode and not code:
+        return _json({'error': 'barcode or code is required'}, status=400)
+
+    products = Product.objects.filter(created_by=request.user)
+    products = products.filter(barcode=barcode) if barcode else products.filter(product_code=code)
+    product = await products.order_by('-is_active', 'id').values(*PRODUCT_LOOKUP_FIELDS).afirst()
+    if product is None:
+        return _json({'error': 'Product not found'}, status=404)
+    return _json(product)
+
+
+def _sale_item(row):
+    # SaleItemSerializer names the product as it is now, not as sold.
+    row['product_id'] = row['product']
+    row['product_name'] = row.pop('product__product_name')
+    return row
+
+
+@shop_endpoint()
+async def sale_detail(request, pk):
+    # Archived sales stay readable here too, as in SaleViewSet.
+    for sale_model, item_model in ((Sale, SaleItem), (SaleArchive, SaleItemArchive)):
+        sale = await sale_model.objects.filter(sold_by=request.user, pk=pk).values(*SALE_FIELDS).afirst()
+        if sale is not None:
+            break
+    else:
+        return _json({'error': 'Sale not found'}, status=404)
+
+    sale['sold_by'] = request.user.email
+    sale['items'] = [
+        _sale_item(item)
+        async for item in item_model.objects.filter(sale_id=pk).order_by('id')
+        .values(*SALE_ITEM_FIELDS, 'product__product_name')
+    ]
+    return _json(sale)
+
+
+@shop_endpoint(replica=False)
+async def subscription_status(request):
+    # Marks a lapsed subscription expired, like CheckSubscriptionStatusAPIView.
+    user = request.user
+    latest = await user.subscriptions.select_related('plan').order_by('-end_date').afirst()
+    if latest is None:
+        return _json({'plan_status': 'inactive'})
+
+    if timezone.now() > latest.end_date and latest.status != 'expired':
+        latest.status = 'expired'
+        await latest.asave(update_fields=['status'])
+        user.plan_status = 'expired'
+        await user.asave(update_fields=['plan_status'])
+
+    return _json({
+        'plan_status': user.plan_status,
+        'plan': latest.plan.name if latest.plan else None,
+        'start_date': latest.start_date,
+        'end_date': latest.end_date,
+        'status': latest.status,
+    })
+
+
+@shop_endpoint()
+async def dashboard(request):
+    user = request.user
+    today = timezone.localdate()
+    sales = Sale.objects.filter(sold_by=user)
+
+    today_sales = await todays_sales(user).aaggregate(**SALE_TOTALS)
+    month_sales = await sales.filter(sale_date__gte=_day_start(today.replace(day=1))).aaggregate(**SALE_TOTALS)
+    recent = [
+        sale async for sale in sales.order_by('-sale_date')
+        .values('id', 'invoice_number', 'customer_name', 'total_amount', 'sale_date')[:DASHBOARD_RECENT_SALES]
+    ]
+    return _json({
+        'today': format_totals(today_sales),
+        'month': format_totals(month_sales),
+        'low_stock': await LowStockEntry.objects.filter(user=user).acount(),
+        'expiring_soon': await Product.objects.filter(
+            created_by=user, is_active=True,
+            expiry_date__range=(today, today + timedelta(days=EXPIRING_SOON_DAYS)),
+        ).acount(),
+        'customers': await AddCustomers.objects.filter(added_by=user).acount(),
+        'recent_sales': recent,
+    })
+
+
+@shop_endpoint(replica=False)
+async def sales_feed(request):
+    """
+    Server-sent events for an owner dashboard: today's totals on connect,
+    then each batch of new sales with the updated totals. Sales are read
+    from the database, woken early by api.live.announce_sales in this
+    process. Serve under ASGI, where an idle stream costs no thread.
+    """
+    user = request.user
+    # The body runs after ShopDatabaseMiddleware has reset the shop's database.
+    alias = shop_db()
+
+    async def stream():
+        channel = sales_channel(user.pk)
+        subscriber = broker.subscribe_async(channel)
+        try:
+            yield 'retry: 3000\n\n'
+            with use_database(alias):
+                last_id = await sales_after(user).values_list('id', flat=True).alast() or 0
+                totals = format_totals(await todays_sales(user).aaggregate(**SALE_TOTALS))
+            yield f"event: totals\ndata: {DjangoJSONEncoder().encode(totals)}\n\n"
+            sent_at = time.monotonic()
+            while True:
+                await await_publish(subscriber)
+                with use_database(alias):
+                    sales = [sale async for sale in sales_after(user, last_id).values(*LIVE_SALE_FIELDS)]
+                    if sales:
+                        totals = format_totals(await todays_sales(user).aaggregate(**SALE_TOTALS))
+                if sales:
+                    last_id = sales[-1]['id']
+                    message = DjangoJSONEncoder().encode({'sales': sales, 'today': totals})
+                    yield f"event: sales\ndata: {message}\n\n"
+                elif time.monotonic() - sent_at >= SALES_FEED_KEEPALIVE:
+                    yield ': keepalive\n\n'
+                else:
+                    continue
+                sent_at = time.monotonic()
+        finally:
+            broker.unsubscribe(channel, subscriber)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,58 @@
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .replicas import note_shop_write, wrote_recently
+from .routers import activate_database, shard_for
+
+
+class ShopMoving(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'This shop is being moved to another database, please retry shortly.'
+    default_code = 'shop_moving'
+
+
+class ShopJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that also points shop tables at the user's database
+    and, for writes, pins the shop's reads to the primary for a while.
+    Views that only read but take a POST body set ``reads_only = True``.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            alias, moving = shard_for(result[0].pk)
+            view = (getattr(request, 'parser_context', None) or {}).get('view')
+            if request.method not in SAFE_METHODS and not getattr(view, 'reads_only', False):
+                if moving:
+                    raise ShopMoving()
+                note_shop_write(result[0].pk)
+            activate_database(alias)
+        return result
+
+
+class AsyncShopJWTAuthentication(ShopJWTAuthentication):
+    """
+    The same checks for plain async views (api.async_views), which DRF's
+    authentication machinery does not run. Read-only: there is no write
+    path to pin to the primary.
+    """
+
+    async def aauthenticate(self, request):
+        """(user, token, wrote_recently) or None; activates the shop's database."""
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None
+        token = self.get_validated_token(raw_token)
+        user, alias, recent = await sync_to_async(self._shop_for_token)(token)
+        activate_database(alias)
+        return user, token, recent
+
+    def _shop_for_token(self, token):
+        # One hop to the ORM thread for the user, shard map and write marker.
+        user = self.get_user(token)
+        return user, shard_for(user.pk)[0], wrote_recently(user.pk)
@@ -0,0 +1,113 @@
+import contextvars
+import copy
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction
+from django.db import connections
+from django.http import QueryDict, StreamingHttpResponse
+from django.urls import Resolver404, resolve
+from rest_framework.response import Response
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
+# Per sub-request headers a client may send, so cached startup data can
+# still come back 304.
+BATCH_HEADERS = ('If-None-Match', 'If-Modified-Since')
+RESPONSE_HEADERS = ('ETag', 'Last-Modified')
+
+
+def _error(status, message):
+    return {'status': status, 'body': {'error': message}}
+
+
+def _sub_request(request, path, query, headers):
+    # A copy keeps the scheme, host and cookies; the user is forced so DRF
+    # does not decode the token again.
+    sub = copy.copy(request._request)
+    sub.method = 'GET'
+    sub.path = sub.path_info = path
+    sub.META = {
+        key: value for key, value in request.META.items()
+        if key not in ('CONTENT_LENGTH', 'CONTENT_TYPE', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+    }
+    sub.META.update({'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query})
+    for name in BATCH_HEADERS:
+        if name in headers:
+            sub.META[f"HTTP_{name.upper().replace('-', '_')}"] = headers[name]
+    sub.GET = QueryDict(query)
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def _body(response):
+    if isinstance(response, Response):
+        return response.data
+    content = response.content
+    if not content:
+        return None
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(content)
+    return content.decode(response.charset)
+
+
+def _dispatch(sub, match):
+    try:
+        response = match.func(sub, *match.args, **match.kwargs)
+        if isinstance(response, StreamingHttpResponse):
+            response.close()
+            return _error(400, 'Streaming endpoints cannot be batched')
+        result = {'status': response.status_code, 'body': _body(response)}
+        headers = {name: response[name] for name in RESPONSE_HEADERS if response.has_header(name)}
+        if headers:
+            result['headers'] = headers
+        return result
+    except Exception:
+        # A failing sub-request gets a 500 in its own slot; the others still run.
+        logger.exception('Batched request to %s failed', sub.path)
+        return _error(500, 'Internal server error')
+    finally:
+        # Worker threads have their own connections; don't leave them open.
+        connections.close_all()
+
+
+def run_batch(request, entries):
+    """
+    Run GET sub-requests for the already authenticated ``request`` and
+    return one ``{status, body[, headers]}`` per entry, in order. They run
+    concurrently on worker threads, each in a copy of this request's
+    context so the shop's database (and nothing a sibling sets) carries over.
+    """
+    results = [None] * len(entries)
+    jobs = []
+    for index, entry in enumerate(entries):
+        url = urlsplit(entry['path'])
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            results[index] = _error(404, 'Not found')
+            continue
+        if url.path == request.path:
+            results[index] = _error(400, 'Batches cannot be nested')
+        elif iscoroutinefunction(match.func):
+            results[index] = _error(400, 'Async endpoints cannot be batched')
+        else:
+            sub = _sub_request(request, url.path, url.query, entry.get('headers', {}))
+            jobs.append((index, contextvars.copy_context(), sub, match))
+
+    if jobs:
+        with ThreadPoolExecutor(max_workers=min(len(jobs), BATCH_MAX_WORKERS)) as executor:
+            futures = [
+                (index, executor.submit(context.run, _dispatch, sub, match))
+                for index, context, sub, match in jobs
+            ]
+            for index, future in futures:
+                results[index] = future.result()
+    return results
@@ -0,0 +1,106 @@
+import gzip
+import json
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Product, ProductTombstone
+
+
+# Columns shipped to POS clients. Rows are sent as positional arrays in this
+# order so each product costs a few dozen bytes instead of a full object.
+CATALOG_FIELDS = [
+    'id', 'product_code', 'product_name', 'category', 'unit', 'selling_price',
+    'stock_quantity', 'min_stock_level', 'barcode', 'hsn_code', 'tax_rate', 'discount',
+    'expiry_date', 'is_active', 'updated_at',
+]
+
+# Rows committed slightly after the watermark was taken would otherwise be
+# missed, so every delta re-sends this much history. Clients upsert by id.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+# Deletes are only remembered this long; older watermarks must re-download
+# the snapshot.
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+SNAPSHOT_CACHE_TIMEOUT = 60 * 60
+
+
+class WatermarkExpired(Exception):
+    pass
+
+
+def _encode(payload):
+    return json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+def _watermark(moment):
+    return (moment - SYNC_OVERLAP).isoformat()
+
+
+def record_tombstone(product):
+    ProductTombstone.objects.create(
+        user_id=product.created_by_id,
+        product_id=product.id,
+        product_code=product.product_code,
+    )
+    ProductTombstone.objects.filter(
+        user_id=product.created_by_id,
+        deleted_at__lt=timezone.now() - TOMBSTONE_RETENTION,
+    ).delete()
+
+
+def catalog_version(user):
+    """Cheap fingerprint of a shop's catalog: row count, newest change, newest delete."""
+    stats = Product.objects.filter(created_by=user).aggregate(count=Count('id'), latest=Max('updated_at'))
+    last_delete = ProductTombstone.objects.filter(user=user).aggregate(latest=Max('deleted_at'))['latest']
+    return stats['count'], stats['latest'], last_delete
+
+
+def build_snapshot(user):
+    """
+    Return the gzip-compressed full catalog for a shop.
+
+    The compressed bytes are cached under the catalog fingerprint, so repeated
+    cold starts for an unchanged catalog cost one aggregate query.
+    """
+    count, latest, last_delete = catalog_version(user)
+    cache_key = f"catalog-snapshot:{user.id}:{count}:{latest and latest.timestamp()}:{last_delete and last_delete.timestamp()}"
+    snapshot = cache.get(cache_key)
+    if snapshot is None:
+        started = timezone.now()
+        rows = Product.objects.filter(created_by=user).order_by('id').values_list(*CATALOG_FIELDS)
+        snapshot = gzip.compress(_encode({
+            'watermark': _watermark(started),
+            'columns': CATALOG_FIELDS,
+            'rows': list(rows),
+        }))
+        cache.set(cache_key, snapshot, SNAPSHOT_CACHE_TIMEOUT)
+    return snapshot
+
+
+def catalog_changes(user, since):
+    """Rows changed and ids deleted after ``since``, plus the next watermark."""
+    started = timezone.now()
+    if since < started - TOMBSTONE_RETENTION:
+        raise WatermarkExpired()
+
+    rows = (
+        Product.objects.filter(created_by=user, updated_at__gt=since)
+        .order_by('id')
+        .values_list(*CATALOG_FIELDS)
+    )
+    deleted = (
+        ProductTombstone.objects.filter(user=user, deleted_at__gt=since)
+        .values_list('product_id', flat=True)
+        .distinct()
+    )
+    return _encode({
+        'watermark': _watermark(started),
+        'columns': CATALOG_FIELDS,
+        'rows': list(rows),
+        'deleted': list(deleted),
+    })
@@ -0,0 +1,21 @@
+from django.middleware.gzip import GZipMiddleware
+
+
+# Below about one packet, gzip saves no round trips and still costs CPU.
+COMPRESS_MIN_BYTES = 1024
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware for bodies of at least COMPRESS_MIN_BYTES (JSON and
+    MessagePack alike). Event streams are left alone: gzip holds a stream
+    back until it has a block to emit, which would delay receipts and live
+    sales.
+    """
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith('text/event-stream'):
+            return response
+        if not response.streaming and len(response.content) < COMPRESS_MIN_BYTES:
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,72 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def conditional_response(request, handler, etag=None, last_modified=None):
+    """
+    Answer If-None-Match / If-Modified-Since before doing any real work.
+
+    ``etag`` is any string describing the current state of the resource. It
+    is hashed together with the full path and negotiated media type, so
+    different filters, pages and renderers get different validators.
+    ``handler`` is only called (and the body only serialized) when the
+    client's copy is stale.
+    """
+    if etag is None and last_modified is None:
+        return handler()
+
+    if etag is not None:
+        media_type = getattr(request, 'accepted_media_type', '')
+        digest = hashlib.md5(f"{etag}|{request.get_full_path()}|{media_type}".encode()).hexdigest()
+        etag = quote_etag(digest)
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        # A 304 repeats the validators (RFC 9110 15.4.5).
+        return _set_validators(not_modified, etag, last_modified)
+
+    response = handler()
+    if response.status_code == 200:
+        _set_validators(response, etag, last_modified)
+    return response
+
+
+def _set_validators(response, etag, last_modified):
+    if etag is not None:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ViewSet mixin that wraps list and retrieve in conditional_response.
+
+    Subclasses return ``(etag, last_modified)`` from get_list_validators and
+    get_object_validators using cheap queries (an aggregate or a single
+    column), never the serialized body.
+    """
+
+    def get_list_validators(self):
+        return None, None
+
+    def get_object_validators(self):
+        return None, None
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.get_list_validators()
+        return conditional_response(
+            request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs),
+            etag=etag, last_modified=last_modified,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        etag, last_modified = self.get_object_validators()
+        return conditional_response(
+            request, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs),
+            etag=etag, last_modified=last_modified,
+        )
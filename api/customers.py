@@ -0,0 +1,134 @@
+import re
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .inventory import _chunks
+from .models import AddCustomers, Sale, SaleArchive
+from .normalize import normalize_name, normalize_phone, normalize_phone_prefix, prefix_range
+from .tax import ZERO
+
+
+TYPEAHEAD_LIMIT = 10
+TYPEAHEAD_FIELDS = ['id', 'name', 'phone', 'email', 'customerType', 'status', 'visit_count', 'last_purchase_at']
+
+_PHONE_INPUT = re.compile(r'^[\d\s+()-]+$')
+
+
+def customers_by_phone(user, phones):
+    """Map normalized phone -> customer id for one shop (oldest customer wins)."""
+    phones = {phone for phone in phones if phone}
+    if user is None or not phones:
+        return {}
+    rows = []
+    for chunk in _chunks(phones):
+        rows.extend(
+            AddCustomers.objects.filter(added_by=user, phone_normalized__in=chunk)
+            .values_list('id', 'phone_normalized')
+        )
+    matches = {}
+    for customer_id, phone in sorted(rows):
+        matches.setdefault(phone, customer_id)
+    return matches
+
+
+def link_customers(user, sales):
+    """Point unsaved sales at the shop's customer with the same phone."""
+    unlinked = [sale for sale in sales if sale.customer_id is None and sale.customer_phone]
+    matches = customers_by_phone(user, (normalize_phone(sale.customer_phone) for sale in unlinked))
+    for sale in unlinked:
+        sale.customer_id = matches.get(normalize_phone(sale.customer_phone))
+
+
+def record_customer_visits(sales):
+    """Add saved sales to their customers' visit count, lifetime value and last purchase."""
+    stats = {}
+    for sale in sales:
+        if sale.customer_id is None:
+            continue
+        visits, value, last = stats.get(sale.customer_id, (0, ZERO, sale.sale_date))
+        stats[sale.customer_id] = (visits + 1, value + sale.total_amount, max(last, sale.sale_date))
+
+    for customer_id, (visits, value, last) in stats.items():
+        AddCustomers.objects.filter(pk=customer_id).update(
+            visit_count=F('visit_count') + visits,
+            lifetime_value=F('lifetime_value') + value,
+            last_purchase_at=Greatest(Coalesce('last_purchase_at', Value(last)), Value(last)),
+        )
+
+
+def _latest_sale():
+    # Archived sales are older than any recent one, so they only count when
+    # no recent sale is left.
+    return Coalesce(*[
+        Subquery(model.objects.filter(customer=OuterRef('pk')).order_by('-sale_date').values('sale_date')[:1])
+        for model in (Sale, SaleArchive)
+    ])
+
+
+def forget_customer_visit(sale):
+    """Take a deleted sale back out of its customer's stats."""
+    AddCustomers.objects.filter(pk=sale.customer_id).update(
+        visit_count=Greatest(F('visit_count') - 1, Value(0)),
+        lifetime_value=F('lifetime_value') - sale.total_amount,
+        last_purchase_at=_latest_sale(),
+    )
+
+
+def recompute_customer_stats(user=None):
+    """Rebuild every customer's stats from their recent and archived sales with a single UPDATE."""
+    sources = [model.objects.filter(customer=OuterRef('pk')).order_by().values('customer') for model in (Sale, SaleArchive)]
+
+    def total(aggregate, default, **kwargs):
+        recent, archived = (
+            Coalesce(Subquery(per_customer.annotate(value=aggregate).values('value')), Value(default), **kwargs)
+            for per_customer in sources
+        )
+        return recent + archived
+
+    customers = AddCustomers.objects.all()
+    if user is not None:
+        customers = customers.filter(added_by=user)
+    return customers.update(
+        visit_count=total(Count('id'), 0, output_field=IntegerField()),
+        lifetime_value=total(Sum('total_amount'), ZERO),
+        last_purchase_at=_latest_sale(),
+    )
+
+
+def link_existing_sales(user, chunk_size=2000):
+    """Attach a shop's unlinked historical sales to customers by phone."""
+    sales = list(
+        Sale.objects.filter(sold_by=user, customer__isnull=True, customer_phone__isnull=False)
+        .exclude(customer_phone='')
+        .only('id', 'customer_phone', 'customer')
+    )
+    link_customers(user, sales)
+    linked = [sale for sale in sales if sale.customer_id is not None]
+    Sale.objects.bulk_update(linked, ['customer'], batch_size=chunk_size)
+    return len(linked)
+
+
+def typeahead(user, text, limit=TYPEAHEAD_LIMIT):
+    """
+    First ``limit`` customers of a shop whose phone or name starts with
+    ``text``. Input made only of phone characters is matched against
+    phone_normalized, anything else against name_normalized; either way it
+    is one range scan over an (added_by, ...) index, read in index order.
+    """
+    customers = AddCustomers.objects.filter(added_by=user)
+    if _PHONE_INPUT.match(text or ''):
+        column, prefix = 'phone_normalized', normalize_phone_prefix(text)
+    else:
+        column, prefix = 'name_normalized', normalize_name(text)
+    if not prefix:
+        return []
+
+    low, high = prefix_range(prefix)
+    customers = customers.filter(**{f'{column}__gte': low})
+    if high is not None:
+        customers = customers.filter(**{f'{column}__lt': high})
+    return list(
+        customers.order_by(column, 'id')
+        .values(*TYPEAHEAD_FIELDS)[:limit]
+    )
@@ -0,0 +1,112 @@
+import asyncio
+import queue
+import threading
+from collections import defaultdict
+
+
+# How long a stream waits for a publish in its own process before looking in
+# the database anyway; the most an event from another worker is delayed.
+EVENT_POLL_INTERVAL = 2
+
+
+class AsyncSubscriber:
+    """
+    A subscriber read from an event loop (async views under ASGI). Messages
+    published from any thread are handed to the loop with
+    call_soon_threadsafe; a full queue drops them like a sync subscriber.
+    """
+
+    def __init__(self, maxsize):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=maxsize)
+
+    def put_nowait(self, message):
+        try:
+            self._loop.call_soon_threadsafe(self._deliver, message)
+        except RuntimeError:
+            # The loop has closed; the stream is gone.
+            pass
+
+    def _deliver(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self):
+        return await self._queue.get()
+
+
+class Broker:
+    """
+    In-process publish/subscribe used to wake streaming responses.
+
+    Each subscriber owns a bounded queue; a slow consumer drops messages
+    rather than blocking the publisher, which runs on the request path.
+    Only subscribers in the publishing process are reached, so streams read
+    what they send from the database and also look every
+    EVENT_POLL_INTERVAL seconds (see wait_for_publish), which is how events
+    from other worker processes reach them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channel, maxsize=100):
+        subscriber = queue.Queue(maxsize=maxsize)
+        with self._lock:
+            self._subscribers[channel].add(subscriber)
+        return subscriber
+
+    def subscribe_async(self, channel, maxsize=100):
+        """Subscribe from a coroutine; read with ``await subscriber.get()``."""
+        subscriber = AsyncSubscriber(maxsize)
+        with self._lock:
+            self._subscribers[channel].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            self._subscribers[channel].discard(subscriber)
+            if not self._subscribers[channel]:
+                del self._subscribers[channel]
+
+    def has_subscribers(self, channel):
+        return bool(self._subscribers.get(channel))
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                pass
+
+
+broker = Broker()
+
+
+def wait_for_publish(subscriber):
+    """Block until something is published to ``subscriber`` or EVENT_POLL_INTERVAL passes."""
+    try:
+        subscriber.get(timeout=EVENT_POLL_INTERVAL)
+    except queue.Empty:
+        pass
+
+
+async def await_publish(subscriber):
+    """wait_for_publish for an AsyncSubscriber."""
+    try:
+        await asyncio.wait_for(subscriber.get(), EVENT_POLL_INTERVAL)
+    except asyncio.TimeoutError:
+        pass
+
+
+def print_channel(user_id):
+    return f"print:{user_id}"
+
+
+def sales_channel(user_id):
+    return f"sales:{user_id}"
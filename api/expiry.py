@@ -0,0 +1,89 @@
+from datetime import date, timedelta
+
+from django.db.models import Case, CharField, F, Value, When
+from django.utils import timezone
+
+from .models import ExpiryDigest, Product
+
+
+# Disjoint windows, checked in order: (bucket, last day relative to today).
+EXPIRY_BUCKETS = [
+    ('expired', -1),
+    ('today', 0),
+    ('next_7_days', 7),
+    ('next_30_days', 30),
+]
+DIGEST_HORIZON_DAYS = EXPIRY_BUCKETS[-1][1]
+
+
+def annotate_days_to_expiry(queryset, today=None):
+    """
+    Add ``expiry_delta`` (expiry_date - today, a timedelta) computed by the
+    database, so list serialization does no date arithmetic per row.
+    """
+    return queryset.annotate(expiry_delta=F('expiry_date') - Value(today or date.today()))
+
+
+def expiry_bucket(today):
+    return Case(
+        *[
+            When(expiry_date__lte=today + timedelta(days=last_day), then=Value(bucket))
+            for bucket, last_day in EXPIRY_BUCKETS
+        ],
+        default=None,
+        output_field=CharField(),
+    )
+
+
+def _empty_buckets():
+    return {bucket: {'count': 0, 'product_ids': []} for bucket, _ in EXPIRY_BUCKETS}
+
+
+def build_expiry_digests(user=None, today=None):
+    """
+    Bucket every active product expiring within the horizon and store one
+    digest per shop. Shops with nothing expiring get an empty digest so an
+    old one is never served. Returns the digests written.
+    """
+    today = today or date.today()
+    products = Product.objects.filter(is_active=True, created_by__isnull=False)
+    if user is not None:
+        products = products.filter(created_by=user)
+
+    digests = {owner_id: _empty_buckets() for owner_id in products.values_list('created_by_id', flat=True).distinct()}
+    if user is not None:
+        digests.setdefault(user.id, _empty_buckets())
+
+    rows = (
+        products.filter(expiry_date__lte=today + timedelta(days=DIGEST_HORIZON_DAYS))
+        .annotate(bucket=expiry_bucket(today))
+        .order_by('expiry_date', 'id')
+        .values_list('created_by_id', 'bucket', 'id')
+    )
+    for owner_id, bucket, product_id in rows.iterator(chunk_size=2000):
+        entry = digests[owner_id][bucket]
+        entry['count'] += 1
+        entry['product_ids'].append(product_id)
+
+    now = timezone.now()
+    objects = [
+        ExpiryDigest(user_id=owner_id, as_of=today, buckets=buckets, computed_at=now)
+        for owner_id, buckets in digests.items()
+    ]
+    ExpiryDigest.objects.bulk_create(
+        objects,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['as_of', 'buckets', 'computed_at'],
+    )
+    return objects
+
+
+def get_expiry_digest(user, refresh=False):
+    """The shop's digest for today, rebuilt only if the nightly run missed it."""
+    today = date.today()
+    digest = None if refresh else ExpiryDigest.objects.filter(user=user, as_of=today).first()
+    if digest is None:
+        digest = build_expiry_digests(user=user, today=today)[0]
+    return digest
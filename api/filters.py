@@ -0,0 +1,31 @@
+from datetime import datetime, time, timedelta
+
+import django_filters
+from django.utils import timezone
+
+from .models import Sale
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class SaleFilter(django_filters.FilterSet):
+    """
+    Keeps the ``sale_date__date__gte/lte`` parameters but filters on a
+    sale_date range: a ``__date`` lookup wraps the column in a function,
+    so the (sold_by, sale_date) index could not serve it.
+    """
+
+    sale_date__date__gte = django_filters.DateFilter(method='filter_from_day')
+    sale_date__date__lte = django_filters.DateFilter(method='filter_to_day')
+
+    class Meta:
+        model = Sale
+        fields = {'total_amount': ['gte', 'lte']}
+
+    def filter_from_day(self, queryset, name, value):
+        return queryset.filter(sale_date__gte=_day_start(value))
+
+    def filter_to_day(self, queryset, name, value):
+        return queryset.filter(sale_date__lt=_day_start(value + timedelta(days=1)))
@@ -0,0 +1,122 @@
+import math
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Product, ReorderSuggestion, SaleItem
+from .routers import shop_db
+
+
+# Days of sales history fed into the forecast.
+HISTORY_DAYS = 90
+
+# Weight of the newest day in the exponentially smoothed demand level.
+SMOOTHING_ALPHA = 0.3
+
+# Days between placing an order and the stock arriving, and between orders.
+LEAD_TIME_DAYS = 7
+REVIEW_PERIOD_DAYS = 14
+
+# z-score for roughly a 95% chance of not running out during the lead time.
+SERVICE_LEVEL_Z = 1.65
+
+WRITE_BATCH_SIZE = 500
+
+
+def daily_units(start, end, user=None):
+    """
+    Units sold per product per day in [start, end), as a day x product frame.
+
+    The grouping happens in one aggregate query; days without sales are
+    filled with zero so every column is a complete series.
+    """
+    items = SaleItem.objects.filter(sale__sale_date__gte=start, sale__sale_date__lt=end)
+    if user is not None:
+        items = items.filter(sale__sold_by=user)
+    rows = (
+        items.annotate(day=TruncDate('sale__sale_date'))
+        .values_list('product_id', 'day')
+        .annotate(units=Sum('quantity'))
+        .order_by()
+    )
+    frame = pd.DataFrame.from_records(list(rows), columns=['product_id', 'day', 'units'])
+    days = pd.date_range(start.date(), end.date() - timedelta(days=1), freq='D')
+    if frame.empty:
+        return pd.DataFrame(index=days, dtype=float)
+
+    frame['day'] = pd.to_datetime(frame['day'])
+    series = frame.pivot_table(index='day', columns='product_id', values='units', aggfunc='sum')
+    return series.reindex(days, fill_value=0).fillna(0).astype(float)
+
+
+def _ceil(values):
+    # Round first so float noise such as 2.0000000001 does not add a unit.
+    return np.ceil(np.round(values, 2)).astype(np.int64)
+
+
+def reorder_levels(series):
+    """
+    Forecast every product column at once.
+
+    Daily demand is the exponentially smoothed level on the last day; safety
+    stock covers demand variability over the lead time. Returns a frame
+    indexed by product id.
+    """
+    level = series.ewm(alpha=SMOOTHING_ALPHA, adjust=False).mean().iloc[-1]
+    spread = series.std(ddof=0)
+    safety = _ceil(SERVICE_LEVEL_Z * spread * math.sqrt(LEAD_TIME_DAYS))
+    return pd.DataFrame({
+        'daily_demand': level.round(2),
+        'safety_stock': safety,
+        'reorder_point': _ceil(level * LEAD_TIME_DAYS) + safety,
+        'order_up_to': _ceil(level * (LEAD_TIME_DAYS + REVIEW_PERIOD_DAYS)) + safety,
+    })
+
+
+def forecast_demand(user=None, history_days=HISTORY_DAYS, now=None):
+    """
+    Recompute reorder suggestions for every active product (of one shop, or
+    all shops) and upsert them. Returns the number of suggestions written.
+    """
+    now = now or timezone.now()
+    end = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    start = end - timedelta(days=history_days)
+
+    products = Product.objects.filter(is_active=True, created_by__isnull=False)
+    if user is not None:
+        products = products.filter(created_by=user)
+    owners = dict(products.values_list('id', 'created_by_id'))
+
+    levels = reorder_levels(daily_units(start, end, user)).reindex(list(owners), fill_value=0)
+    suggestions = [
+        ReorderSuggestion(
+            product_id=product_id,
+            user_id=owners[product_id],
+            daily_demand=f"{row.daily_demand:.2f}",
+            safety_stock=int(row.safety_stock),
+            reorder_point=int(row.reorder_point),
+            order_up_to=int(row.order_up_to),
+            computed_at=now,
+        )
+        for product_id, row in zip(levels.index, levels.itertuples(index=False))
+    ]
+
+    stale = ReorderSuggestion.objects.filter(product__is_active=False)
+    if user is not None:
+        stale = stale.filter(user=user)
+
+    with transaction.atomic(using=shop_db()):
+        ReorderSuggestion.objects.bulk_create(
+            suggestions,
+            batch_size=WRITE_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['user', 'daily_demand', 'safety_stock', 'reorder_point', 'order_up_to', 'computed_at'],
+        )
+        stale.delete()
+    return len(suggestions)
@@ -0,0 +1,50 @@
+import threading
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import HsnCode, Product
+from .routers import shop_databases
+
+
+# Other worker processes pick up master changes after at most this long;
+# the process that made the change reloads immediately.
+HSN_CACHE_TTL = 300
+
+_lock = threading.Lock()
+_rates = None
+_loaded_at = 0.0
+
+
+def hsn_rates():
+    """code -> tax_rate for the whole HSN/SAC master, loaded once per process."""
+    global _rates, _loaded_at
+    rates = _rates
+    if rates is None or time.monotonic() - _loaded_at > HSN_CACHE_TTL:
+        with _lock:
+            _rates = rates = dict(HsnCode.objects.values_list('code', 'tax_rate'))
+            _loaded_at = time.monotonic()
+    return rates
+
+
+def invalidate_hsn_rates():
+    global _rates
+    _rates = None
+
+
+def resolve_tax_rate(hsn_code, fallback=0):
+    if not hsn_code:
+        return fallback
+    return hsn_rates().get(hsn_code, fallback)
+
+
+def propagate_hsn_rate(hsn):
+    """Push a master rate onto every product that uses the code, one UPDATE per shop database."""
+    updated = 0
+    for alias in shop_databases():
+        with transaction.atomic(using=alias):
+            updated += Product.objects.using(alias).filter(hsn_code=hsn.code).exclude(tax_rate=hsn.tax_rate).update(
+                tax_rate=hsn.tax_rate, updated_at=timezone.now()
+            )
+    return updated
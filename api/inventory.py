@@ -0,0 +1,162 @@
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import LowStockEntry, Product
+
+
+# Keep IN (...) lists well under the SQLite bound-parameter limit.
+LOOKUP_CHUNK_SIZE = 500
+
+# Columns the low-stock queue needs; stock writers load these up front.
+LOW_STOCK_FIELDS = ['id', 'created_by', 'supplier', 'stock_quantity', 'min_stock_level', 'is_active']
+
+
+def _chunks(values, size=LOOKUP_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def set_stock_levels(user, quantities, mode='set'):
+    """
+    Apply stock quantities keyed by product_code for one shop.
+
+    ``mode='set'`` overwrites stock_quantity, ``mode='adjust'`` adds the
+    (possibly negative) quantity to it. Rows are loaded once and written back
+    with a single bulk_update inside the caller's transaction.
+    Returns (updated_products, missing_codes, rejected_codes).
+    """
+    products = []
+    for codes in _chunks(quantities.keys()):
+        products.extend(
+            Product.objects.select_for_update()
+            .filter(created_by=user, product_code__in=codes)
+            .only('product_code', 'updated_at', *LOW_STOCK_FIELDS)
+        )
+
+    now = timezone.now()
+    found = set()
+    rejected = []
+    changed = []
+    for product in products:
+        found.add(product.product_code)
+        quantity = quantities[product.product_code]
+        new_quantity = quantity if mode == 'set' else product.stock_quantity + quantity
+        if new_quantity < 0:
+            rejected.append(product.product_code)
+            continue
+        product.stock_quantity = new_quantity
+        product.updated_at = now
+        changed.append(product)
+
+    if changed:
+        Product.objects.bulk_update(changed, ['stock_quantity', 'updated_at'], batch_size=LOOKUP_CHUNK_SIZE)
+        sync_low_stock(changed)
+
+    missing = [code for code in quantities if code not in found]
+    return changed, missing, rejected
+
+
+
+def apply_stock_deltas(deltas, allow_oversell=False):
+    """
+    Subtract sold quantities from stock in one pass.
+
+    ``deltas`` maps product id -> quantity sold. Selling more than is in
+    stock raises a ValidationError naming the products, unless
+    ``allow_oversell`` (sales already made offline): then stock stops at
+    zero, since stock_quantity is unsigned, and the shortfall is returned.
+    Returns (products, oversold).
+    """
+    if not deltas:
+        return [], []
+
+    products = []
+    for ids in _chunks(deltas.keys()):
+        products.extend(
+            Product.objects.select_for_update()
+            .filter(id__in=ids)
+            .only('product_name', 'updated_at', *LOW_STOCK_FIELDS)
+        )
+    oversold = [
+        {'product': product.id, 'product_name': product.product_name,
+         'stock_quantity': product.stock_quantity, 'quantity': deltas[product.id]}
+        for product in products if deltas[product.id] > product.stock_quantity
+    ]
+    if oversold and not allow_oversell:
+        raise ValidationError({'items': [
+            f"Insufficient stock for {line['product_name']}: {line['stock_quantity']} available, "
+            f"{line['quantity']} requested."
+            for line in oversold
+        ]})
+
+    now = timezone.now()
+    for product in products:
+        product.stock_quantity = max(product.stock_quantity - deltas[product.id], 0)
+        product.updated_at = now
+    Product.objects.bulk_update(products, ['stock_quantity', 'updated_at'], batch_size=LOOKUP_CHUNK_SIZE)
+    sync_low_stock(products)
+    return products, oversold
+
+
+def is_low_stock(product):
+    return bool(product.is_active and product.created_by_id and product.stock_quantity < product.min_stock_level)
+
+
+def sync_low_stock(products):
+    """
+    Bring the low-stock queue in line with already loaded products.
+
+    Products below min_stock_level are upserted (flagged_at keeps the time
+    the product first ran low), every other product's entry is removed.
+    """
+    low = []
+    cleared = []
+    for product in products:
+        if is_low_stock(product):
+            low.append(LowStockEntry(
+                product_id=product.id,
+                user_id=product.created_by_id,
+                supplier=product.supplier,
+                stock_quantity=product.stock_quantity,
+                min_stock_level=product.min_stock_level,
+                shortfall=product.min_stock_level - product.stock_quantity,
+            ))
+        else:
+            cleared.append(product.id)
+
+    if low:
+        LowStockEntry.objects.bulk_create(
+            low,
+            batch_size=LOOKUP_CHUNK_SIZE,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['user', 'supplier', 'stock_quantity', 'min_stock_level', 'shortfall'],
+        )
+    for ids in _chunks(cleared):
+        LowStockEntry.objects.filter(product_id__in=ids).delete()
+
+
+def refresh_low_stock(product_ids):
+    """Re-check the given products against their min_stock_level."""
+    products = []
+    for ids in _chunks(set(product_ids)):
+        products.extend(Product.objects.filter(id__in=ids).only(*LOW_STOCK_FIELDS))
+    sync_low_stock(products)
+
+
+def rebuild_low_stock(user=None):
+    """Recompute the whole queue (for one shop or all) from the products table."""
+    entries = LowStockEntry.objects.all()
+    products = Product.objects.filter(
+        is_active=True, created_by__isnull=False, stock_quantity__lt=F('min_stock_level')
+    ).only(*LOW_STOCK_FIELDS)
+    if user is not None:
+        entries = entries.filter(user=user)
+        products = products.filter(created_by=user)
+
+    entries.delete()
+    low = list(products.iterator(chunk_size=LOOKUP_CHUNK_SIZE * 4))
+    sync_low_stock(low)
+    return len(low)
@@ -0,0 +1,155 @@
+"""
+Read paths for the high-volume list endpoints. Rows come straight from
+``.values()`` and are mapped to plain dicts by a fixed column spec, giving
+the same JSON as the ModelSerializers without building model instances or
+walking serializer fields per row.
+"""
+from collections import defaultdict
+from functools import partial
+
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import SaleItem, expiry_status_label
+
+
+def _text(value):
+    # DecimalField (already quantized by the database backend).
+    return None if value is None else str(value)
+
+
+def _date(value):
+    return None if value is None else value.isoformat()
+
+
+def _datetime(value, tz):
+    # DateTimeField: in the current time zone, UTC written as Z.
+    if value is None:
+        return None
+    value = value.astimezone(tz).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+class Columns:
+    """
+    Output keys in serializer order, each with the ``.values()`` column it
+    comes from (default: the key) and an optional converter. ``computed``
+    keys are set on the values by the caller; ``extra`` columns are selected
+    for the caller's use but not output.
+    """
+
+    def __init__(self, *spec, computed=(), extra=()):
+        self.spec = [(key, source or key, convert) for key, source, convert in spec]
+        self.sources = list(dict.fromkeys(
+            [source for key, source, _ in self.spec if key not in computed] + list(extra)
+        ))
+
+    def values(self, queryset):
+        return queryset.values(*self.sources)
+
+    def rows(self, rows):
+        # The current time zone is looked up once per page, not per value.
+        tz = timezone.get_current_timezone()
+        spec = [
+            (key, source, partial(convert, tz=tz) if convert is _datetime else convert)
+            for key, source, convert in self.spec
+        ]
+        return [
+            {key: convert(values[source]) if convert else values[source] for key, source, convert in spec}
+            for values in rows
+        ]
+
+
+def _plain(*names):
+    return [(name, None, None) for name in names]
+
+
+PRODUCT_COLUMNS = Columns(
+    *_plain('id', 'expiry_status', 'days_to_expiry', 'product_code', 'product_name', 'category', 'unit'),
+    ('purchase_price', None, _text), ('selling_price', None, _text),
+    *_plain('stock_quantity', 'min_stock_level', 'barcode', 'hsn_code'),
+    ('tax_rate', None, _text), ('discount', None, _text), ('expiry_date', None, _date),
+    *_plain('manufacturer', 'supplier', 'description', 'is_active'),
+    ('created_at', None, _datetime), ('updated_at', None, _datetime), ('created_by', 'created_by_id', None),
+    computed=('expiry_status', 'days_to_expiry'),
+    extra=('expiry_delta',),
+)
+
+# CustomerSerializer minus user_details: the list is always the caller's own
+# customers, so the nested user repeated on every row is dropped.
+CUSTOMER_COLUMNS = Columns(
+    *_plain('id', 'name', 'phone', 'email', 'address', 'city', 'state', 'zip', 'country', 'customerType',
+            'taxId', 'notes', 'status'),
+    ('created_at', None, _datetime), ('updated_at', None, _datetime),
+    *_plain('phone_normalized', 'name_normalized', 'visit_count'),
+    ('lifetime_value', None, _text), ('last_purchase_at', None, _datetime), ('added_by', 'added_by_id', None),
+)
+
+_MONEY = [(name, None, _text) for name in (
+    'discount', 'tax_amount', 'taxable_amount', 'total_amount', 'cgst_amount', 'sgst_amount', 'igst_amount',
+)]
+
+SALE_COLUMNS = Columns(
+    *_plain('id', 'invoice_number'), ('sold_by', 'sold_by__email', None), ('sale_date', None, _datetime),
+    *_plain('customer_name', 'customer_phone', 'customer_address', 'customer_gst', 'customer_state',
+            'customer_state_code'),
+    *_MONEY,
+    *_plain('tax_breakdown', 'payment_method', 'notes', 'include_gst'), ('customer', 'customer_id', None),
+)
+
+SALE_ITEM_COLUMNS = Columns(
+    *_plain('id'), ('product', 'product_id', None), ('product_id', None, None),
+    ('product_name', 'product__product_name', None), *_plain('quantity'),
+    ('sale_price', None, _text), ('tax_rate', None, _text),
+    *[(name, None, _text) for name in (
+        'tax_amount', 'taxable_amount', 'total_amount', 'cgst_amount', 'sgst_amount', 'igst_amount',
+    )],
+    extra=('sale_id',),
+)
+
+
+def product_rows(rows):
+    rows = list(rows)
+    for values in rows:
+        # ProductSerializer's method fields, from the expiry_delta annotation.
+        delta = values['expiry_delta']
+        values['days_to_expiry'] = delta.days if delta is not None else None
+        values['expiry_status'] = expiry_status_label(values['expiry_date'], values['days_to_expiry'])
+    return PRODUCT_COLUMNS.rows(rows)
+
+
+def customer_rows(rows):
+    return CUSTOMER_COLUMNS.rows(rows)
+
+
+def sale_rows(rows):
+    """Sales with their items, fetched for the whole page in one query."""
+    sales = SALE_COLUMNS.rows(rows)
+    items = defaultdict(list)
+    lines = list(SALE_ITEM_COLUMNS.values(
+        SaleItem.objects.filter(sale_id__in=[sale['id'] for sale in sales]).order_by('id')
+    ))
+    for values, item in zip(lines, SALE_ITEM_COLUMNS.rows(lines)):
+        items[values['sale_id']].append(item)
+    for sale in sales:
+        sale['items'] = items[sale['id']]
+    return sales
+
+
+class ValuesListMixin:
+    """
+    ViewSet mixin that answers ``list`` from ``list_columns.values()`` rows
+    mapped by ``list_rows`` (a staticmethod taking the rows) instead of the
+    serializer. Filtering, ordering and pagination work as before; they run
+    on the values queryset.
+    """
+
+    list_columns = None
+    list_rows = None
+
+    def list(self, request, *args, **kwargs):
+        rows = self.list_columns.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.list_rows(page))
+        return Response(self.list_rows(rows))
@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .events import broker, sales_channel
+from .models import Sale
+from .reports import _day_start
+from .routers import shop_db
+from .tax import TWO_PLACES, ZERO
+
+
+LIVE_SALE_FIELDS = ['id', 'invoice_number', 'customer_name', 'payment_method', 'total_amount', 'sale_date']
+SALE_TOTALS = {'count': Count('id'), 'total': Sum('total_amount')}
+
+
+def todays_sales(user):
+    return Sale.objects.filter(sold_by=user, sale_date__gte=_day_start(timezone.localdate()))
+
+
+def format_totals(totals):
+    return {'sales': totals['count'], 'total': (totals['total'] or ZERO).quantize(TWO_PLACES)}
+
+
+def sales_after(user, last_id=0):
+    """
+    The shop's sales with ids above ``last_id``, oldest first. Ids are handed
+    out under the invoice numbering lock (see Sale.next_invoice_numbers), so
+    they commit in order and a stream that remembers the last id it sent
+    misses none.
+    """
+    return Sale.objects.filter(sold_by=user, pk__gt=last_id).order_by('id')
+
+
+def announce_sales(user, sales):
+    """
+    Wake the shop's live dashboards in this process once the transaction
+    commits. Dashboards read the new sales and today's totals themselves
+    (see sales_after), which is how the ones connected to other worker
+    processes get them too, within EVENT_POLL_INTERVAL.
+    """
+    channel = sales_channel(user.id)
+    sale_ids = [sale.id for sale in sales]
+    transaction.on_commit(lambda: broker.publish(channel, sale_ids), using=shop_db())
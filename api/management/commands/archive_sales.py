@@ -0,0 +1,37 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.archive import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, archive_sales
+from api.forecast import HISTORY_DAYS
+from api.routers import each_shop_database
+
+
+class Command(BaseCommand):
+    help = 'Move sales older than the archive horizon into the archive tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only this shop (user id).')
+        parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS, help='Keep this many days of recent sales.')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user'] is not None:
+            user = get_user_model().objects.filter(pk=options['user']).first()
+            if user is None:
+                raise CommandError(f"User {options['user']} does not exist")
+        if options['days'] < HISTORY_DAYS:
+            raise CommandError(f"--days must be at least {HISTORY_DAYS}, the demand forecast reads that much recent history")
+
+        before = timezone.now() - timedelta(days=options['days'])
+        started = time.perf_counter()
+        moved = 0
+        for _ in each_shop_database(user):
+            moved += archive_sales(before, user=user, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} sales dated before {before:%Y-%m-%d} in {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,128 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.models import F
+
+from api.models import Product, Sale, SaleItem, User
+from backendbilling.database import postgres_database, sqlite_database
+
+
+MODES = ['rollback', 'wal', 'postgres']
+
+
+def _register(alias, database):
+    # Give the benchmark its own aliases without touching settings.DATABASES.
+    connections.configure_settings({DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS], alias: database})
+    connections.settings[alias] = database
+
+
+def _checkout(alias, user_id, product_id, worker, number):
+    # Read-then-write, like a real checkout: the shape that fails to upgrade
+    # its lock under SQLite's default deferred transactions.
+    with transaction.atomic(using=alias):
+        product = Product.objects.using(alias).only('selling_price').get(pk=product_id)
+        sale = Sale(
+            sold_by_id=user_id,
+            invoice_number=f"B{worker}-{number}",
+            taxable_amount=product.selling_price,
+            total_amount=product.selling_price,
+        )
+        Sale.objects.using(alias).bulk_create([sale])
+        SaleItem.objects.using(alias).bulk_create([
+            SaleItem(sale=sale, product_id=product_id, quantity=1, sale_price=product.selling_price,
+                     taxable_amount=product.selling_price, total_amount=product.selling_price),
+        ])
+        Product.objects.using(alias).filter(pk=product_id).update(stock_quantity=F('stock_quantity') - 1)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure concurrent checkout write throughput for SQLite in rollback-journal '
+        'mode, SQLite in WAL mode and (optionally) pooled PostgreSQL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', choices=MODES,
+                            help='Mode to run (repeatable). Defaults to rollback and wal.')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--transactions', type=int, default=200, help='Per thread.')
+        parser.add_argument('--pg-name', help='A disposable PostgreSQL database for the postgres mode; '
+                                              'it is migrated and written to.')
+
+    def handle(self, *args, **options):
+        modes = options['mode'] or ['rollback', 'wal']
+        if 'postgres' in modes and not options['pg_name']:
+            raise CommandError('--pg-name is required for the postgres mode')
+
+        workdir = tempfile.mkdtemp(prefix='bench-db-')
+        try:
+            template = os.path.join(workdir, 'template.sqlite3')
+            _register('bench_template', {'ENGINE': 'django.db.backends.sqlite3', 'NAME': template})
+            call_command('migrate', database='bench_template', verbosity=0)
+            connections['bench_template'].close()
+
+            self.stdout.write(f"{'mode':<10}{'tx/s':>10}{'ok':>8}{'failed':>8}{'seconds':>10}")
+            for mode in modes:
+                alias = f"bench_{mode}"
+                if mode == 'postgres':
+                    _register(alias, postgres_database(name=options['pg_name']))
+                    call_command('migrate', database=alias, verbosity=0)
+                else:
+                    path = os.path.join(workdir, f"{mode}.sqlite3")
+                    shutil.copyfile(template, path)
+                    if mode == 'wal':
+                        _register(alias, sqlite_database(path, conn_max_age=0))
+                    else:
+                        # The previous settings: default journal, deferred BEGIN.
+                        _register(alias, {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path})
+                self.run_mode(mode, alias, options['threads'], options['transactions'])
+        finally:
+            connections.close_all()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def run_mode(self, mode, alias, threads, per_thread):
+        # bulk_create keeps the post_save receivers (which use the default
+        # database) out of the benchmark.
+        user = User(email=f"bench-{time.time_ns()}@example.com", username='bench', shop_name='Bench', phone='0')
+        User.objects.using(alias).bulk_create([user])
+        product = Product(
+            product_code=f"BENCH-{time.time_ns()}", product_name='Bench', purchase_price=Decimal('1'),
+            selling_price=Decimal('2'), stock_quantity=threads * per_thread, created_by=user,
+        )
+        Product.objects.using(alias).bulk_create([product])
+        counts = {'ok': 0, 'failed': 0}
+        lock = threading.Lock()
+
+        def worker(number):
+            ok = failed = 0
+            try:
+                for index in range(per_thread):
+                    try:
+                        _checkout(alias, user.id, product.id, f"{mode}{number}", index)
+                        ok += 1
+                    except OperationalError:
+                        failed += 1
+            finally:
+                connections[alias].close()
+            with lock:
+                counts['ok'] += ok
+                counts['failed'] += failed
+
+        workers = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{mode:<10}{counts['ok'] / elapsed:>10.1f}{counts['ok']:>8}{counts['failed']:>8}{elapsed:>10.2f}"
+        )
@@ -0,0 +1,78 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+
+from api.management.commands.explain_queries import Command as ExplainQueries, _Seeded, viewset_queryset
+from api.renderers import MessagePackRenderer, OrjsonRenderer
+from api.routers import use_database
+from api.views import ProductViewSet, SaleViewSet
+
+
+RENDERERS = [('drf json', JSONRenderer), ('orjson', OrjsonRenderer), ('msgpack', MessagePackRenderer)]
+
+
+def _median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = (
+        'Serialize the product and sales list payloads of a throwaway shop (rolled back) and '
+        'report render time and bytes on the wire, raw and gzipped, for each renderer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--sales', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        with use_database(alias):
+            try:
+                with transaction.atomic(using=alias):
+                    shop = ExplainQueries().seed(alias, {
+                        'shops': 1, 'products': options['products'], 'sales': options['sales'], 'customers': 50,
+                    })
+                    payloads = self.payloads(shop, options['repeat'])
+                    raise _Seeded()
+            except _Seeded:
+                pass
+
+        self.stdout.write(f"{'payload':<10}{'renderer':<10}{'render ms':>11}{'bytes':>11}{'gzip bytes':>12}{'gzip ms':>9}")
+        for name, (data, serialize_ms) in payloads.items():
+            for label, renderer_class in RENDERERS:
+                body, render_ms = _median_ms(lambda: renderer_class().render(data), options['repeat'])
+                compressed, gzip_ms = _median_ms(lambda: compress_string(body), options['repeat'])
+                self.stdout.write(
+                    f"{name:<10}{label:<10}{render_ms:>11.2f}{len(body):>11}{len(compressed):>12}{gzip_ms:>9.2f}"
+                )
+            self.stdout.write(f"{name:<10}{'(serializer)':<10}{serialize_ms:>11.2f}")
+
+    def payloads(self, shop, repeat):
+        """The data each list endpoint hands its renderer, and how long the serializer took."""
+        payloads = {}
+        for name, viewset, params in [
+            ('products', ProductViewSet, {}),
+            ('sales', SaleViewSet, {'ordering': '-sale_date'}),
+        ]:
+            queryset = viewset_queryset(viewset, shop, params)
+            view = viewset(action='list', format_kwarg=None, kwargs={}, request=None)
+            if viewset.pagination_class is not None:
+                # Paginated lists: the largest page a client can ask for.
+                queryset = queryset[:viewset.pagination_class.max_page_size]
+            instances = list(queryset)
+            payloads[name] = _median_ms(
+                lambda: view.get_serializer_class()(instances, many=True, context={'request': None}).data, repeat,
+            )
+        return payloads
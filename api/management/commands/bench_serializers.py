@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from api.management.commands.bench_renderers import _median_ms
+from api.management.commands.explain_queries import Command as ExplainQueries, _Seeded, viewset_queryset
+from api.routers import use_database
+from api.views import CustomerViewSet, ProductViewSet, SaleViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Build product, customer and sales list pages for a throwaway shop (rolled back), once through '
+        'the ModelSerializers and once through the .values() read paths, and report the timings.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per page.')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        rows = options['rows']
+        with use_database(alias):
+            try:
+                with transaction.atomic(using=alias):
+                    shop = ExplainQueries().seed(alias, {
+                        'shops': 1, 'products': rows, 'sales': rows, 'customers': rows,
+                    })
+                    results = self.measure(shop, rows, options['repeat'])
+                    raise _Seeded()
+            except _Seeded:
+                pass
+
+        self.stdout.write(
+            f"{'list':<10}{'rows':>6}{'fetch ms':>10}{'serializer ms':>15}{'fetch ms':>10}{'values ms':>11}"
+            f"{'speedup':>9}{'overall':>9}"
+        )
+        for name, (count, (model_fetch, serializer_ms), (values_fetch, values_ms)) in results.items():
+            self.stdout.write(
+                f"{name:<10}{count:>6}{model_fetch:>10.2f}{serializer_ms:>15.2f}{values_fetch:>10.2f}{values_ms:>11.2f}"
+                f"{serializer_ms / values_ms:>8.1f}x"
+                f"{(model_fetch + serializer_ms) / (values_fetch + values_ms):>8.1f}x"
+            )
+
+    def measure(self, shop, rows, repeat):
+        """
+        For one page, both ways: the time to fetch the rows (instances or
+        dicts), then to turn them into response data, including any further
+        queries that takes. Speedup compares the latter, overall both.
+        """
+        results = {}
+        for name, viewset, params in [
+            ('products', ProductViewSet, {}),
+            ('customers', CustomerViewSet, {}),
+            ('sales', SaleViewSet, {'ordering': '-sale_date'}),
+        ]:
+            queryset = viewset_queryset(viewset, shop, params)
+            view = viewset(action='list', format_kwarg=None, kwargs={}, request=None)
+            serializer_class = view.get_serializer_class()
+
+            instances, model_fetch = _median_ms(lambda: list(queryset[:rows]), repeat)
+            serialized, serializer_ms = _median_ms(
+                lambda: serializer_class(instances, many=True, context={'request': None}).data, repeat,
+            )
+            fetched, values_fetch = _median_ms(lambda: list(view.list_columns.values(queryset)[:rows]), repeat)
+            values, values_ms = _median_ms(lambda: view.list_rows(fetched), repeat)
+
+            if [row['id'] for row in serialized] != [row['id'] for row in values]:
+                raise CommandError(f"{name}: the two paths returned different rows")
+            results[name] = (len(values), (model_fetch, serializer_ms), (values_fetch, values_ms))
+        return results
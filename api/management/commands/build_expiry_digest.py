@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.expiry import build_expiry_digests
+from api.routers import each_shop_database
+
+
+class Command(BaseCommand):
+    help = 'Bucket products into expiry windows and store each shop\'s expiry digest.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only this shop (user id).')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user'] is not None:
+            user = get_user_model().objects.filter(pk=options['user']).first()
+            if user is None:
+                raise CommandError(f"User {options['user']} does not exist")
+
+        digests = []
+        for _ in each_shop_database(user):
+            digests += build_expiry_digests(user=user)
+        self.stdout.write(self.style.SUCCESS(f"Built {len(digests)} expiry digests"))
@@ -0,0 +1,183 @@
+import re
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.models import AddCustomers, AddVendor, Product, Sale, SaleItem, Ticket, User
+from api.routers import use_database
+from api.views import AddVendorViewSet, CustomerViewSet, ProductViewSet, SaleViewSet, TicketViewSet
+
+
+# The composite indexes added for tenant-scoped lists; --compare drops them.
+COMPOSITE_INDEXES = [
+    'product_shop_category_idx', 'product_shop_barcode_idx', 'sale_shop_date_idx', 'sale_shop_updated_idx',
+    'sale_customer_date_idx', 'customer_shop_created_idx', 'vendor_shop_created_idx', 'ticket_user_status_idx',
+]
+
+_INDEX_USED = re.compile(r'USING (?:COVERING )?INDEX (\w+)|Index (?:Only )?Scan (?:Backward )?using (\w+)')
+
+
+class _Seeded(Exception):
+    pass
+
+
+def viewset_queryset(viewset, user, params=None, action='list'):
+    """The queryset a viewset action would run for ``user`` with these query parameters."""
+    view = viewset(action=action, format_kwarg=None, kwargs={})
+    view.request = Request(APIRequestFactory().get('/', params or {}))
+    view.request.user = user
+    return view.filter_queryset(view.get_queryset())
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway multi-shop dataset inside a transaction that is rolled back, then print '
+        'the query plan, the index used and timings for each list endpoint query.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--shops', type=int, default=20)
+        parser.add_argument('--products', type=int, default=1000, help='Per shop.')
+        parser.add_argument('--sales', type=int, default=5000, help='Per shop.')
+        parser.add_argument('--customers', type=int, default=500, help='Per shop.')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--compare', action='store_true',
+                            help='Run again with the composite indexes dropped (also rolled back).')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        with use_database(alias):
+            try:
+                with transaction.atomic(using=alias):
+                    shop = self.seed(alias, options)
+                    self.analyze(alias)
+                    results = [self.measure(shop, options['repeat'])]
+                    if options['compare']:
+                        self.drop_composite_indexes(alias)
+                        self.analyze(alias)
+                        results.append(self.measure(shop, options['repeat'], plans=False))
+                    raise _Seeded()
+            except _Seeded:
+                pass
+
+        header = f"{'query':<28}{'index':<30}{'rows':>7}{'ms':>9}"
+        if options['compare']:
+            header += f"{'ms w/o':>9}  index w/o"
+        self.stdout.write(header)
+        for name, (index, rows, ms) in results[0].items():
+            line = f"{name:<28}{index:<30}{rows:>7}{ms:>9.2f}"
+            if options['compare']:
+                old_index, _, old_ms = results[1][name]
+                line += f"{old_ms:>9.2f}  {old_index}"
+            self.stdout.write(line)
+
+    def seed(self, alias, options):
+        stamp = time.time_ns()
+        now = timezone.now()
+        users = [
+            User(email=f"explain-{stamp}-{n}@example.com", username=f"explain{n}", shop_name=f"Shop {n}", phone='0')
+            for n in range(options['shops'])
+        ]
+        # bulk_create throughout: no receivers, no shard assignment.
+        User.objects.using(alias).bulk_create(users)
+        categories = ['Grocery', 'Dairy', 'Bakery', 'Beverages', 'Personal care', 'Household']
+
+        for n, user in enumerate(users):
+            products = Product.objects.using(alias).bulk_create([
+                Product(
+                    product_code=f"EX{stamp}-{n}-{i}", product_name=f"Product {i}", category=categories[i % len(categories)],
+                    purchase_price=Decimal('40'), selling_price=Decimal('50'), stock_quantity=i % 50,
+                    barcode=f"890{n:04d}{i:06d}", is_active=i % 10 != 0, created_by=user,
+                    expiry_date=(now + timedelta(days=i % 400)).date(),
+                )
+                for i in range(options['products'])
+            ], batch_size=1000)
+            customers = AddCustomers.objects.using(alias).bulk_create([
+                AddCustomers(
+                    added_by=user, name=f"Customer {i}", phone=f"98{n:03d}{i:05d}", email='c@example.com', address='-',
+                    city='-', state='-', zip='-', country='IN', taxId='-', notes='',
+                )
+                for i in range(options['customers'])
+            ], batch_size=1000)
+            sales = Sale.objects.using(alias).bulk_create([
+                Sale(
+                    invoice_number=f"EX{stamp}-{n}-{i}", sold_by=user, customer=customers[i % len(customers)] if customers else None,
+                    sale_date=now - timedelta(minutes=i * 97), taxable_amount=Decimal('50'), total_amount=Decimal('50'),
+                )
+                for i in range(options['sales'])
+            ], batch_size=1000)
+            SaleItem.objects.using(alias).bulk_create([
+                SaleItem(sale=sale, product=products[i % len(products)], quantity=1, sale_price=Decimal('50'),
+                         taxable_amount=Decimal('50'), total_amount=Decimal('50'))
+                for i, sale in enumerate(sales)
+            ], batch_size=1000)
+            AddVendor.objects.using(alias).bulk_create([
+                AddVendor(created_by=user, name=f"Vendor {i}", phone='0') for i in range(20)
+            ])
+            Ticket.objects.using(alias).bulk_create([
+                Ticket(user=user, subject=f"Ticket {i}", description='-', status=['Open', 'Closed'][i % 2]) for i in range(20)
+            ])
+        return users[0]
+
+    def queries(self, shop):
+        today = timezone.localdate()
+        page = SaleViewSet.pagination_class.page_size
+        customer = AddCustomers.objects.filter(added_by=shop).first()
+        barcode = Product.objects.filter(created_by=shop).values_list('barcode', flat=True).last()
+        return {
+            'products': viewset_queryset(ProductViewSet, shop),
+            'products active+category': viewset_queryset(ProductViewSet, shop, {'is_active': 'true', 'category': 'Dairy'}),
+            'products barcode': viewset_queryset(ProductViewSet, shop, {'barcode': barcode}),
+            'products expiring soon': viewset_queryset(ProductViewSet, shop, {'expiry': 'expiring_soon'}),
+            'sales latest page': viewset_queryset(SaleViewSet, shop, {'ordering': '-sale_date'})[:page],
+            'sales this week': viewset_queryset(SaleViewSet, shop, {
+                'sale_date__date__gte': str(today - timedelta(days=7)), 'sale_date__date__lte': str(today),
+            }),
+            'sales list validators': Sale.objects.filter(sold_by=shop).order_by().values('sold_by')
+            .annotate(count=Count('id'), latest=Max('updated_at')),
+            'customers': viewset_queryset(CustomerViewSet, shop),
+            'customer sales': customer.sales.order_by('-sale_date'),
+            'vendors': viewset_queryset(AddVendorViewSet, shop),
+            'open tickets': viewset_queryset(TicketViewSet, shop, {'status': 'Open'}),
+        }
+
+    def measure(self, shop, repeat, plans=True):
+        # Times the SQL alone (execute + fetch), not model instantiation.
+        results = {}
+        for name, queryset in self.queries(shop).items():
+            sql, params = queryset.query.sql_with_params()
+            plan = queryset.explain()
+            if plans:
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write(f"  {queryset.query}")
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+            used = [match.group(1) or match.group(2) for match in _INDEX_USED.finditer(plan)]
+            timings = []
+            with connections[queryset.db].cursor() as cursor:
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    cursor.execute(sql, params)
+                    rows = len(cursor.fetchall())
+                    timings.append((time.perf_counter() - started) * 1000)
+            results[name] = (','.join(dict.fromkeys(used)) or 'full scan', rows, statistics.median(timings))
+        return results
+
+    def analyze(self, alias):
+        with connections[alias].cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def drop_composite_indexes(self, alias):
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            for name in COMPOSITE_INDEXES:
+                cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
@@ -0,0 +1,32 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.forecast import HISTORY_DAYS, forecast_demand
+from api.routers import each_shop_database
+
+
+class Command(BaseCommand):
+    help = 'Forecast daily demand from sales history and refresh reorder suggestions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only this shop (user id).')
+        parser.add_argument('--days', type=int, default=HISTORY_DAYS, help='Days of sales history to use.')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user'] is not None:
+            user = get_user_model().objects.filter(pk=options['user']).first()
+            if user is None:
+                raise CommandError(f"User {options['user']} does not exist")
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+
+        started = time.perf_counter()
+        written = 0
+        for _ in each_shop_database(user):
+            written += forecast_demand(user=user, history_days=options['days'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} reorder suggestions in {time.perf_counter() - started:.2f}s"
+        ))
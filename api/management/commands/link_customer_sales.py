@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.customers import link_existing_sales, recompute_customer_stats
+from api.models import AddCustomers
+from api.routers import each_shop_database
+
+
+class Command(BaseCommand):
+    help = 'Link historical sales to customers by phone and rebuild customer purchase stats.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only this shop (user id).')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        user = None
+        if options['user'] is not None:
+            user = User.objects.filter(pk=options['user']).first()
+            if user is None:
+                raise CommandError(f"User {options['user']} does not exist")
+
+        linked = 0
+        for _ in each_shop_database(user):
+            # Customers live on the shop databases and users on default, so
+            # find the shops here rather than joining across databases.
+            shop_ids = [user.pk] if user is not None else AddCustomers.objects.values_list('added_by', flat=True).distinct()
+            for shop in User.objects.filter(pk__in=list(shop_ids)):
+                linked += link_existing_sales(shop)
+                recompute_customer_stats(shop)
+        self.stdout.write(self.style.SUCCESS(f"Linked {linked} sales to customers"))
@@ -0,0 +1,98 @@
+import asyncio
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.models import Product, Sale, User
+from api.routers import use_shop
+
+
+# Each async endpoint next to the DRF view it stands in for, where one exists.
+DEFAULT_PATHS = [
+    '/api/products/?barcode={barcode}',
+    '/api/async/products/lookup/?barcode={barcode}',
+    '/api/sales/{sale}/',
+    '/api/async/sales/{sale}/',
+    '/api/async/subscription/',
+    '/api/async/dashboard/',
+]
+
+
+async def _hammer(client, path, headers, total, concurrency):
+    timings = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path, headers=headers)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            timings.append((time.perf_counter() - started) * 1000)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return timings, errors, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire concurrent authenticated GETs at a running server and report throughput and '
+        'latency per path. Start the server with the same settings, e.g. '
+        '"gunicorn -c gunicorn.conf.py" (ASGI) or "gunicorn backendbilling.wsgi" (WSGI), '
+        'and compare the async endpoints with their DRF counterparts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help="Email of the shop to run as; its data fills {barcode} and {sale}.")
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--path', action='append', dest='paths', help='Repeatable. Defaults to DEFAULT_PATHS.')
+        parser.add_argument('--requests', type=int, default=1000, help='Per path.')
+        parser.add_argument('--concurrency', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['user']}")
+
+        with use_shop(user):
+            values = {
+                'barcode': Product.objects.filter(created_by=user, barcode__isnull=False)
+                .values_list('barcode', flat=True).first(),
+                'sale': Sale.objects.filter(sold_by=user).values_list('id', flat=True).last(),
+            }
+        templates = options['paths'] or DEFAULT_PATHS
+        missing = [name for name, value in values.items() if value is None and any(f"{{{name}}}" in t for t in templates)]
+        if missing:
+            self.stderr.write(f"The shop has no {', '.join(missing)}; those paths will fail.")
+        try:
+            paths = [template.format(**values) for template in templates]
+        except KeyError as exc:
+            raise CommandError(f"Unknown placeholder {exc} in --path")
+
+        headers = {'Authorization': f"Bearer {AccessToken.for_user(user)}"}
+        self.stdout.write(f"{'path':<52}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+        for path in paths:
+            timings, errors, elapsed = asyncio.run(
+                self.run_path(options['url'], path, headers, options['requests'], options['concurrency'])
+            )
+            p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+            self.stdout.write(
+                f"{path:<52}{len(timings) / elapsed:>9.1f}{statistics.median(timings):>9.1f}{p95:>9.1f}{errors:>8}"
+            )
+
+    async def run_path(self, url, path, headers, total, concurrency):
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+            # Warm up connections and worker caches outside the measurement.
+            await _hammer(client, path, headers, concurrency, concurrency)
+            return await _hammer(client, path, headers, total, concurrency)
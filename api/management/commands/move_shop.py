@@ -0,0 +1,35 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.routers import SHARD_MAP_CACHE_TIMEOUT, shard_for
+from api.sharding import ShardMoveError, move_shop
+
+
+class Command(BaseCommand):
+    help = 'Move one shop\'s products, sales, customers and vendors to another database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', type=int, help='The shop (user id).')
+        parser.add_argument('database', help='Target database alias.')
+        parser.add_argument('--grace', type=float, default=SHARD_MAP_CACHE_TIMEOUT + 5,
+                            help='Seconds to wait for workers to pick up the shard map change.')
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(pk=options['user']).first()
+        if user is None:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        source = shard_for(user.pk)[0]
+        started = time.perf_counter()
+        try:
+            copied = move_shop(user, options['database'], grace=options['grace'])
+        except ShardMoveError as exc:
+            raise CommandError(str(exc))
+
+        for model, count in copied.items():
+            self.stdout.write(f"{model:<20}{count:>10}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved shop {user.pk} from {source} to {options['database']} in {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.inventory import rebuild_low_stock
+from api.routers import each_shop_database
+
+
+class Command(BaseCommand):
+    help = 'Recompute the low-stock queue from current product stock levels.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only this shop (user id).')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user'] is not None:
+            user = get_user_model().objects.filter(pk=options['user']).first()
+            if user is None:
+                raise CommandError(f"User {options['user']} does not exist")
+
+        count = 0
+        for _ in each_shop_database(user):
+            count += rebuild_low_stock(user=user)
+        self.stdout.write(self.style.SUCCESS(f"{count} products are below their minimum stock level"))
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.replicas import sync_sqlite_replica
+
+
+class Command(BaseCommand):
+    help = 'Refresh SQLite read replicas from their primaries (PostgreSQL replicas stream on their own).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', help='Only this primary alias.')
+
+    def handle(self, *args, **options):
+        pairs = dict(getattr(settings, 'REPLICA_ALIASES', {}))
+        if options['database']:
+            if options['database'] not in pairs:
+                raise CommandError(f"{options['database']} has no replica configured")
+            pairs = {options['database']: pairs[options['database']]}
+
+        for primary, replica in pairs.items():
+            if connections[primary].vendor != 'sqlite':
+                self.stdout.write(f"{primary}: skipped, {connections[primary].vendor} replicates itself")
+                continue
+            started = time.perf_counter()
+            pages = sync_sqlite_replica(primary, replica)
+            self.stdout.write(self.style.SUCCESS(
+                f"{primary} -> {replica}: {pages} pages in {time.perf_counter() - started:.2f}s"
+            ))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_gst_split'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HsnCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=8, unique=True)),
+                ('description', models.CharField(blank=True, default='', max_length=255)),
+                ('kind', models.CharField(choices=[('hsn', 'HSN (Goods)'), ('sac', 'SAC (Services)')], default='hsn', max_length=3)),
+                ('tax_rate', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'HSN/SAC Code',
+                'verbose_name_plural': 'HSN/SAC Codes',
+                'ordering': ['code'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='hsn_code',
+            field=models.CharField(blank=True, db_index=True, max_length=8, null=True),
+        ),
+    ]
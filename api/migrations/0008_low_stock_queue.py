@@ -0,0 +1,52 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_low_stock(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Product = apps.get_model('api', 'Product')
+    LowStockEntry = apps.get_model('api', 'LowStockEntry')
+    low = Product.objects.using(db_alias).filter(is_active=True, created_by__isnull=False, stock_quantity__lt=F('min_stock_level'))
+    LowStockEntry.objects.using(db_alias).bulk_create([
+        LowStockEntry(
+            product_id=product.id,
+            user_id=product.created_by_id,
+            supplier=product.supplier,
+            stock_quantity=product.stock_quantity,
+            min_stock_level=product.min_stock_level,
+            shortfall=product.min_stock_level - product.stock_quantity,
+        )
+        for product in low.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_reorder_suggestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStockEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('supplier', models.CharField(blank=True, max_length=100, null=True)),
+                ('stock_quantity', models.PositiveIntegerField(default=0)),
+                ('min_stock_level', models.PositiveIntegerField(default=0)),
+                ('shortfall', models.PositiveIntegerField(default=0)),
+                ('flagged_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='low_stock_entry', to='api.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='low_stock_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-shortfall'], name='lowstock_shop_shortfall_idx'), models.Index(fields=['user', 'supplier'], name='lowstock_shop_supplier_idx')],
+            },
+        ),
+        migrations.RunPython(fill_low_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_low_stock_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpiryDigest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField()),
+                ('buckets', models.JSONField(default=dict)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_by', 'expiry_date'], name='product_shop_expiry_idx'),
+        ),
+        migrations.AddField(
+            model_name='expirydigest',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='expiry_digest', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from api.normalize import normalize_phone
+
+
+def fill_phone_normalized(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    AddCustomers = apps.get_model('api', 'AddCustomers')
+    customers = list(AddCustomers.objects.using(db_alias).only('id', 'phone'))
+    for customer in customers:
+        customer.phone_normalized = normalize_phone(customer.phone)
+    AddCustomers.objects.using(db_alias).bulk_update(customers, ['phone_normalized'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_expiry_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='addcustomers',
+            name='last_purchase_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='addcustomers',
+            name='lifetime_value',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='addcustomers',
+            name='phone_normalized',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='addcustomers',
+            name='visit_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='customer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales', to='api.addcustomers'),
+        ),
+        migrations.AddIndex(
+            model_name='addcustomers',
+            index=models.Index(fields=['added_by', 'phone_normalized'], name='customer_shop_phone_idx'),
+        ),
+        migrations.RunPython(fill_phone_normalized, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:16
+
+from django.db import migrations, models
+
+from api.normalize import normalize_name
+
+
+def fill_name_normalized(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    AddCustomers = apps.get_model('api', 'AddCustomers')
+    customers = list(AddCustomers.objects.using(db_alias).only('id', 'name'))
+    for customer in customers:
+        customer.name_normalized = normalize_name(customer.name)
+    AddCustomers.objects.using(db_alias).bulk_update(customers, ['name_normalized'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_sale_customer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='addcustomers',
+            name='name_normalized',
+            field=models.CharField(blank=True, default='', max_length=225),
+        ),
+        migrations.AddIndex(
+            model_name='addcustomers',
+            index=models.Index(fields=['added_by', 'name_normalized'], name='customer_shop_name_idx'),
+        ),
+        migrations.RunPython(fill_name_normalized, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_shop_shard'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='addcustomers',
+            index=models.Index(fields=['added_by', 'created_at'], name='customer_shop_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='addvendor',
+            index=models.Index(fields=['created_by', 'created_at'], name='vendor_shop_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_by', 'category', 'is_active'], name='product_shop_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_by', 'barcode'], name='product_shop_barcode_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['sold_by', 'sale_date'], name='sale_shop_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['sold_by', 'updated_at'], name='sale_shop_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['customer', 'sale_date'], name='sale_customer_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['user', 'status'], name='ticket_user_status_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_tenant_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaleArchive',
+            fields=[
+                ('invoice_number', models.CharField(blank=True, max_length=50, null=True, unique=True)),
+                ('sale_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('customer_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('customer_phone', models.CharField(blank=True, max_length=20, null=True)),
+                ('customer_address', models.TextField(blank=True, null=True)),
+                ('customer_gst', models.CharField(blank=True, max_length=15, null=True)),
+                ('customer_state', models.CharField(blank=True, max_length=100, null=True)),
+                ('customer_state_code', models.CharField(blank=True, max_length=20, null=True)),
+                ('discount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('tax_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('taxable_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('cgst_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('sgst_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('igst_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('tax_breakdown', models.JSONField(blank=True, default=dict)),
+                ('payment_method', models.CharField(default='cash', max_length=50)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('include_gst', models.BooleanField(default=True)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_sales', to='api.addcustomers')),
+                ('sold_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SaleItemArchive',
+            fields=[
+                ('quantity', models.PositiveIntegerField()),
+                ('product_name', models.CharField(blank=True, max_length=225, null=True)),
+                ('sale_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('tax_rate', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('tax_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('taxable_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('cgst_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('sgst_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('igst_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_sale_items', to='api.product')),
+                ('sale', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='api.salearchive')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='salearchive',
+            index=models.Index(fields=['sold_by', 'sale_date'], name='salearchive_shop_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salearchive',
+            index=models.Index(fields=['customer', 'sale_date'], name='salearchive_customer_date_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+from django.db import DEFAULT_DB_ALIAS, migrations
+
+from api.tax import is_inter_state, split_tax, state_code
+
+
+BACKFILL_CHUNK_SIZE = 500
+
+
+def _shop_states(apps):
+    # As sale_tax_settings: the bill settings GSTIN first, then the profile's.
+    # Both live on default; a shard only holds copies of its shops' users.
+    User = apps.get_model('api', 'User')
+    BillSettings = apps.get_model('api', 'BillSettings')
+    states = {
+        user_id: state_code(gst_number)
+        for user_id, gst_number in User.objects.using(DEFAULT_DB_ALIAS).values_list('id', 'gst_number')
+    }
+    for user_id, gst_number in BillSettings.objects.using(DEFAULT_DB_ALIAS).exclude(gst_number='').values_list('user_id', 'gst_number'):
+        states[user_id] = state_code(gst_number)
+    return states
+
+
+def backfill_gst_split(apps, schema_editor):
+    """
+    Sales written before 0005 have tax_amount but zero CGST/SGST/IGST, which
+    the GSTR-1 report sums. Split their stored tax (not re-priced): IGST when
+    the shop's and customer's states differ, otherwise half CGST, half SGST.
+    """
+    db_alias = schema_editor.connection.alias
+    shop_states = _shop_states(apps)
+    fields = ['cgst_amount', 'sgst_amount', 'igst_amount']
+
+    for sale_name, item_name in (('Sale', 'SaleItem'), ('SaleArchive', 'SaleItemArchive')):
+        Sale = apps.get_model('api', sale_name)
+        SaleItem = apps.get_model('api', item_name)
+        sales = list(
+            Sale.objects.using(db_alias)
+            .filter(cgst_amount=0, sgst_amount=0, igst_amount=0).exclude(tax_amount=0)
+            .only('id', 'sold_by', 'customer_state_code', 'customer_gst', 'tax_amount')
+        )
+        for start in range(0, len(sales), BACKFILL_CHUNK_SIZE):
+            chunk = sales[start:start + BACKFILL_CHUNK_SIZE]
+            inter_state = {}
+            for sale in chunk:
+                customer_state = sale.customer_state_code or state_code(sale.customer_gst)
+                inter_state[sale.id] = is_inter_state(shop_states.get(sale.sold_by_id), customer_state)
+                sale.cgst_amount, sale.sgst_amount, sale.igst_amount = split_tax(sale.tax_amount, inter_state[sale.id])
+            Sale.objects.using(db_alias).bulk_update(chunk, fields)
+
+            items = list(
+                SaleItem.objects.using(db_alias)
+                .filter(sale_id__in=inter_state, cgst_amount=0, sgst_amount=0, igst_amount=0).exclude(tax_amount=0)
+                .only('id', 'sale_id', 'tax_amount')
+            )
+            for item in items:
+                item.cgst_amount, item.sgst_amount, item.igst_amount = split_tax(item.tax_amount, inter_state[item.sale_id])
+            SaleItem.objects.using(db_alias).bulk_update(items, fields, batch_size=BACKFILL_CHUNK_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_sale_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_gst_split, migrations.RunPython.noop),
+    ]
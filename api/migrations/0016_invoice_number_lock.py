@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_backfill_gst_split'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceNumberLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=10, unique=True)),
+            ],
+        ),
+    ]
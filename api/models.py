@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from datetime import timedelta
+from .normalize import normalize_name, normalize_phone
+from .routers import invoice_prefix, shop_db
 
 
 class User(AbstractUser):
@@ -21,6 +23,10 @@ class User(AbstractUser):
     referred_by = models.CharField(max_length=225,null=True,blank=True)
 
     plan_status = models.CharField(max_length=100, default='inactive')
+
+    # Bumped on every write to the shop profile, bank details, terms or bill
+    # settings (see api/signals.py); used as a cheap HTTP validator.
+    profile_version = models.PositiveIntegerField(default=0)
     
 
     USERNAME_FIELD = 'email'
@@ -30,6 +36,18 @@ class User(AbstractUser):
         return self.email
     
 
+class ShopShard(models.Model):
+    # Which database alias holds a shop's products, sales, customers and
+    # vendors (see api/routers.py). Shops without a row live on default.
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='shard')
+    alias = models.CharField(max_length=50)
+    moving = models.BooleanField(default=False)
+    assigned_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.user_id} on {self.alias}"
+
+
 class Plan(models.Model):
     name = models.CharField(max_length=100)  # e.g., "5 Minute Test Plan"
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -104,6 +122,11 @@ class Ticket(models.Model):
     admin_feedback = models.TextField(blank=True, null=True)
     feedback_date = models.DateTimeField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status'], name='ticket_user_status_idx'),
+        ]
+
     def __str__(self):
         return f"{self.subject} - {self.get_status_display()}"
 
@@ -127,6 +150,40 @@ class TicketAttachment(models.Model):
     
 from datetime import date,timedelta
 
+class HsnCode(models.Model):
+    KIND_CHOICES = [
+        ('hsn', 'HSN (Goods)'),
+        ('sac', 'SAC (Services)'),
+    ]
+
+    code = models.CharField(max_length=8, unique=True)
+    description = models.CharField(max_length=255, blank=True, default='')
+    kind = models.CharField(max_length=3, choices=KIND_CHOICES, default='hsn')
+    tax_rate = models.DecimalField(max_digits=5, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['code']
+        verbose_name = 'HSN/SAC Code'
+        verbose_name_plural = 'HSN/SAC Codes'
+
+    def __str__(self):
+        return f"{self.code} ({self.tax_rate}%)"
+
+
+def expiry_status_label(expiry_date, days_left):
+    if not expiry_date:
+        return "No expiry"
+    if days_left < 0:
+        return "Expired"
+    elif days_left == 0:
+        return "Expires Today"
+    elif days_left <= 7:
+        return f"Expires in {days_left} days"
+    else:
+        return f"Valid Until {expiry_date}"
+
+
 class Product(models.Model):
     product_code = models.CharField(max_length=50, unique=True, blank=True, null=True)
     product_name = models.CharField(max_length=255)
@@ -137,6 +194,7 @@ class Product(models.Model):
     stock_quantity = models.PositiveIntegerField(default=0)
     min_stock_level = models.PositiveIntegerField(default=0)
     barcode = models.CharField(max_length=100, blank=True, null=True)
+    hsn_code = models.CharField(max_length=8, blank=True, null=True, db_index=True)
     tax_rate = models.DecimalField(max_digits=5, decimal_places=2, default=0)
     discount = models.DecimalField(max_digits=5, decimal_places=2, default=0)
     expiry_date = models.DateField(blank=True, null=True)
@@ -148,6 +206,14 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_by', 'updated_at'], name='product_shop_updated_idx'),
+            models.Index(fields=['created_by', 'expiry_date'], name='product_shop_expiry_idx'),
+            models.Index(fields=['created_by', 'category', 'is_active'], name='product_shop_category_idx'),
+            models.Index(fields=['created_by', 'barcode'], name='product_shop_barcode_idx'),
+        ]
+
     def __str__(self):
         return self.product_name
 
@@ -161,20 +227,7 @@ class Product(models.Model):
     
     @property
     def expiry_status(self):
-        if not self.expiry_date:
-            return "No expiry"
-
-        today = date.today()
-
-        if self.expiry_date < today:
-            return "Expired"
-        elif self.expiry_date == today:
-            return "Expires Today"
-        elif self.expiry_date <= today + timedelta(days=7):
-             days_left = (self.expiry_date - today).days
-             return f"Expires in {days_left} days"
-        else:
-            return f"Valid Until {self.expiry_date}"
+        return expiry_status_label(self.expiry_date, self.days_to_expiry)
 
     @property
     def days_to_expiry(self):
@@ -184,11 +237,89 @@ class Product(models.Model):
 
 
 
+class ProductTombstone(models.Model):
+    # Left behind when a product is deleted so catalog delta sync can report it.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='product_tombstones')
+    product_id = models.BigIntegerField()
+    product_code = models.CharField(max_length=50, blank=True, null=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_shop_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Deleted product {self.product_id}"
+
+
+class LowStockEntry(models.Model):
+    # One row per active product whose stock is below min_stock_level, kept in
+    # step by api.inventory whenever stock changes.
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='low_stock_entry')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='low_stock_entries')
+    supplier = models.CharField(max_length=100, blank=True, null=True)
+    stock_quantity = models.PositiveIntegerField(default=0)
+    min_stock_level = models.PositiveIntegerField(default=0)
+    shortfall = models.PositiveIntegerField(default=0)
+    flagged_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-shortfall'], name='lowstock_shop_shortfall_idx'),
+            models.Index(fields=['user', 'supplier'], name='lowstock_shop_supplier_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} short by {self.shortfall}"
+
+
+class ReorderSuggestion(models.Model):
+    # Written in bulk by the forecast_demand command, read by the reorder endpoint.
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='reorder_suggestion')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reorder_suggestions')
+    daily_demand = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    safety_stock = models.PositiveIntegerField(default=0)
+    reorder_point = models.PositiveIntegerField(default=0)
+    order_up_to = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'reorder_point'], name='reorder_shop_point_idx'),
+        ]
+
+    def __str__(self):
+        return f"Reorder {self.product_id} at {self.reorder_point}"
+
+
+class ExpiryDigest(models.Model):
+    # Nightly per-shop snapshot of products grouped into expiry windows
+    # (see api.expiry): {bucket: {"count": n, "product_ids": [...]}}.
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='expiry_digest')
+    as_of = models.DateField()
+    buckets = models.JSONField(default=dict)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Expiry digest for {self.user_id} on {self.as_of}"
+
+
+class InvoiceNumberLock(models.Model):
+    # One row per invoice prefix on each shop database, locked while numbers
+    # are allocated so concurrent sales on PostgreSQL take turns reading the
+    # last number. SQLite's IMMEDIATE transactions already serialise writers.
+    prefix = models.CharField(max_length=10, unique=True)
+
+    def __str__(self):
+        return self.prefix
 
-class Sale(models.Model):
+
+class SaleRecord(models.Model):
+    # Columns shared by Sale and SaleArchive.
     invoice_number = models.CharField(max_length=50, unique=True, blank=True, null=True)
     sold_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
-    sale_date = models.DateTimeField(auto_now_add=True)
+    sale_date = models.DateTimeField(default=timezone.now)
     customer_name = models.CharField(max_length=255, blank=True, null=True)
     customer_phone = models.CharField(max_length=20, blank=True, null=True)
     customer_address = models.TextField(blank=True, null=True)
@@ -199,25 +330,64 @@ class Sale(models.Model):
     tax_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     taxable_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    cgst_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    sgst_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    igst_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Per-rate totals from api.tax.price_basket, e.g. {"18.00": {"taxable_amount": "100.00", ...}}
+    tax_breakdown = models.JSONField(default=dict, blank=True)
     payment_method = models.CharField(max_length=50, default='cash')
     notes = models.TextField(blank=True, null=True)
     include_gst = models.BooleanField(default=True)
-    
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
     def __str__(self):
         return f"Invoice #{self.invoice_number} - {self.total_amount}"
+
+
+class Sale(SaleRecord):
+    customer = models.ForeignKey(
+        'AddCustomers', on_delete=models.SET_NULL, null=True, blank=True, related_name='sales'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sold_by', 'sale_date'], name='sale_shop_date_idx'),
+            models.Index(fields=['sold_by', 'updated_at'], name='sale_shop_updated_idx'),
+            models.Index(fields=['customer', 'sale_date'], name='sale_customer_date_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.invoice_number:
-            last_invoice = Sale.objects.order_by('-id').first()
-            last_number = int(last_invoice.invoice_number.split('-')[1]) if last_invoice and last_invoice.invoice_number else 0
-            self.invoice_number = f"INV-{last_number + 1:05d}"
+            with transaction.atomic(using=shop_db()):
+                self.invoice_number = Sale.next_invoice_numbers()[0]
+                super().save(*args, **kwargs)
+            return
         super().save(*args, **kwargs)
 
-from decimal import Decimal
-
-class SaleItem(models.Model):
-    sale = models.ForeignKey(Sale, related_name='items', on_delete=models.CASCADE)
-    product = models.ForeignKey(Product, on_delete=models.PROTECT)
+    @classmethod
+    def next_invoice_numbers(cls, count=1):
+        """
+        The next ``count`` invoice numbers on the shop's database. Call it in
+        the transaction that saves the sales: the prefix's InvoiceNumberLock
+        row stays locked until that commits.
+        """
+        prefix = invoice_prefix()
+        lock, created = InvoiceNumberLock.objects.get_or_create(prefix=prefix)
+        if not created:
+            InvoiceNumberLock.objects.select_for_update().get(pk=lock.pk)
+        last_invoice = (
+            cls.objects.filter(invoice_number__startswith=prefix).order_by('-id').first()
+            # Every sale may have been archived; numbering continues from there.
+            or SaleArchive.objects.filter(invoice_number__startswith=prefix).order_by('-id').first()
+        )
+        last_number = int(last_invoice.invoice_number.split('-')[1]) if last_invoice and last_invoice.invoice_number else 0
+        return [f"{prefix}{last_number + offset:05d}" for offset in range(1, count + 1)]
+
+class SaleLineRecord(models.Model):
+    # Columns shared by SaleItem and SaleItemArchive.
     quantity = models.PositiveIntegerField()
     product_name = models.CharField(max_length=225,blank=True,null=True)
     sale_price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -225,16 +395,72 @@ class SaleItem(models.Model):
     tax_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     taxable_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    
+    cgst_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    sgst_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    igst_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+
+class SaleItem(SaleLineRecord):
+    sale = models.ForeignKey(Sale, related_name='items', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.PROTECT)
+
+    def apply_tax(self, line_tax):
+        for field, value in line_tax._asdict().items():
+            setattr(self, field, value)
+
     def save(self, *args, **kwargs):
-        self.taxable_amount = self.sale_price * self.quantity
-        self.tax_amount = self.taxable_amount * (Decimal(str(self.tax_rate)) / Decimal('100'))
-        self.total_amount = self.taxable_amount + self.tax_amount
+        # Lines are priced with the sale's tax type and place of supply when
+        # the basket is recorded (api.sales.record_sales); a plain save must
+        # not re-price them as exclusive, intra-state.
+        adding = self._state.adding
         super().save(*args, **kwargs)
-        
-        # Update product stock
-        self.product.stock_quantity -= self.quantity
-        self.product.save()
+
+        # Update product stock, once, for a line added outside record_sales.
+        if adding:
+            self.product.stock_quantity -= self.quantity
+            self.product.save()
+
+
+class SaleSyncKey(models.Model):
+    # Client-generated key for a sale uploaded by an offline POS counter.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sale_sync_keys')
+    idempotency_key = models.CharField(max_length=64)
+    sale = models.ForeignKey(Sale, on_delete=models.CASCADE, related_name='sync_keys')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='unique_sale_sync_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.idempotency_key} -> {self.sale_id}"
+
+
+class SaleArchive(SaleRecord):
+    # Sales older than the archive horizon, moved here by the archive_sales
+    # command with their ids, so lists and aggregates only scan recent sales.
+    id = models.BigIntegerField(primary_key=True)
+    updated_at = models.DateTimeField()
+    customer = models.ForeignKey(
+        'AddCustomers', on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_sales'
+    )
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sold_by', 'sale_date'], name='salearchive_shop_date_idx'),
+            models.Index(fields=['customer', 'sale_date'], name='salearchive_customer_date_idx'),
+        ]
+
+
+class SaleItemArchive(SaleLineRecord):
+    id = models.BigIntegerField(primary_key=True)
+    sale = models.ForeignKey(SaleArchive, related_name='items', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='archived_sale_items')
 
 
 class AddCustomers(models.Model):
@@ -264,11 +490,39 @@ class AddCustomers(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Filled from phone and name on save; sales are matched to customers on
+    # the phone, and checkout typeahead runs prefix ranges over both.
+    phone_normalized = models.CharField(max_length=20, blank=True, default='')
+    name_normalized = models.CharField(max_length=225, blank=True, default='')
+
+    # Maintained incrementally by api.customers as sales are recorded.
+    visit_count = models.PositiveIntegerField(default=0)
+    lifetime_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_purchase_at = models.DateTimeField(blank=True, null=True)
+
     def __str__(self):
         return f"{self.name} ({self.get_status_display()})"
 
+    def save(self, *args, **kwargs):
+        self.phone_normalized = normalize_phone(self.phone)
+        self.name_normalized = normalize_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'phone' in update_fields:
+                update_fields.add('phone_normalized')
+            if 'name' in update_fields:
+                update_fields.add('name_normalized')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['added_by', 'phone_normalized'], name='customer_shop_phone_idx'),
+            models.Index(fields=['added_by', 'name_normalized'], name='customer_shop_name_idx'),
+            models.Index(fields=['added_by', 'created_at'], name='customer_shop_created_idx'),
+        ]
         permissions = [
             ('can_activate_customer', 'Can activate customer'),
             ('can_deactivate_customer', 'Can deactivate customer'),
@@ -318,6 +572,9 @@ class AddVendor(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_by', 'created_at'], name='vendor_shop_created_idx'),
+        ]
         verbose_name = 'Vendor'
         verbose_name_plural = 'Vendors'
 
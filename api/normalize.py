@@ -0,0 +1,56 @@
+import re
+import unicodedata
+
+
+# Indian numbers are 10 digits; anything longer carries a +91 / 0 prefix.
+PHONE_DIGITS = 10
+
+_NON_DIGITS = re.compile(r'\D')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_phone(phone):
+    """'+91 98765-43210', '098765 43210' and '9876543210' all become '9876543210'."""
+    digits = _NON_DIGITS.sub('', phone or '')
+    return digits[-PHONE_DIGITS:]
+
+
+def normalize_phone_prefix(text):
+    """Digits a stored phone_normalized would start with, for partial input."""
+    text = (text or '').strip()
+    if text.startswith('+91'):
+        text = text[3:]
+    digits = _NON_DIGITS.sub('', text)
+    if len(digits) > PHONE_DIGITS:
+        return digits[-PHONE_DIGITS:]
+    return digits.lstrip('0')
+
+
+def normalize_name(name):
+    """Case- and accent-insensitive form with single spaces: ' José  KUMAR' -> 'jose kumar'."""
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _SPACES.sub(' ', stripped.casefold()).strip()
+
+
+def _next_char(char):
+    # Surrogates cannot be stored in a text column; step over them.
+    code = ord(char) + 1
+    return chr(0xE000 if 0xD800 <= code <= 0xDFFF else code)
+
+
+def prefix_range(prefix):
+    """
+    (lower, upper) bounds matching every string that starts with ``prefix``;
+    ``upper`` is exclusive, or None when there is none.
+
+    A range comparison can use a plain B-tree index on every backend, unlike
+    LIKE 'prefix%' (case-insensitive on SQLite) or LIKE under non-C
+    collations on PostgreSQL. The upper bound is the prefix with its last
+    character incremented ('jos' -> 'jot') rather than the prefix followed by
+    U+10FFFF, which only sorts last under binary (C) collation.
+    """
+    stem = prefix.rstrip('\U0010ffff')
+    if not stem:
+        return prefix, None
+    return prefix, stem[:-1] + _next_char(stem[-1])
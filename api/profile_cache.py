@@ -0,0 +1,96 @@
+from django.core.cache import cache
+
+from .models import BillSettings, User
+from .tax import EXCLUSIVE, state_code
+
+
+PROFILE_CACHE_TIMEOUT = 60 * 60 * 24
+
+PROFILE_URL_FIELDS = ['profile_photo', 'signature']
+BILL_SETTINGS_URL_FIELDS = ['logo_url', 'signature_url']
+
+
+def _cache_key(user_id, version):
+    return f"shop-profile:{user_id}:{version}"
+
+
+def build_shop_profile(user_id):
+    # Imported here because serializers -> sales -> profile_cache would be circular.
+    from .serializers import BillSettingsSerializer, UserSerializerBank
+
+    user = (
+        User.objects.select_related('bank_details', 'bill_settings')
+        .prefetch_related('terms')
+        .get(pk=user_id)
+    )
+    try:
+        bill_settings = user.bill_settings
+    except BillSettings.DoesNotExist:
+        bill_settings = None
+
+    # Serialized without a request, so file fields hold relative media URLs.
+    return {
+        'version': user.profile_version,
+        'profile': dict(UserSerializerBank(user).data),
+        'bill_settings': dict(BillSettingsSerializer(bill_settings).data) if bill_settings else None,
+    }
+
+
+def get_shop_profile(user):
+    """
+    Everything that brands a shop's documents, in one cached snapshot.
+
+    Combines the user's shop fields, bank details, terms and bill settings.
+    The cache key carries User.profile_version, which signals bump on every
+    write to any of those tables, so a write invalidates the snapshot without
+    an explicit delete and a read costs no queries while the version holds.
+    """
+    snapshot = cache.get(_cache_key(user.id, user.profile_version))
+    if snapshot is None:
+        snapshot = build_shop_profile(user.id)
+        cache.set(_cache_key(user.id, snapshot['version']), snapshot, PROFILE_CACHE_TIMEOUT)
+    return snapshot
+
+
+def _absolute(request, data, fields):
+    data = dict(data)
+    for field in fields:
+        if data.get(field):
+            data[field] = request.build_absolute_uri(data[field])
+    return data
+
+
+def profile_for_request(request, snapshot):
+    return _absolute(request, snapshot['profile'], PROFILE_URL_FIELDS)
+
+
+def bill_settings_for_request(request, snapshot):
+    return _absolute(request, snapshot['bill_settings'], BILL_SETTINGS_URL_FIELDS)
+
+
+def invoice_shop_details(snapshot):
+    profile = snapshot['profile']
+    bank_details = profile.get('bank_details') or {}
+    return {
+        'shop_name': profile['shop_name'],
+        'address': profile['address'] or '',
+        'phone': profile['phone'],
+        'email': profile['email'],
+        'gst_number': profile['gst_number'] or '',
+        'upi_id': profile['upi_id'] or '',
+        'signature': profile['signature'],
+        'bank_name': bank_details.get('bank_name', ''),
+        'account_number': bank_details.get('account_number', ''),
+        'ifsc_code': bank_details.get('ifsc_code', ''),
+        'branch': bank_details.get('branch', ''),
+        'terms': [term['term'] for term in profile['terms']],
+    }
+
+
+def sale_tax_settings(snapshot):
+    """Return (tax_type, shop_state_code) used to price this shop's sales."""
+    bill_settings = snapshot['bill_settings']
+    # Shops that never saved bill settings keep the historical exclusive pricing.
+    tax_type = bill_settings['tax_type_on_sale'] if bill_settings else EXCLUSIVE
+    gst_number = (bill_settings or {}).get('gst_number') or snapshot['profile']['gst_number']
+    return tax_type, state_code(gst_number)
@@ -0,0 +1,191 @@
+import textwrap
+from collections import namedtuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .events import broker, print_channel
+from .profile_cache import get_shop_profile
+from .routers import shop_db
+
+
+ESC = b'\x1b'
+GS = b'\x1d'
+
+ESCPOS_INIT = ESC + b'@'
+ESCPOS_ALIGN = {'left': ESC + b'a\x00', 'center': ESC + b'a\x01', 'right': ESC + b'a\x02'}
+ESCPOS_BOLD_ON = ESC + b'E\x01'
+ESCPOS_BOLD_OFF = ESC + b'E\x00'
+ESCPOS_FEED_AND_CUT = ESC + b'd\x03' + GS + b'V\x01'
+
+# Printers ship with code page 437; anything outside it prints as '?'.
+ESCPOS_ENCODING = 'cp437'
+
+# Characters per line: 58mm paper is 32, 80mm paper is 48 (font A).
+RECEIPT_WIDTHS = (32, 42, 48)
+DEFAULT_RECEIPT_WIDTH = 48
+
+Line = namedtuple('Line', ['text', 'align', 'bold'])
+Layout = namedtuple('Layout', ['width', 'show_customer_details', 'text_header', 'text_footer', 'escpos_header', 'escpos_footer'])
+
+_layouts = {}
+_MAX_LAYOUTS = 512
+
+
+def _wrap(text, width, align='left', bold=False):
+    lines = []
+    for paragraph in str(text).splitlines() or ['']:
+        lines.extend(Line(chunk, align, bold) for chunk in textwrap.wrap(paragraph, width) or [''])
+    return lines
+
+
+def _pair(left, right, width):
+    right = str(right)
+    left = str(left)[:max(width - len(right) - 1, 0)]
+    return left + ' ' * (width - len(left) - len(right)) + right
+
+
+def _line_text(line, width):
+    if line.align == 'center':
+        return line.text.center(width).rstrip()
+    if line.align == 'right':
+        return line.text.rjust(width)
+    return line.text
+
+
+def _lines_to_text(lines, width):
+    return ''.join(_line_text(line, width) + '\n' for line in lines)
+
+
+def _lines_to_escpos(lines):
+    chunks = []
+    for line in lines:
+        chunks.append(ESCPOS_ALIGN[line.align])
+        if line.bold:
+            chunks.append(ESCPOS_BOLD_ON)
+        chunks.append(line.text.encode(ESCPOS_ENCODING, errors='replace') + b'\n')
+        if line.bold:
+            chunks.append(ESCPOS_BOLD_OFF)
+    return b''.join(chunks)
+
+
+def compile_layout(snapshot, width):
+    """
+    Pre-render the parts of a receipt that only depend on the shop.
+
+    Header and footer are produced once per profile version and width, both
+    as text and as ESC/POS bytes, so rendering a sale only formats its items.
+    """
+    profile = snapshot['profile']
+    bill_settings = snapshot['bill_settings'] or {}
+    rule = Line('-' * width, 'left', False)
+
+    header = _wrap(bill_settings.get('header') or profile['shop_name'], width, 'center', True)
+    if bill_settings.get('subheader'):
+        header += _wrap(bill_settings['subheader'], width, 'center')
+    if profile['address']:
+        header += _wrap(profile['address'], width, 'center')
+    header += _wrap(f"Ph: {profile['phone']}", width, 'center')
+    gst_number = bill_settings.get('gst_number') or profile['gst_number']
+    if gst_number:
+        header += _wrap(f"GSTIN: {gst_number}", width, 'center')
+    header.append(rule)
+
+    footer = [rule]
+    if bill_settings.get('footer'):
+        footer += _wrap(bill_settings['footer'], width, 'center')
+    for term in profile['terms']:
+        footer += _wrap(term['term'], width)
+
+    show_customer_details = bill_settings.get('show_customer_details', profile['show_customer_details'])
+    return Layout(
+        width=width,
+        show_customer_details=show_customer_details,
+        text_header=_lines_to_text(header, width),
+        text_footer=_lines_to_text(footer, width),
+        escpos_header=ESCPOS_INIT + _lines_to_escpos(header),
+        escpos_footer=_lines_to_escpos(footer) + ESCPOS_FEED_AND_CUT,
+    )
+
+
+def get_layout(user, width=DEFAULT_RECEIPT_WIDTH):
+    snapshot = get_shop_profile(user)
+    key = (user.id, snapshot['version'], width)
+    layout = _layouts.get(key)
+    if layout is None:
+        if len(_layouts) >= _MAX_LAYOUTS:
+            _layouts.clear()
+        layout = _layouts[key] = compile_layout(snapshot, width)
+    return layout
+
+
+def _body_lines(sale, layout):
+    width = layout.width
+    bill = f"Bill: {sale.invoice_number}"
+    sold_at = timezone.localtime(sale.sale_date).strftime('%d-%m-%Y %H:%M')
+    if len(bill) < width - len(sold_at):
+        lines = [Line(_pair(bill, sold_at, width), 'left', False)]
+    else:
+        # 32-column paper: the date goes on its own line rather than cutting the number short.
+        lines = _wrap(bill, width) + [Line(sold_at, 'right', False)]
+    if layout.show_customer_details and (sale.customer_name or sale.customer_phone):
+        customer = ' '.join(filter(None, [sale.customer_name, sale.customer_phone]))
+        lines += _wrap(f"Customer: {customer}", width)
+    lines.append(Line('-' * width, 'left', False))
+
+    items = sale.items.values_list('product_name', 'product__product_name', 'quantity', 'sale_price', 'total_amount')
+    for product_name, current_name, quantity, sale_price, total_amount in items:
+        lines += _wrap(product_name or current_name, width)
+        lines.append(Line(_pair(f"  {quantity} x {sale_price}", total_amount, width), 'left', False))
+
+    lines.append(Line('-' * width, 'left', False))
+    lines.append(Line(_pair('Subtotal', sale.taxable_amount, width), 'left', False))
+    if sale.igst_amount:
+        lines.append(Line(_pair('IGST', sale.igst_amount, width), 'left', False))
+    elif sale.cgst_amount or sale.sgst_amount:
+        lines.append(Line(_pair('CGST', sale.cgst_amount, width), 'left', False))
+        lines.append(Line(_pair('SGST', sale.sgst_amount, width), 'left', False))
+    else:
+        lines.append(Line(_pair('Tax', sale.tax_amount, width), 'left', False))
+    if sale.discount:
+        lines.append(Line(_pair('Discount', f"-{sale.discount}", width), 'left', False))
+    lines.append(Line(_pair('TOTAL', sale.total_amount, width), 'left', True))
+    lines.append(Line(_pair('Paid by', sale.payment_method.upper(), width), 'left', False))
+    return lines
+
+
+def render_text_receipt(sale, layout):
+    return layout.text_header + _lines_to_text(_body_lines(sale, layout), layout.width) + layout.text_footer
+
+
+def render_escpos_receipt(sale, layout):
+    return layout.escpos_header + _lines_to_escpos(_body_lines(sale, layout)) + layout.escpos_footer
+
+
+def prints_automatically(user):
+    snapshot = get_shop_profile(user)
+    bill_settings = snapshot['bill_settings'] or {}
+    return bool(snapshot['profile']['print_automatically'] or bill_settings.get('print_automatically'))
+
+
+def parse_receipt_width(value):
+    try:
+        width = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_RECEIPT_WIDTH
+    return width if width in RECEIPT_WIDTHS else DEFAULT_RECEIPT_WIDTH
+
+
+def queue_receipts(user, sales):
+    """
+    Wake the shop's print agent stream in this process once the transaction
+    commits; the stream reads the new sales itself (see print_queue).
+    """
+    channel = print_channel(user.id)
+
+    def publish():
+        if broker.has_subscribers(channel) and prints_automatically(user):
+            for sale in sales:
+                broker.publish(channel, sale.id)
+
+    transaction.on_commit(publish, using=shop_db())
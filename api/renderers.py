@@ -0,0 +1,114 @@
+import msgpack
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# Whatever orjson / msgpack can't encode natively (Decimal, lazy strings,
+# and datetimes, passed through so they keep DRF's format) gets exactly
+# what DRF's own encoder would give it.
+_encode_default = JSONEncoder().default
+
+# U+2028 / U+2029 in UTF-8; escaped like JSONRenderer does, so the output
+# stays a JavaScript subset.
+_LINE_SEPARATORS = {'\u2028'.encode(): b'\\u2028', '\u2029'.encode(): b'\\u2029'}
+
+
+class PlainTextRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return str(data).encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    # Only used for content negotiation; CSV reports are streamed directly.
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return str(data).encode(self.charset)
+
+
+class EscPosRenderer(BaseRenderer):
+    """Raw ESC/POS command stream for thermal receipt printers."""
+    media_type = 'application/vnd.escpos'
+    format = 'escpos'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return str(data).encode('ascii', errors='replace')
+
+
+class EventStreamRenderer(BaseRenderer):
+    # Only used for content negotiation; event streams are written directly.
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return f"event: error\ndata: {data}\n\n".encode(self.charset)
+
+
+class OrjsonRenderer(JSONRenderer):
+    """
+    JSONRenderer, encoded by orjson. The JSON is the same except for floats:
+    orjson spells some differently (1e16, not 1e+16) and writes NaN and
+    infinities as null. Indented output (?indent=, or an indent media type
+    parameter) is left to JSONRenderer, as orjson only indents by two.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=_encode_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+        for separator, escaped in _LINE_SEPARATORS.items():
+            if separator in ret:
+                ret = ret.replace(separator, escaped)
+        return ret
+
+
+class OrjsonParser(JSONParser):
+    renderer_class = OrjsonRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Binary alternative for POS clients: Accept: application/msgpack."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_encode_default)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read())
+        except (msgpack.UnpackException, ValueError) as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
@@ -0,0 +1,64 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .routers import read_from_replica
+
+
+def _write_cache_key(user_id):
+    return f"shop-wrote:{user_id}"
+
+
+def note_shop_write(user_id):
+    """Pin the shop's reads to the primary until the replica has caught up."""
+    sticky = getattr(settings, 'REPLICA_STICKY_SECONDS', 0)
+    if getattr(settings, 'REPLICA_ALIASES', None) and sticky:
+        cache.set(_write_cache_key(user_id), time.time(), sticky)
+
+
+def wrote_recently(user_id):
+    return cache.get(_write_cache_key(user_id)) is not None
+
+
+class ReplicaReadMixin:
+    """
+    View mixin that serves ``replica_actions`` from the read replica.
+
+    Only safe requests qualify, and not for a shop that wrote within
+    REPLICA_STICKY_SECONDS (see note_shop_write), so a shop always sees its
+    own sales and edits. Plain APIViews name their handler, e.g. ``('get',)``.
+    """
+
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        action = getattr(self, 'action', None) or request.method.lower()
+        if (
+            request.method in SAFE_METHODS
+            and action in self.replica_actions
+            and request.user.is_authenticated
+            and not wrote_recently(request.user.pk)
+        ):
+            read_from_replica()
+
+
+def sync_sqlite_replica(primary, replica):
+    """
+    Copy a consistent snapshot of a SQLite primary over its replica with the
+    online backup API. Readers of the replica see either the old or the new
+    snapshot; the primary only holds a read lock while pages are copied.
+    Returns the number of pages copied.
+    """
+    source = sqlite3.connect(connections[primary].settings_dict['NAME'], timeout=20)
+    target = sqlite3.connect(connections[replica].settings_dict['NAME'], timeout=20)
+    try:
+        source.backup(target)
+        return source.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        target.close()
+        source.close()
@@ -0,0 +1,189 @@
+import csv
+import json
+from datetime import date, datetime, time, timedelta
+from itertools import chain
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import SaleItem, SaleItemArchive
+from .tax import TWO_PLACES, ZERO, state_code
+
+
+# Rows are pulled from the database in chunks of this size, so memory stays
+# flat however many invoices the month holds.
+REPORT_CHUNK_SIZE = 2000
+
+# Archived lines are read alongside recent ones, so a month on either side
+# of the archive horizon (or straddling it) is reported whole.
+ITEM_SOURCES = (SaleItemArchive, SaleItem)
+
+TAX_SUMS = {
+    'taxable_value': Sum('taxable_amount'),
+    'igst': Sum('igst_amount'),
+    'cgst': Sum('cgst_amount'),
+    'sgst': Sum('sgst_amount'),
+}
+
+
+def _money(key):
+    # SQLite returns SUM() of decimals without a fixed scale.
+    return lambda row: (row[key] or ZERO).quantize(TWO_PLACES)
+
+
+TAX_COLUMNS = [(key, _money(key)) for key in TAX_SUMS]
+
+
+def month_bounds(value):
+    """Parse YYYY-MM into [first day, first day of next month)."""
+    year, month = (int(part) for part in value.split('-'))
+    start = date(year, month, 1)
+    end = date(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _items(model, user, start, end):
+    # Compare against datetimes (not __date) so the sale_date index is usable.
+    return model.objects.filter(
+        sale__sold_by=user,
+        sale__sale_date__gte=_day_start(start),
+        sale__sale_date__lt=_day_start(end),
+    )
+
+
+def _registered():
+    return Q(sale__customer_gst__isnull=False) & ~Q(sale__customer_gst='')
+
+
+def _place_of_supply(row):
+    # As record_sales: the stated code, else the state in the customer's GSTIN.
+    return row['sale__customer_state_code'] or state_code(row.get('sale__customer_gst'))
+
+
+def _supply_type(row):
+    return 'INTER' if row['igst'] else 'INTRA'
+
+
+def b2b_rows(items):
+    # Grouped per invoice and rate; the other sale columns depend on sale_id.
+    return (
+        items.filter(_registered())
+        .values(
+            'sale_id', 'sale__invoice_number', 'sale__sale_date', 'sale__customer_gst',
+            'sale__customer_name', 'sale__customer_state_code', 'sale__total_amount', 'tax_rate',
+        )
+        .annotate(**TAX_SUMS)
+        .order_by('sale_id', 'tax_rate')
+    )
+
+
+def b2cs_rows(items):
+    return (
+        items.exclude(_registered())
+        .values('sale__customer_state_code', 'tax_rate')
+        .annotate(invoices=Count('sale_id', distinct=True), **TAX_SUMS)
+        .order_by('sale__customer_state_code', 'tax_rate')
+    )
+
+
+def rate_rows(items):
+    return (
+        items
+        .values('tax_rate')
+        .annotate(invoices=Count('sale_id', distinct=True), quantity=Sum('quantity'), **TAX_SUMS)
+        .order_by('tax_rate')
+    )
+
+
+# section -> (query, [(output column, row key or callable)], grouping keys).
+# Sections without grouping keys have one row per invoice, which lives in
+# exactly one of the sources.
+SECTIONS = {
+    'b2b': (b2b_rows, [
+        ('gstin', 'sale__customer_gst'),
+        ('receiver_name', 'sale__customer_name'),
+        ('invoice_number', 'sale__invoice_number'),
+        ('invoice_date', 'sale__sale_date'),
+        ('invoice_value', 'sale__total_amount'),
+        ('place_of_supply', _place_of_supply),
+        ('rate', 'tax_rate'),
+    ] + TAX_COLUMNS, None),
+    'b2cs': (b2cs_rows, [
+        ('place_of_supply', _place_of_supply),
+        ('supply_type', _supply_type),
+        ('rate', 'tax_rate'),
+        ('invoices', 'invoices'),
+    ] + TAX_COLUMNS, ('sale__customer_state_code', 'tax_rate')),
+    'rates': (rate_rows, [
+        ('rate', 'tax_rate'),
+        ('invoices', 'invoices'),
+        ('quantity', 'quantity'),
+    ] + TAX_COLUMNS, ('tax_rate',)),
+}
+
+
+def section_columns(section):
+    return [name for name, _ in SECTIONS[section][1]]
+
+
+def _merge(rows, group):
+    # Add up groups present in both sources; grouped sections are small.
+    merged = {}
+    for row in rows:
+        key = tuple(row[name] for name in group)
+        if key not in merged:
+            merged[key] = dict(row)
+            continue
+        for name, value in row.items():
+            if name not in group:
+                merged[key][name] = (merged[key][name] or 0) + (value or 0)
+    for key in sorted(merged, key=lambda key: tuple((value is None, value) for value in key)):
+        yield merged[key]
+
+
+def section_rows(user, section, start, end):
+    query, columns, group = SECTIONS[section]
+    rows = chain.from_iterable(
+        query(_items(model, user, start, end)).iterator(chunk_size=REPORT_CHUNK_SIZE) for model in ITEM_SOURCES
+    )
+    if group is not None:
+        rows = _merge(rows, group)
+    for row in rows:
+        yield [key(row) if callable(key) else row[key] for _, key in columns]
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(user, section, start, end):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(section_columns(section))
+    for row in section_rows(user, section, start, end):
+        yield writer.writerow(row)
+
+
+def stream_json(user, sections, start, end):
+    """
+    Emit {"period": ..., "<section>": [{...}, ...], ...} piece by piece.
+
+    Nothing is accumulated: each row is encoded and yielded as soon as the
+    database cursor returns it.
+    """
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    yield '{"period":%s' % encoder.encode({'from': start, 'to': end - timedelta(days=1)})
+    for section in sections:
+        columns = section_columns(section)
+        yield ',%s:[' % json.dumps(section)
+        separator = ''
+        for row in section_rows(user, section, start, end):
+            yield separator + encoder.encode(dict(zip(columns, row)))
+            separator = ','
+        yield ']'
+    yield '}'
@@ -0,0 +1,263 @@
+import contextvars
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Tables holding one shop's data. They live on the shop's database; users,
+# plans, the HSN master and the shard map itself always stay on default.
+SHARDED_MODELS = frozenset({
+    'product', 'producttombstone', 'lowstockentry', 'reordersuggestion', 'expirydigest',
+    'sale', 'saleitem', 'salesynckey', 'salearchive', 'saleitemarchive', 'addcustomers', 'addvendor',
+    'invoicenumberlock',
+})
+
+# Ids on the Nth shard start at N * SHARD_ID_RANGE, so a shop's rows keep
+# their ids (which POS clients cache) when it moves between databases.
+SHARD_ID_RANGE = 10 ** 12
+
+# Per-process cache, so also how long a worker may act on an old map entry;
+# move_shop waits this out.
+SHARD_MAP_CACHE_TIMEOUT = 30
+
+_current_database = contextvars.ContextVar('shop_database', default=None)
+_read_replica = contextvars.ContextVar('read_replica', default=False)
+
+
+def shard_aliases():
+    return list(getattr(settings, 'SHARD_ALIASES', []))
+
+
+def shop_databases():
+    """Every alias that can hold shop data: default first, then the shards."""
+    return [DEFAULT_DB_ALIAS, *shard_aliases()]
+
+
+def shop_db():
+    """The database the current request's (or command's) shop lives on."""
+    return _current_database.get() or DEFAULT_DB_ALIAS
+
+
+def replica_for(alias):
+    return getattr(settings, 'REPLICA_ALIASES', {}).get(alias, alias)
+
+
+def primary_for(alias):
+    for primary, replica in getattr(settings, 'REPLICA_ALIASES', {}).items():
+        if replica == alias:
+            return primary
+    return alias
+
+
+def invoice_prefix(alias=None):
+    """
+    Invoice numbers are minted per database; each shard gets its own prefix
+    (INV1-, INV2-, ...) so numbers stay unique when a shop moves. Keep the
+    order of DB_SHARDS stable.
+    """
+    index = shop_databases().index(alias or shop_db())
+    return f"INV{index or ''}-"
+
+
+def _shard_cache_key(user_id):
+    return f"shop-shard:{user_id}"
+
+
+def shard_for(user_id):
+    """(alias, moving) for a shop. Shops missing from the map live on default."""
+    entry = cache.get(_shard_cache_key(user_id))
+    if entry is None:
+        from .models import ShopShard
+
+        entry = (
+            ShopShard.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id).values_list('alias', 'moving').first()
+            or (DEFAULT_DB_ALIAS, False)
+        )
+        cache.set(_shard_cache_key(user_id), tuple(entry), SHARD_MAP_CACHE_TIMEOUT)
+    return tuple(entry)
+
+
+def forget_shard(user_id):
+    cache.delete(_shard_cache_key(user_id))
+
+
+def activate_database(alias):
+    # Reset by ShopDatabaseMiddleware when the request ends.
+    _current_database.set(alias)
+
+
+@contextmanager
+def use_database(alias):
+    token = _current_database.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_database.reset(token)
+
+
+def use_shop(user):
+    return use_database(shard_for(user.pk)[0])
+
+
+def read_from_replica():
+    # Reset by ShopDatabaseMiddleware when the request ends.
+    _read_replica.set(True)
+
+
+def each_shop_database(user=None):
+    """
+    Iterate the databases a batch job has to visit with each one active:
+    only the shop's own database for a single shop, otherwise all of them.
+    """
+    aliases = [shard_for(user.pk)[0]] if user is not None else shop_databases()
+    for alias in aliases:
+        with use_database(alias):
+            yield alias
+
+
+def bind_database(iterable):
+    """
+    Keep a lazily consumed body (a streaming response) on the databases of
+    the request that built it; it is iterated after the middleware resets.
+    """
+    context = contextvars.copy_context()
+    iterator = iter(iterable)
+    while True:
+        try:
+            item = context.run(next, iterator)
+        except StopIteration:
+            return
+        yield item
+
+
+async def abind_database(iterable):
+    """
+    bind_database for ASGI: an async iterator over a sync ``iterable``
+    whose steps run on the request's sync thread, as the async ORM's do, so
+    the server sends each chunk as it is produced instead of collecting the
+    whole body in a thread first.
+    """
+    context = contextvars.copy_context()
+    iterator = iter(iterable)
+    step = sync_to_async(context.run)
+    while True:
+        item = await step(next, iterator, StopIteration)
+        if item is StopIteration:
+            return
+        yield item
+
+
+def served_async(request):
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def streaming_body(request, iterable):
+    """A streaming response body for ``iterable`` suited to the server: WSGI or ASGI."""
+    return abind_database(iterable) if served_async(request) else bind_database(iterable)
+
+
+class ShardRouter:
+    """
+    Send shop tables to the current shop's database.
+
+    An instance already loaded from a shard keeps using it, so related
+    lookups and saves follow the row. Every database gets the full schema;
+    shards carry mirror rows of their shops' users for the foreign keys.
+    """
+
+    def _route(self, model, **hints):
+        if model._meta.app_label != 'api' or model._meta.model_name not in SHARDED_MODELS:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._meta.model_name in SHARDED_MODELS and instance._state.db:
+            return primary_for(instance._state.db)
+        return shop_db()
+
+    db_for_read = _route
+    db_for_write = _route
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaRouter:
+    """
+    Send reads to the replica of whatever database ShardRouter picks, while
+    a view has opted in with read_from_replica(). Writes, and anything read
+    outside such a view, stay on the primary. Listed before ShardRouter.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _read_replica.get():
+            return None
+        return replica_for(ShardRouter().db_for_read(model, **hints))
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get their schema from the primary.
+        if primary_for(db) != db:
+            return False
+        return None
+
+
+class ShopDatabaseMiddleware:
+    # Async-capable, so async views under ASGI stay on the event loop
+    # instead of being pushed through a thread by this middleware.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        context = contextvars.copy_context()
+        context.run(_current_database.set, None)
+        context.run(_read_replica.set, False)
+        return context.run(self.get_response, request)
+
+    async def __acall__(self, request):
+        # Each ASGI request already runs in its own task (its own context);
+        # just start it clean and put things back afterwards.
+        database = _current_database.set(None)
+        replica = _read_replica.set(False)
+        try:
+            return await self.get_response(request)
+        finally:
+            _read_replica.reset(replica)
+            _current_database.reset(database)
+
+
+def reserve_id_range(using=DEFAULT_DB_ALIAS, **kwargs):
+    """post_migrate: start each shard's shop tables at its own id range."""
+    databases = shop_databases()
+    if using not in databases or databases.index(using) == 0:
+        return
+    offset = databases.index(using) * SHARD_ID_RANGE
+    connection = connections[using]
+    models = [model for model in django_apps.get_app_config('api').get_models() if model._meta.model_name in SHARDED_MODELS]
+
+    with connection.cursor() as cursor:
+        for model in models:
+            table = model._meta.db_table
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, offset])
+                elif row[0] < offset:
+                    cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = %s", [offset, table])
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                    f"GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM {connection.ops.quote_name(table)})))",
+                    [table, offset],
+                )
+
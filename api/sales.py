@@ -0,0 +1,81 @@
+from django.db import transaction
+
+from .customers import link_customers, record_customer_visits
+from .hsn import resolve_tax_rate
+from .inventory import apply_stock_deltas
+from .models import Sale, SaleItem
+from .profile_cache import get_shop_profile, sale_tax_settings
+from .routers import shop_db
+from .tax import EXCLUSIVE, is_inter_state, price_basket, state_code
+
+
+def record_sales(sold_by, sales_data, allow_oversell=False):
+    """
+    Create several sales with their items using batched writes.
+
+    Each entry in ``sales_data`` is a validated sale payload whose ``items``
+    hold ``product`` instances and quantities. Each basket is priced by the
+    GST engine using the shop's tax_type_on_sale and the customer's state.
+    Invoice numbers are allocated once for the whole batch, inside the
+    transaction that writes them (see Sale.next_invoice_numbers); sales and
+    items are written with bulk_create, and stock is decremented with a single
+    bulk_update; selling more than is in stock is refused unless
+    ``allow_oversell`` (see apply_stock_deltas). Sales are linked to the
+    shop's customers by phone and their running stats updated.
+    Returns (sales, oversold).
+    """
+    tax_type, shop_state = sale_tax_settings(get_shop_profile(sold_by)) if sold_by else (EXCLUSIVE, None)
+    sales = []
+    sale_items = []
+    stock_deltas = {}
+
+    for data in sales_data:
+        fields = dict(data)
+        items_data = fields.pop('items')
+        sale = Sale(sold_by=sold_by, **fields)
+        customer_state = sale.customer_state_code or state_code(sale.customer_gst)
+
+        items = [
+            SaleItem(
+                sale=sale,
+                product=item_data['product'],
+                product_name=item_data['product'].product_name,
+                quantity=item_data['quantity'],
+                sale_price=item_data['product'].selling_price,
+                tax_rate=resolve_tax_rate(item_data['product'].hsn_code, item_data['product'].tax_rate or 0),
+            )
+            for item_data in items_data
+        ]
+        priced, totals, breakdown = price_basket(
+            ((item.sale_price, item.quantity, item.tax_rate) for item in items),
+            tax_type=tax_type,
+            inter_state=is_inter_state(shop_state, customer_state),
+        )
+        for item, line_tax in zip(items, priced):
+            item.apply_tax(line_tax)
+            stock_deltas[item.product.id] = stock_deltas.get(item.product.id, 0) + item.quantity
+
+        sale.taxable_amount = totals['taxable_amount']
+        sale.tax_amount = totals['tax_amount']
+        sale.cgst_amount = totals['cgst_amount']
+        sale.sgst_amount = totals['sgst_amount']
+        sale.igst_amount = totals['igst_amount']
+        sale.total_amount = totals['total_amount'] - sale.discount
+        sale.tax_breakdown = breakdown
+        sales.append(sale)
+        sale_items.append(items)
+
+    with transaction.atomic(using=shop_db()):
+        # Numbered inside the transaction, which holds the numbering lock.
+        for sale, invoice_number in zip(sales, Sale.next_invoice_numbers(len(sales))):
+            sale.invoice_number = invoice_number
+        link_customers(sold_by, sales)
+        Sale.objects.bulk_create(sales)
+        for sale, items in zip(sales, sale_items):
+            for item in items:
+                item.sale = sale
+        SaleItem.objects.bulk_create([item for items in sale_items for item in items])
+        _, oversold = apply_stock_deltas(stock_deltas, allow_oversell=allow_oversell)
+        record_customer_visits(sales)
+
+    return sales, oversold
@@ -5,6 +5,11 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.db.models import Sum
+from .batch import BATCH_MAX_REQUESTS
+from .hsn import hsn_rates
+from .routers import use_shop
+from .sales import record_sales
 
 User = get_user_model()
 
@@ -142,13 +147,84 @@ class TicketFeedbackSerializer(serializers.ModelSerializer):
 
 
 class ProductSerializer(serializers.ModelSerializer):
-    expiry_status = serializers.ReadOnlyField()
-    days_to_expiry = serializers.ReadOnlyField()
+    expiry_status = serializers.SerializerMethodField()
+    days_to_expiry = serializers.SerializerMethodField()
     
     class Meta:
         model = Product
         fields = '__all__'
-        
+
+    def get_days_to_expiry(self, obj):
+        # Querysets from annotate_days_to_expiry carry the difference already.
+        if hasattr(obj, 'expiry_delta'):
+            return obj.expiry_delta.days if obj.expiry_delta is not None else None
+        return obj.days_to_expiry
+
+    def get_expiry_status(self, obj):
+        return expiry_status_label(obj.expiry_date, self.get_days_to_expiry(obj))
+
+    def validate(self, attrs):
+        # A code from the HSN/SAC master dictates the rate; unknown codes keep the given one.
+        hsn_code = attrs.get('hsn_code')
+        if hsn_code in hsn_rates():
+            attrs['tax_rate'] = hsn_rates()[hsn_code]
+        return attrs
+
+
+class HsnCodeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = HsnCode
+        fields = ['id', 'code', 'description', 'kind', 'tax_rate', 'updated_at']
+        read_only_fields = ['updated_at']
+
+
+class BulkPriceUpdateSerializer(serializers.Serializer):
+    FIELD_CHOICES = ['selling_price', 'purchase_price']
+    OPERATION_CHOICES = ['percent', 'amount', 'set']
+
+    field = serializers.ChoiceField(choices=FIELD_CHOICES, default='selling_price')
+    operation = serializers.ChoiceField(choices=OPERATION_CHOICES)
+    value = serializers.DecimalField(max_digits=10, decimal_places=2)
+    category = serializers.CharField(required=False)
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    product_codes = serializers.ListField(child=serializers.CharField(), required=False, allow_empty=False)
+
+    def validate(self, attrs):
+        if not any(key in attrs for key in ('category', 'ids', 'product_codes')):
+            raise serializers.ValidationError('Provide at least one of category, ids or product_codes.')
+        if attrs['operation'] == 'percent' and attrs['value'] <= -100:
+            raise serializers.ValidationError({'value': 'Percentage change must be greater than -100.'})
+        if attrs['operation'] == 'set' and attrs['value'] < 0:
+            raise serializers.ValidationError({'value': 'Price cannot be negative.'})
+        return attrs
+
+
+class BatchEntrySerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET'], default='GET')
+    path = serializers.RegexField(r'^/api/', max_length=2000)
+    headers = serializers.DictField(child=serializers.CharField(), required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchEntrySerializer(many=True, allow_empty=False, max_length=BATCH_MAX_REQUESTS)
+
+
+class BulkStockItemSerializer(serializers.Serializer):
+    product_code = serializers.CharField()
+    quantity = serializers.IntegerField()
+
+
+class BulkStockUpdateSerializer(serializers.Serializer):
+    MODE_CHOICES = ['set', 'adjust']
+
+    mode = serializers.ChoiceField(choices=MODE_CHOICES, default='set')
+    items = BulkStockItemSerializer(many=True, allow_empty=False)
+
+    def validate(self, attrs):
+        if attrs['mode'] == 'set' and any(item['quantity'] < 0 for item in attrs['items']):
+            raise serializers.ValidationError({'items': 'Stock quantity cannot be negative.'})
+        return attrs
+
 
 class CustomerSerializer(serializers.ModelSerializer):
     user_details = UserSerializer(source='added_by', read_only=True)
@@ -156,7 +232,8 @@ class CustomerSerializer(serializers.ModelSerializer):
     class Meta:
         model = AddCustomers
         fields = '__all__'
-        read_only_fields = ('added_by', 'created_at', 'updated_at')
+        read_only_fields = ('added_by', 'created_at', 'updated_at', 'phone_normalized', 'name_normalized',
+                            'visit_count', 'lifetime_value', 'last_purchase_at')
 
 
 class CustomerStatusSerializer(serializers.Serializer):
@@ -189,14 +266,18 @@ class BillSettingsSerializer(serializers.ModelSerializer):
             'signature': {'write_only': True, 'required': False},
         }
 
+    def _file_url(self, file):
+        request = self.context.get('request')
+        return request.build_absolute_uri(file.url) if request else file.url
+
     def get_logo_url(self, obj):
         if obj.logo:
-            return self.context['request'].build_absolute_uri(obj.logo.url)
+            return self._file_url(obj.logo)
         return None
 
     def get_signature_url(self, obj):
         if obj.signature:
-            return self.context['request'].build_absolute_uri(obj.signature.url)
+            return self._file_url(obj.signature)
         return None
     
 
@@ -231,6 +312,9 @@ class SimpleProductSerializer(serializers.ModelSerializer):
         return Sale.objects.filter(product=obj).count()
 
 class SaleDetailSerializer(serializers.ModelSerializer):
+    # Units of the product on the sale, annotated by ProductWithSalesSerializer.
+    quantity = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = Sale
         fields = ['id', 'quantity', 'sale_date', 'customer_name']
@@ -245,16 +329,21 @@ class ProductWithSalesSerializer(serializers.ModelSerializer):
                  'stock_quantity', 'selling_price', 'sales','expiry_status']
 
     def get_sales(self, obj):
-        sales = Sale.objects.filter(product=obj).order_by('-sale_date')
+        sales = Sale.objects.filter(items__product=obj).annotate(quantity=Sum('items__quantity')).order_by('-sale_date')
         return SaleDetailSerializer(sales, many=True).data
 
 class UserProductsWithSalesSerializer(serializers.ModelSerializer):
-    products = ProductWithSalesSerializer(many=True, read_only=True, source='product_set')
+    products = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = ['id', 'shop_name', 'email', 'phone', 'profile_photo', 'products']
 
+    def get_products(self, obj):
+        # Each listed shop's products and sales live on its own database.
+        with use_shop(obj):
+            return ProductWithSalesSerializer(obj.product_set.all(), many=True).data
+
 
 
 class SaleItemSerializer(serializers.ModelSerializer):
@@ -264,7 +353,9 @@ class SaleItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = SaleItem
         fields = ['id', 'product', 'product_id', 'product_name', 'quantity', 'sale_price', 
-                 'tax_rate', 'tax_amount', 'taxable_amount', 'total_amount']
+                 'tax_rate', 'tax_amount', 'taxable_amount', 'total_amount',
+                 'cgst_amount', 'sgst_amount', 'igst_amount']
+        read_only_fields = ['cgst_amount', 'sgst_amount', 'igst_amount']
 
 class SaleSerializer(serializers.ModelSerializer):
     items = SaleItemSerializer(many=True)
@@ -275,30 +366,37 @@ class SaleSerializer(serializers.ModelSerializer):
         fields = ['id', 'invoice_number', 'sold_by', 'sale_date', 'customer_name', 
                  'customer_phone', 'customer_address', 'customer_gst', 'customer_state',
                  'customer_state_code', 'discount', 'tax_amount', 'taxable_amount',
-                 'total_amount', 'payment_method', 'notes', 'include_gst', 'items']
+                 'total_amount', 'cgst_amount', 'sgst_amount', 'igst_amount', 'tax_breakdown',
+                 'payment_method', 'notes', 'include_gst', 'customer', 'items']
+        read_only_fields = ['sale_date', 'cgst_amount', 'sgst_amount', 'igst_amount', 'tax_breakdown', 'customer']
     
     def create(self, validated_data):
-        items_data = validated_data.pop('items')
-        sale = Sale.objects.create(**validated_data)
-        
-        for item_data in items_data:
-            product = item_data['product']
-            SaleItem.objects.create(
-                sale=sale,
-                product=product,
-                quantity=item_data['quantity'],
-                sale_price=product.selling_price,
-                tax_rate=product.tax_rate or 0
-            )
-        
-        # Calculate totals
-        sale.taxable_amount = sum(item.taxable_amount for item in sale.items.all())
-        sale.tax_amount = sum(item.tax_amount for item in sale.items.all())
-        sale.total_amount = sale.taxable_amount + sale.tax_amount - sale.discount
-        sale.save()
-        
-        return sale
-    
+        sales, _ = record_sales(validated_data.pop('sold_by', None), [validated_data])
+        return sales[0]
+
+
+class SyncSaleItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class SyncSaleSerializer(serializers.ModelSerializer):
+    idempotency_key = serializers.CharField(max_length=64)
+    items = SyncSaleItemSerializer(many=True, allow_empty=False)
+
+    class Meta:
+        model = Sale
+        fields = ['idempotency_key', 'sale_date', 'customer_name', 'customer_phone',
+                 'customer_address', 'customer_gst', 'customer_state', 'customer_state_code',
+                 'discount', 'payment_method', 'notes', 'include_gst', 'items']
+        extra_kwargs = {
+            'sale_date': {'required': False}
+        }
+
+
+class SaleSyncSerializer(serializers.Serializer):
+    sales = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=1000)
+
 
 
 
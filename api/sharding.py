@@ -0,0 +1,148 @@
+import time
+from itertools import islice
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+
+from .models import (
+    AddCustomers, AddVendor, ExpiryDigest, LowStockEntry, Product, ProductTombstone, ReorderSuggestion,
+    Sale, SaleArchive, SaleItem, SaleItemArchive, SaleSyncKey, ShopShard, User,
+)
+from .routers import SHARD_MAP_CACHE_TIMEOUT, forget_shard, shard_for, shop_databases
+
+
+MOVE_CHUNK_SIZE = 2000
+
+# Every sharded table with the lookup that selects one shop's rows, parents
+# before children: copied in this order, deleted in reverse.
+MOVE_PLAN = [
+    (Product, 'created_by'),
+    (AddCustomers, 'added_by'),
+    (AddVendor, 'created_by'),
+    (Sale, 'sold_by'),
+    (SaleItem, 'sale__sold_by'),
+    (SaleArchive, 'sold_by'),
+    (SaleItemArchive, 'sale__sold_by'),
+    (SaleSyncKey, 'user'),
+    (ProductTombstone, 'user'),
+    (LowStockEntry, 'user'),
+    (ReorderSuggestion, 'user'),
+    (ExpiryDigest, 'user'),
+]
+
+# Columns that are unique per database and may clash when rows move.
+UNIQUE_COLUMNS = [(Product, 'product_code'), (Sale, 'invoice_number'), (SaleArchive, 'invoice_number')]
+
+
+class ShardMoveError(Exception):
+    pass
+
+
+def mirror_user(user, alias):
+    """
+    Insert or refresh a copy of the user row on a shard, so shop rows there
+    can keep their foreign key to it. The copy is never read for auth.
+    """
+    if alias == DEFAULT_DB_ALIAS:
+        return
+    fields = [field for field in User._meta.concrete_fields if not field.primary_key]
+    copy = User(pk=user.pk, **{field.attname: getattr(user, field.attname) for field in fields})
+    User.objects.using(alias).bulk_create(
+        [copy], update_conflicts=True, unique_fields=['id'], update_fields=[field.name for field in fields],
+    )
+
+
+def set_shop_database(user, alias, moving=False):
+    ShopShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(user=user, defaults={'alias': alias, 'moving': moving})
+    forget_shard(user.pk)
+
+
+def assign_shop(user):
+    """Place a new shop on a database, spreading shops evenly by id."""
+    databases = shop_databases()
+    alias = databases[user.pk % len(databases)]
+    mirror_user(user, alias)
+    set_shop_database(user, alias)
+    return alias
+
+
+def _shop_rows(model, owner, user, alias):
+    return model._base_manager.using(alias).filter(**{owner: user})
+
+
+def _batches(iterator, size):
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def find_conflicts(user, source, target):
+    """Ids and unique values of the shop's rows that already exist on ``target``."""
+    conflicts = []
+    for model, owner in MOVE_PLAN:
+        ids = _shop_rows(model, owner, user, source).values_list('pk', flat=True)
+        for batch in _batches(ids.iterator(), MOVE_CHUNK_SIZE):
+            if model._base_manager.using(target).filter(pk__in=batch).exists():
+                conflicts.append(f"{model.__name__} ids")
+                break
+    for model, column in UNIQUE_COLUMNS:
+        owner = dict(MOVE_PLAN)[model]
+        values = _shop_rows(model, owner, user, source).exclude(**{f'{column}__isnull': True}).values_list(column, flat=True)
+        for batch in _batches(values.iterator(), MOVE_CHUNK_SIZE):
+            clashing = list(model._base_manager.using(target).filter(**{f'{column}__in': batch}).values_list(column, flat=True)[:5])
+            if clashing:
+                conflicts.append(f"{model.__name__}.{column} {', '.join(clashing)}")
+                break
+    return conflicts
+
+
+def move_shop(user, target, grace=SHARD_MAP_CACHE_TIMEOUT + 5, chunk_size=MOVE_CHUNK_SIZE):
+    """
+    Copy a shop's rows to ``target`` with their ids, switch the shard map,
+    then delete them from the source.
+
+    While the move runs the shop is flagged as moving: reads carry on against
+    the source and writes are refused with 503. ``grace`` must outlast the
+    shard map cache so every worker has seen the flag (before copying) and
+    the new alias (before the source rows go). Returns rows copied per model.
+    """
+    source, moving = shard_for(user.pk)
+    if target not in shop_databases():
+        raise ShardMoveError(f"Unknown database {target!r}")
+    if target == source:
+        raise ShardMoveError(f"Shop {user.pk} is already on {target}")
+    if moving:
+        raise ShardMoveError(f"Shop {user.pk} is already being moved")
+
+    set_shop_database(user, source, moving=True)
+    try:
+        time.sleep(grace)
+        conflicts = find_conflicts(user, source, target)
+        if conflicts:
+            raise ShardMoveError(f"Rows already on {target}: {'; '.join(conflicts)}")
+
+        mirror_user(user, target)
+        copied = {}
+        with transaction.atomic(using=target):
+            for model, owner in MOVE_PLAN:
+                rows = _shop_rows(model, owner, user, source).order_by('pk').iterator(chunk_size=chunk_size)
+                copied[model.__name__] = 0
+                for batch in _batches(rows, chunk_size):
+                    model._base_manager.using(target).bulk_create(batch)
+                    copied[model.__name__] += len(batch)
+            for model, owner in MOVE_PLAN:
+                if _shop_rows(model, owner, user, target).count() != copied[model.__name__]:
+                    raise ShardMoveError(f"{model.__name__} row count differs after copying")
+    except IntegrityError as exc:
+        set_shop_database(user, source)
+        raise ShardMoveError(str(exc)) from exc
+    except BaseException:
+        set_shop_database(user, source)
+        raise
+
+    set_shop_database(user, target)
+    time.sleep(grace)
+    # Raw deletes: the copies are live now, so no cascades or receivers
+    # (customer stats, low-stock queue) may run against them.
+    with transaction.atomic(using=source):
+        for model, owner in reversed(MOVE_PLAN):
+            _shop_rows(model, owner, user, source)._raw_delete(source)
+    return copied
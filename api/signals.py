@@ -0,0 +1,83 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .customers import forget_customer_visit
+from .hsn import invalidate_hsn_rates
+from .inventory import refresh_low_stock, sync_low_stock
+from .models import BankDetails, BillSettings, HsnCode, Product, Sale, TermsAndConditions, User
+from .routers import forget_shard, shard_aliases, shard_for, use_database
+from .sharding import assign_shop, mirror_user
+
+
+def bump_profile_version(user_id, user=None):
+    User.objects.filter(pk=user_id).update(profile_version=F('profile_version') + 1)
+    # Keep an in-memory copy in step so a later save() does not write the old number back.
+    if user is not None:
+        user.profile_version += 1
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login', 'profile_version'}:
+        return
+    bump_profile_version(instance.pk, instance)
+
+
+@receiver(post_save, sender=User)
+def user_shard(sender, instance, created, using, update_fields=None, **kwargs):
+    if using != DEFAULT_DB_ALIAS or not shard_aliases():
+        return
+    if created:
+        assign_shop(instance)
+    elif not (update_fields and set(update_fields) <= {'last_login', 'profile_version'}):
+        mirror_user(instance, shard_for(instance.pk)[0])
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, using, **kwargs):
+    # Read before the cascade removes the ShopShard row.
+    instance._shop_database = shard_for(instance.pk)[0]
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, using, **kwargs):
+    # The delete on default cannot reach rows on the shop's shard.
+    alias = getattr(instance, '_shop_database', DEFAULT_DB_ALIAS)
+    if using == DEFAULT_DB_ALIAS and alias != DEFAULT_DB_ALIAS:
+        forget_shard(instance.pk)
+        with use_database(alias):
+            User.objects.using(alias).filter(pk=instance.pk).delete()
+
+
+@receiver(post_save, sender=BankDetails)
+@receiver(post_delete, sender=BankDetails)
+@receiver(post_save, sender=TermsAndConditions)
+@receiver(post_delete, sender=TermsAndConditions)
+@receiver(post_save, sender=BillSettings)
+@receiver(post_delete, sender=BillSettings)
+def profile_part_changed(sender, instance, **kwargs):
+    bump_profile_version(instance.user_id, instance._state.fields_cache.get('user'))
+
+
+@receiver(post_save, sender=HsnCode)
+@receiver(post_delete, sender=HsnCode)
+def hsn_code_changed(sender, instance, **kwargs):
+    invalidate_hsn_rates()
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    # Covers single edits, imports and per-item stock decrements; bulk stock
+    # writers call sync_low_stock themselves.
+    if instance.get_deferred_fields():
+        refresh_low_stock([instance.pk])
+    else:
+        sync_low_stock([instance])
+
+
+@receiver(post_delete, sender=Sale)
+def sale_deleted(sender, instance, **kwargs):
+    if instance.customer_id is not None:
+        forget_customer_visit(instance)
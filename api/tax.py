@@ -0,0 +1,91 @@
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+
+TWO_PLACES = Decimal('0.01')
+HUNDRED = Decimal('100')
+ZERO = Decimal('0.00')
+
+INCLUSIVE = 'inclusive'
+EXCLUSIVE = 'exclusive'
+
+LineTax = namedtuple('LineTax', ['taxable_amount', 'tax_amount', 'cgst_amount', 'sgst_amount', 'igst_amount', 'total_amount'])
+
+
+def _quantize(value):
+    return value.quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
+
+
+def state_code(gst_number):
+    """The first two digits of a GSTIN are the registering state's code."""
+    if gst_number and len(gst_number) >= 2 and gst_number[:2].isdigit():
+        return gst_number[:2]
+    return None
+
+
+def is_inter_state(shop_state, customer_state):
+    # Without both codes the supply is treated as intra-state (CGST + SGST).
+    return bool(shop_state and customer_state and shop_state != customer_state)
+
+
+def split_tax(tax, inter_state=False):
+    """
+    (cgst, sgst, igst) for a tax amount. Intra-state tax is halved into CGST
+    and SGST (CGST rounds half up, so an odd paisa goes to CGST), inter-state
+    tax is all IGST.
+    """
+    if inter_state:
+        return ZERO, ZERO, tax
+    cgst = _quantize(tax / 2)
+    return cgst, tax - cgst, ZERO
+
+
+def price_line(unit_price, quantity, rate, tax_type=EXCLUSIVE, inter_state=False):
+    """
+    Tax for one basket line, rounded once.
+
+    With inclusive pricing the line gross already contains GST and is split
+    back into taxable value and tax, so the customer pays exactly the gross.
+    The tax is then split by split_tax.
+    """
+    rate = Decimal(rate or 0)
+    gross = Decimal(unit_price) * quantity
+
+    if tax_type == INCLUSIVE:
+        taxable = _quantize(gross * HUNDRED / (HUNDRED + rate))
+        total = _quantize(gross)
+        tax = total - taxable
+    else:
+        taxable = _quantize(gross)
+        tax = _quantize(gross * rate / HUNDRED)
+        total = taxable + tax
+
+    return LineTax(taxable, tax, *split_tax(tax, inter_state), total)
+
+
+def price_basket(lines, tax_type=EXCLUSIVE, inter_state=False):
+    """
+    Price a whole basket in one pass.
+
+    ``lines`` is an iterable of (unit_price, quantity, rate). Returns the
+    per-line LineTax values, basket totals and a per-rate breakdown ready to
+    be stored on the sale.
+    """
+    priced = []
+    totals = dict.fromkeys(LineTax._fields, ZERO)
+    breakdown = {}
+
+    for unit_price, quantity, rate in lines:
+        line = price_line(unit_price, quantity, rate, tax_type, inter_state)
+        priced.append(line)
+
+        slab = breakdown.setdefault(str(_quantize(Decimal(rate or 0))), dict.fromkeys(LineTax._fields, ZERO))
+        for field, value in line._asdict().items():
+            totals[field] += value
+            slab[field] += value
+
+    breakdown = {
+        rate: {field: str(value) for field, value in slab.items()}
+        for rate, slab in sorted(breakdown.items(), key=lambda item: Decimal(item[0]))
+    }
+    return priced, totals, breakdown
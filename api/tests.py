@@ -1,3 +1,1133 @@
-from django.test import TestCase
+import asyncio
+import base64
+import contextvars
+import gzip
+import json
+import os
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import msgpack
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import AsyncClient, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from backendbilling.database import default_database, shard_databases
+
+from .events import broker
+from .hsn import resolve_tax_rate
+from .models import (
+    BillSettings, HsnCode, InvoiceNumberLock, Product, Sale, SaleArchive, SaleItem, SaleSyncKey, User,
+)
+from .profile_cache import get_shop_profile
+from .receipts import ESCPOS_FEED_AND_CUT, ESCPOS_INIT
+from .renderers import OrjsonRenderer
+from .routers import (
+    SHARD_ID_RANGE, ReplicaRouter, invoice_prefix, read_from_replica, shard_aliases, shard_for, shop_db, use_database,
+    use_shop,
+)
+from .sales import record_sales
+from .sharding import ShardMoveError, move_shop, set_shop_database
+from .tax import EXCLUSIVE, INCLUSIVE, is_inter_state, price_basket, price_line, split_tax, state_code
+
+
+class ShopTestMixin:
+    # Tests run with a shard (see SHARD_DATABASES), so a shop may live on it.
+    databases = {'default', *shard_aliases()}
+
+    def setUp(self):
+        # Shop profiles and shard assignments are cached by user id, which
+        # the test database hands out again.
+        cache.clear()
+        self.user = self.create_shop('shop@example.com')
+        self.authenticate(self.user)
+        # Shop tables are read and written on the shop's database, as in a request.
+        self.enterContext(use_shop(self.user))
+
+    def create_shop(self, email, **fields):
+        return User.objects.create_user(
+            email=email, username=email.split('@')[0], password='pw', shop_name='Shop', phone='9999999999', **fields
+        )
+
+    def authenticate(self, user):
+        # Authenticating the token is what picks the shop's database.
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def invoice_number(self, number):
+        return f"{invoice_prefix()}{number:05d}"
+
+    def create_product(self, **fields):
+        values = {
+            'product_name': 'Rice', 'purchase_price': Decimal('40'), 'selling_price': Decimal('100'),
+            'stock_quantity': 10, 'created_by': self.user,
+        }
+        values.update(fields)
+        return Product.objects.create(**values)
+
+
+class RecordSalesTests(ShopTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.rice = self.create_product()
+        self.oil = self.create_product(product_name='Oil', stock_quantity=5)
+
+    def test_batch_numbers_invoices_and_takes_stock_once(self):
+        sales, oversold = record_sales(self.user, [
+            {'items': [{'product': self.rice, 'quantity': 2}, {'product': self.oil, 'quantity': 1}]},
+            {'items': [{'product': self.rice, 'quantity': 3}]},
+        ])
+
+        self.assertEqual([sale.invoice_number for sale in sales], [self.invoice_number(1), self.invoice_number(2)])
+        self.assertEqual(oversold, [])
+        self.assertEqual(SaleItem.objects.filter(sale__in=sales).count(), 3)
+        self.rice.refresh_from_db()
+        self.oil.refresh_from_db()
+        self.assertEqual((self.rice.stock_quantity, self.oil.stock_quantity), (5, 4))
+
+    def test_invoice_numbers_continue(self):
+        record_sales(self.user, [{'items': [{'product': self.rice, 'quantity': 1}]}])
+        sales, _ = record_sales(self.user, [{'items': [{'product': self.rice, 'quantity': 1}]}])
+        self.assertEqual(sales[0].invoice_number, self.invoice_number(2))
+
+    def test_oversell_is_allowed_only_when_asked(self):
+        sales, oversold = record_sales(
+            self.user, [{'items': [{'product': self.oil, 'quantity': 7}]}], allow_oversell=True,
+        )
+        self.assertEqual(len(sales), 1)
+        self.assertEqual(oversold, [{'product': self.oil.id, 'product_name': 'Oil', 'stock_quantity': 5, 'quantity': 7}])
+        self.oil.refresh_from_db()
+        self.assertEqual(self.oil.stock_quantity, 0)
+
+    def test_refused_batch_takes_no_invoice_number(self):
+        with self.assertRaises(ValidationError):
+            record_sales(self.user, [{'items': [{'product': self.oil, 'quantity': 7}]}])
+        self.assertFalse(InvoiceNumberLock.objects.exists())
+
+        sales, _ = record_sales(self.user, [{'items': [{'product': self.oil, 'quantity': 1}]}])
+        self.assertEqual(sales[0].invoice_number, self.invoice_number(1))
+        self.assertEqual(InvoiceNumberLock.objects.get().prefix, invoice_prefix())
+
+
+class SaleCreateTests(ShopTestMixin, APITestCase):
+    def test_create_takes_stock(self):
+        product = self.create_product()
+        response = self.client.post('/api/sales/', {'items': [{'product': product.id, 'quantity': 4, 'sale_price': '1'}]}, format='json')
+
+        self.assertEqual(response.status_code, 201, response.content)
+        # The product's price is used, not the one sent.
+        self.assertEqual(response.data['items'][0]['sale_price'], '100.00')
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 6)
+
+    def test_oversell_is_refused(self):
+        product = self.create_product(product_name='Soap', stock_quantity=2)
+        response = self.client.post('/api/sales/', {'items': [{'product': product.id, 'quantity': 5, 'sale_price': '1'}]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Soap', str(response.data['items']))
+        self.assertFalse(Sale.objects.exists())
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 2)
+
+
+class SaleSyncTests(ShopTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product()
+
+    def sync(self, *sales):
+        return self.client.post('/api/sales/sync/', {'sales': list(sales)}, format='json')
+
+    def entry(self, key, quantity=1):
+        return {'idempotency_key': key, 'items': [{'product': self.product.id, 'quantity': quantity}]}
+
+    def test_upload_is_idempotent(self):
+        first = self.sync(self.entry('k1'), self.entry('k2', quantity=2))
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first.data['created_count'], 2)
+
+        again = self.sync(self.entry('k1'), self.entry('k2', quantity=2))
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.data['duplicate_count'], 2)
+        self.assertEqual(
+            [result['invoice_number'] for result in again.data['results']],
+            [result['invoice_number'] for result in first.data['results']],
+        )
+        self.assertEqual(Sale.objects.count(), 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 7)
+
+    def test_key_repeated_within_a_batch(self):
+        response = self.sync(self.entry('k1'), self.entry('k1'))
+        created, duplicate = response.data['results']
+        self.assertEqual((created['status'], duplicate['status']), ('created', 'duplicate'))
+        self.assertEqual(duplicate['invoice_number'], created['invoice_number'])
+        self.assertEqual(SaleSyncKey.objects.count(), 1)
+
+    def test_bad_entries_get_their_own_error(self):
+        other = self.create_shop('other@example.com')
+        with use_shop(other):
+            foreign = Product.objects.create(
+                product_name='Foreign', purchase_price=1, selling_price=2, stock_quantity=5, created_by=other,
+            )
+        response = self.sync(
+            self.entry('ok'),
+            {'idempotency_key': ['not', 'a', 'string'], 'items': [{'product': self.product.id, 'quantity': 1}]},
+            {'items': [{'product': self.product.id, 'quantity': 1}]},
+            {'idempotency_key': 'foreign', 'items': [{'product': foreign.id, 'quantity': 1}]},
+        )
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'error', 'error', 'error'])
+        self.assertEqual(Sale.objects.count(), 1)
+
+    def test_offline_oversell_is_recorded_and_reported(self):
+        response = self.sync(self.entry('k1', quantity=12))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['oversold'][0]['quantity'], 12)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+
+
+class GstEngineTests(SimpleTestCase):
+    def test_exclusive_intra_state(self):
+        line = price_line(Decimal('100'), 2, Decimal('18'))
+        self.assertEqual(line, (Decimal('200.00'), Decimal('36.00'), Decimal('18.00'), Decimal('18.00'), Decimal('0'), Decimal('236.00')))
+
+    def test_inclusive_keeps_the_gross(self):
+        line = price_line(Decimal('99'), 1, Decimal('5'), INCLUSIVE)
+        self.assertEqual(line.taxable_amount, Decimal('94.29'))
+        self.assertEqual(line.tax_amount, Decimal('4.71'))
+        self.assertEqual(line.total_amount, Decimal('99.00'))
+        # 4.71 halves to 2.355: CGST rounds half up, SGST takes the rest.
+        self.assertEqual((line.cgst_amount, line.sgst_amount), (Decimal('2.36'), Decimal('2.35')))
+
+    def test_inter_state_is_all_igst(self):
+        line = price_line(Decimal('100'), 1, Decimal('12'), EXCLUSIVE, inter_state=True)
+        self.assertEqual((line.cgst_amount, line.sgst_amount, line.igst_amount), (Decimal('0'), Decimal('0'), Decimal('12.00')))
+
+    def test_split_tax_odd_paisa(self):
+        self.assertEqual(split_tax(Decimal('0.05')), (Decimal('0.03'), Decimal('0.02'), Decimal('0')))
+        self.assertEqual(split_tax(Decimal('0.05'), inter_state=True), (Decimal('0'), Decimal('0'), Decimal('0.05')))
+
+    def test_line_rounded_once(self):
+        # 3 x 33.33 at 18%: 99.99 taxable, 17.9982 tax rounds to 18.00 on the line.
+        line = price_line(Decimal('33.33'), 3, Decimal('18'))
+        self.assertEqual((line.taxable_amount, line.tax_amount), (Decimal('99.99'), Decimal('18.00')))
+
+    def test_basket_totals_and_breakdown(self):
+        priced, totals, breakdown = price_basket([
+            (Decimal('100'), 1, Decimal('18')), (Decimal('50'), 2, Decimal('5')), (Decimal('10'), 1, Decimal('18')),
+        ])
+        self.assertEqual(len(priced), 3)
+        self.assertEqual(totals['taxable_amount'], Decimal('210.00'))
+        self.assertEqual(totals['tax_amount'], Decimal('24.80'))
+        self.assertEqual(totals['total_amount'], Decimal('234.80'))
+        self.assertEqual(list(breakdown), ['5.00', '18.00'])
+        self.assertEqual(breakdown['18.00']['tax_amount'], '19.80')
+
+    def test_place_of_supply(self):
+        self.assertEqual(state_code('27ABCDE1234F1Z5'), '27')
+        self.assertIsNone(state_code('AB'))
+        self.assertTrue(is_inter_state('27', '29'))
+        self.assertFalse(is_inter_state('27', '27'))
+        # Without both codes the supply is intra-state.
+        self.assertFalse(is_inter_state('27', None))
+
+
+class SaleTaxTests(ShopTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        User.objects.filter(pk=self.user.pk).update(gst_number='27ABCDE1234F1Z5')
+        cache.clear()
+        self.product = self.create_product(selling_price=Decimal('118'), tax_rate=Decimal('18'))
+
+    def sell(self, **fields):
+        response = self.client.post(
+            '/api/sales/', {'items': [{'product': self.product.id, 'quantity': 1, 'sale_price': '1'}], **fields}, format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data
+
+    def test_exclusive_by_default(self):
+        sale = self.sell()
+        self.assertEqual((sale['taxable_amount'], sale['tax_amount'], sale['total_amount']), ('118.00', '21.24', '139.24'))
+        self.assertEqual((sale['cgst_amount'], sale['sgst_amount'], sale['igst_amount']), ('10.62', '10.62', '0.00'))
+
+    def test_inclusive_shop(self):
+        BillSettings.objects.create(user=self.user, tax_type_on_sale=INCLUSIVE)
+        sale = self.sell()
+        self.assertEqual((sale['taxable_amount'], sale['tax_amount'], sale['total_amount']), ('100.00', '18.00', '118.00'))
+        self.assertEqual(sale['tax_breakdown']['18.00']['total_amount'], '118.00')
+
+    def test_customer_in_another_state(self):
+        sale = self.sell(customer_gst='29AAAAA0000A1Z5')
+        self.assertEqual((sale['cgst_amount'], sale['sgst_amount'], sale['igst_amount']), ('0.00', '0.00', '21.24'))
+        self.assertEqual(sale['items'][0]['igst_amount'], '21.24')
+
+    def test_saving_a_line_keeps_its_pricing(self):
+        BillSettings.objects.create(user=self.user, tax_type_on_sale=INCLUSIVE)
+        sale = self.sell(customer_gst='29AAAAA0000A1Z5')
+        item = SaleItem.objects.get(sale_id=sale['id'])
+        item.save()
+        item.refresh_from_db()
+        self.assertEqual((item.taxable_amount, item.igst_amount, item.total_amount), (Decimal('100.00'), Decimal('18.00'), Decimal('118.00')))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 9)
+
+    def test_backfill_splits_old_sales(self):
+        backfill = import_module('api.migrations.0015_backfill_gst_split').backfill_gst_split
+        intra = Sale.objects.create(sold_by=self.user, invoice_number='OLD-1', tax_amount=Decimal('18.01'))
+        inter = Sale.objects.create(sold_by=self.user, invoice_number='OLD-2', tax_amount=Decimal('18.00'), customer_gst='29AAAAA0000A1Z5')
+        SaleItem.objects.bulk_create([
+            SaleItem(sale=intra, product=self.product, quantity=1, sale_price=Decimal('100'), tax_amount=Decimal('18.01')),
+            SaleItem(sale=inter, product=self.product, quantity=1, sale_price=Decimal('100'), tax_amount=Decimal('18.00')),
+        ])
+
+        backfill(apps, SimpleNamespace(connection=connections[shop_db()]))
+
+        for sale, split in ((intra, ('9.01', '9.00', '0.00')), (inter, ('0.00', '0.00', '18.00'))):
+            expected = tuple(Decimal(value) for value in split)
+            sale.refresh_from_db()
+            self.assertEqual((sale.cgst_amount, sale.sgst_amount, sale.igst_amount), expected)
+            item = sale.items.get()
+            self.assertEqual((item.cgst_amount, item.sgst_amount, item.igst_amount), expected)
+
+
+class ArchivedSaleTests(ShopTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.rice = self.create_product(stock_quantity=100, tax_rate=Decimal('18'))
+        self.sale_ids = [self.sell()['id'] for _ in range(3)]
+        self.old = timezone.now() - timedelta(days=400)
+        self.month = self.old.strftime('%Y-%m')
+
+    def sell(self):
+        response = self.client.post('/api/sales/', {'items': [{'product': self.rice.pk, 'quantity': 1, 'sale_price': '100'}]}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data
+
+    def archive(self, ids):
+        Sale.objects.filter(pk__in=ids).update(sale_date=self.old)
+        call_command('archive_sales', stdout=StringIO())
+
+    def gstr1(self):
+        response = self.client.get('/api/reports/gstr1/', {'month': self.month, 'section': 'rates'})
+        return b''.join(response.streaming_content)
+
+    def test_archived_sale_is_still_readable(self):
+        archived = self.sale_ids[0]
+        self.archive([archived])
+
+        self.assertFalse(Sale.objects.filter(pk=archived).exists())
+        self.assertEqual(SaleArchive.objects.filter(pk=archived).count(), 1)
+        response = self.client.get(f'/api/sales/{archived}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['invoice_number'], self.invoice_number(1))
+        self.assertEqual(response.data['items'][0]['product_name'], 'Rice')
+        self.assertEqual(self.client.get(f'/api/sales/{archived}/receipt/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/sales/{archived}/sale_pdf/').status_code, 200)
+
+    def test_archived_sale_is_read_only_and_not_listed(self):
+        archived = self.sale_ids[0]
+        self.archive([archived])
+
+        response = self.client.patch(f'/api/sales/{archived}/', {'notes': 'late'}, format='json')
+        self.assertEqual(response.status_code, 404)
+        listed = [sale['id'] for sale in self.client.get('/api/sales/').data['results']]
+        self.assertCountEqual(listed, self.sale_ids[1:])
+
+    def test_gst_return_is_unchanged_by_archiving(self):
+        Sale.objects.filter(pk__in=self.sale_ids[:2]).update(sale_date=self.old)
+        before = self.gstr1()
+
+        call_command('archive_sales', stdout=StringIO())
+
+        self.assertEqual(SaleArchive.objects.count(), 2)
+        self.assertEqual([row['invoices'] for row in json.loads(before)['rates']], [2])
+        self.assertEqual(self.gstr1(), before)
+
+    def test_invoice_numbers_continue_after_archiving_everything(self):
+        self.archive(self.sale_ids)
+
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(self.sell()['invoice_number'], self.invoice_number(4))
+
+
+
+class CatalogSyncTests(ShopTestMixin, APITestCase):
+    def test_changes_need_a_valid_watermark(self):
+        for params in ({}, {'since': 'yesterday'}, {'since': '2025-13-45T00:00:00'}):
+            response = self.client.get('/api/products/catalog/changes/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertEqual(response.data, {'error': 'A valid since watermark is required'})
+
+    def test_snapshot_lists_the_catalog_gzipped_on_request(self):
+        rice = self.create_product(product_code='R1')
+
+        plain = json.loads(self.client.get('/api/products/catalog/snapshot/').content)
+        response = self.client.get('/api/products/catalog/snapshot/', HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), plain)
+        row = dict(zip(plain['columns'], plain['rows'][0]))
+        self.assertEqual((len(plain['rows']), row['id'], row['product_code']), (1, rice.pk, 'R1'))
+
+    def test_changes_send_updates_and_deletes_after_the_watermark(self):
+        rice = self.create_product(product_code='R1')
+        oil = self.create_product(product_code='O1')
+        soap = self.create_product(product_code='S1')
+        Product.objects.filter(pk=soap.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        watermark = (timezone.now() - timedelta(minutes=1)).isoformat()
+        self.client.delete(f'/api/products/{oil.pk}/')
+
+        changes = json.loads(self.client.get('/api/products/catalog/changes/', {'since': watermark}).content)
+
+        self.assertEqual([row[0] for row in changes['rows']], [rice.pk])
+        self.assertEqual(changes['deleted'], [oil.pk])
+
+    def test_old_watermark_must_download_the_snapshot(self):
+        since = (timezone.now() - timedelta(days=31)).isoformat()
+        response = self.client.get('/api/products/catalog/changes/', {'since': since})
+        self.assertEqual(response.status_code, 410)
+
+
+class LiveStreamTests(ShopTestMixin, APITestCase):
+    # Sales are made without a publish in this process (on_commit does not
+    # fire in a TestCase), as if another worker had taken them.
+
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product()
+
+    def sell(self):
+        sales, _ = record_sales(self.user, [{'items': [{'product': self.product, 'quantity': 1}]}])
+        return sales[0]
+
+    def test_print_queue_prints_sales_from_any_worker(self):
+        User.objects.filter(pk=self.user.pk).update(print_automatically=True)
+        cache.clear()
+        self.sell()
+        response = self.client.get('/api/sales/print-queue/', HTTP_ACCEPT='text/event-stream')
+        chunks = iter(response.streaming_content)
+        self.assertEqual(next(chunks), b'retry: 3000\n\n')
+
+        sale = self.sell()
+        with mock.patch('api.events.EVENT_POLL_INTERVAL', 0.01):
+            event = next(chunks).decode()
+        response.close()
+
+        # Only sales made after the agent connected are printed.
+        self.assertTrue(event.startswith(f'id: {sale.id}\nevent: receipt\n'))
+        payload = json.loads(event.split('data: ', 1)[1])
+        self.assertEqual(payload['invoice_number'], self.invoice_number(2))
+        self.assertTrue(base64.b64decode(payload['escpos']).startswith(b'\x1b@'))
+
+    async def test_sales_feed_sends_sales_from_any_worker(self):
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.user).access_token))()
+        response = await AsyncClient().get('/api/async/sales/live/', headers={'Authorization': f'Bearer {token}'})
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+        self.assertIn(b'"sales": 0', await anext(chunks))
+
+        sale = await sync_to_async(self.sell)()
+        with mock.patch('api.events.EVENT_POLL_INTERVAL', 0.01):
+            event = await asyncio.wait_for(anext(chunks), 5)
+        await chunks.aclose()
+
+        data = json.loads(event.split(b'data: ', 1)[1])
+        self.assertEqual([row['invoice_number'] for row in data['sales']], [sale.invoice_number])
+        self.assertEqual(data['today'], {'sales': 1, 'total': '100.00'})
+
+    async def test_sales_feed_is_woken_by_a_sale_in_this_process(self):
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.user).access_token))()
+        response = await AsyncClient().get('/api/async/sales/live/', headers={'Authorization': f'Bearer {token}'})
+        chunks = aiter(response.streaming_content)
+        await anext(chunks)
+        await anext(chunks)
+
+        def sell_and_commit():
+            with self.captureOnCommitCallbacks(using=shop_db(), execute=True):
+                response = self.client.post('/api/sales/', {'items': [{'product': self.product.id, 'quantity': 1, 'sale_price': '100'}]}, format='json')
+            return response.data['id']
+
+        # Far longer than the test waits: only the publish can deliver it.
+        with mock.patch('api.events.EVENT_POLL_INTERVAL', 60):
+            reading = asyncio.ensure_future(anext(chunks))
+            await asyncio.sleep(0.05)
+            sale_id = await sync_to_async(sell_and_commit)()
+            event = await asyncio.wait_for(reading, 5)
+        await chunks.aclose()
+
+        self.assertEqual([row['id'] for row in json.loads(event.split(b'data: ', 1)[1])['sales']], [sale_id])
+
+    def test_slow_subscriber_drops_messages_instead_of_blocking(self):
+        subscriber = broker.subscribe('test', maxsize=1)
+        self.addCleanup(broker.unsubscribe, 'test', subscriber)
+        broker.publish('test', 1)
+        broker.publish('test', 2)
+        self.assertEqual((subscriber.get_nowait(), subscriber.empty()), (1, True))
+
+
+class InventoryValuationTests(ShopTestMixin, APITestCase):
+    url = '/api/reports/inventory-valuation/'
+
+    def setUp(self):
+        super().setUp()
+        self.rice = self.create_product(category='Grain', purchase_price=Decimal('40.10'), stock_quantity=10)
+        self.oil = self.create_product(product_name='Oil', category='Oil', purchase_price=Decimal('80'), selling_price=Decimal('90'))
+        record_sales(self.user, [{'items': [{'product': self.rice, 'quantity': 3}, {'product': self.oil, 'quantity': 1}]}])
+
+    def test_money_is_decimal_strings(self):
+        response = self.client.get(self.url, {'period': 'day'})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(data['totals']['revenue'], '390.00')
+        self.assertEqual(data['totals']['stock_value_cost'], '1000.70')
+        self.assertEqual(data['abc']['A'], {'products': 2, 'revenue': '390.00'})
+        rice = next(row for row in data['products'] if row['id'] == self.rice.id)
+        self.assertEqual((rice['units_sold'], rice['revenue'], rice['gross_margin']), (3, '300.00', '179.70'))
+        self.assertEqual(rice['unit_margin_pct'], 59.9)
+        self.assertEqual(data['periods'][0]['gross_margin'], '189.70')
+
+    def test_window_excludes_other_sales(self):
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        data = self.client.get(self.url, {'from': tomorrow, 'to': tomorrow}).data
+
+        self.assertEqual(data['totals']['revenue'], '0.00')
+        self.assertEqual(data['totals']['stock_value_cost'], '1000.70')
+
+    def test_limit_and_bad_parameters(self):
+        self.assertEqual(len(self.client.get(self.url, {'limit': -1}).data['products']), 1)
+        self.assertEqual(len(self.client.get(self.url, {'limit': 'all'}).data['products']), 2)
+        for params in ({'from': '2025-13-01'}, {'period': 'year'}, {'abc': 'D'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+
+
+class GstReturnTests(ShopTestMixin, APITestCase):
+    url = '/api/reports/gstr1/'
+
+    def setUp(self):
+        super().setUp()
+        User.objects.filter(pk=self.user.pk).update(gst_number='27ABCDE1234F1Z5')
+        cache.clear()
+        product = self.create_product(tax_rate=Decimal('18'))
+        record_sales(self.user, [
+            {'customer_gst': '29AAAAA0000A1Z5', 'items': [{'product': product, 'quantity': 1}]},
+            {'items': [{'product': product, 'quantity': 2}]},
+        ])
+        self.month = timezone.localdate().strftime('%Y-%m')
+
+    def test_b2b_place_of_supply_from_gstin(self):
+        data = json.loads(b''.join(self.client.get(self.url, {'month': self.month}).streaming_content))
+
+        b2b, = data['b2b']
+        self.assertEqual((b2b['gstin'], b2b['place_of_supply'], b2b['igst']), ('29AAAAA0000A1Z5', '29', '18.00'))
+        b2cs, = data['b2cs']
+        self.assertEqual((b2cs['supply_type'], b2cs['cgst'], b2cs['sgst']), ('INTRA', '18.00', '18.00'))
+        self.assertEqual([row['invoices'] for row in data['rates']], [2])
+
+    def test_only_the_shops_sales_in_the_month(self):
+        other = self.create_shop('other@example.com')
+        with use_shop(other):
+            product = self.create_product(created_by=other, tax_rate=Decimal('5'))
+            record_sales(other, [{'items': [{'product': product, 'quantity': 1}]}])
+        next_month = (timezone.localdate().replace(day=1) + timedelta(days=32)).strftime('%Y-%m')
+
+        data = json.loads(b''.join(self.client.get(self.url, {'month': self.month}).streaming_content))
+        self.assertEqual([row['rate'] for row in data['rates']], ['18.00'])
+        data = json.loads(b''.join(self.client.get(self.url, {'month': next_month}).streaming_content))
+        self.assertEqual((data['b2b'], data['b2cs'], data['rates']), ([], [], []))
+
+    def test_csv_export(self):
+        response = self.client.get(self.url, {'month': self.month, 'section': 'b2b', 'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        header, row = b''.join(response.streaming_content).decode().splitlines()
+        self.assertTrue(header.startswith('gstin,receiver_name,invoice_number'))
+        self.assertIn(',29,18.00,', row)
+
+    def test_errors_are_json_for_csv_too(self):
+        for params in ({'month': '2025-13'}, {'month': self.month, 'section': 'b2x'}):
+            response = self.client.get(self.url, {**params, 'format': 'csv'})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertIn('error', json.loads(response.content))
+
+
+class CustomerTests(ShopTestMixin, APITestCase):
+    def create_customer(self, **fields):
+        values = {
+            'name': ' José  KUMAR', 'phone': '+91 98765-43210', 'email': 'jose@example.com', 'address': '1 Road',
+            'city': 'Pune', 'state': 'MH', 'zip': '411001', 'country': 'IN', 'taxId': 'NA', 'notes': 'walk-in',
+        }
+        values.update(fields)
+        response = self.client.post('/api/customers/', values, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data
+
+    def test_normalized_columns_are_derived(self):
+        customer = self.create_customer(name_normalized='someone else', phone_normalized='0')
+        self.assertEqual((customer['name_normalized'], customer['phone_normalized']), ('jose kumar', '9876543210'))
+
+        response = self.client.patch(f"/api/customers/{customer['id']}/", {'name': 'Ravi', 'name_normalized': 'x'}, format='json')
+        self.assertEqual(response.data['name_normalized'], 'ravi')
+
+    def test_sales_link_by_phone_and_keep_stats(self):
+        customer = self.create_customer()
+        product = self.create_product()
+        sales, _ = record_sales(self.user, [
+            {'customer_phone': '98765 43210', 'items': [{'product': product, 'quantity': 1}]},
+            {'customer_phone': '+91-9876543210', 'items': [{'product': product, 'quantity': 2}]},
+            {'customer_phone': '9123456789', 'items': [{'product': product, 'quantity': 1}]},
+        ])
+        self.assertEqual([sale.customer_id for sale in sales], [customer['id'], customer['id'], None])
+
+        data = self.client.get(f"/api/customers/{customer['id']}/").data
+        self.assertEqual((data['visit_count'], data['lifetime_value']), (2, '300.00'))
+        listed = self.client.get(f"/api/customers/{customer['id']}/sales/").data['results']
+        self.assertEqual({sale['id'] for sale in listed}, {sales[0].pk, sales[1].pk})
+
+        self.client.delete(f'/api/sales/{sales[1].pk}/')
+        data = self.client.get(f"/api/customers/{customer['id']}/").data
+        self.assertEqual((data['visit_count'], data['lifetime_value']), (1, '100.00'))
+
+    def test_typeahead_matches_name_and_phone_prefixes(self):
+        customer = self.create_customer()
+        self.create_customer(name='Anita', phone='9123456789')
+
+        for text in ('jose', 'JOSÉ K', '98765', '+91 987'):
+            response = self.client.get('/api/customers/typeahead/', {'q': text})
+            self.assertEqual([row['id'] for row in response.data], [customer['id']], text)
+
+    def test_typeahead_is_limited_to_the_shop(self):
+        for number in range(12):
+            self.create_customer(name=f'Ravi {number:02d}', phone=f'90000000{number:02d}')
+        other = self.create_shop('other@example.com')
+        self.authenticate(other)
+        self.create_customer(name='Ravi Other', phone='9000000099')
+
+        self.assertEqual([row['name'] for row in self.client.get('/api/customers/typeahead/', {'q': 'ravi'}).data], ['Ravi Other'])
+        self.authenticate(self.user)
+        names = [row['name'] for row in self.client.get('/api/customers/typeahead/', {'q': 'ravi'}).data]
+        self.assertEqual(names, [f'Ravi {number:02d}' for number in range(10)])
+        self.assertEqual(self.client.get('/api/customers/typeahead/', {'q': ' '}).data, [])
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def test_committed_database_keeps_rollback_journal(self):
+        with mock.patch.dict(os.environ, {'DB_ENGINE': 'sqlite'}, clear=True):
+            bundled = default_database(Path('/srv/app'))
+        with mock.patch.dict(os.environ, {'DB_ENGINE': 'sqlite', 'SQLITE_PATH': '/var/lib/billing.sqlite3'}, clear=True):
+            own = default_database(Path('/srv/app'))
+
+        self.assertIn('PRAGMA journal_mode=DELETE', bundled['OPTIONS']['init_command'])
+        self.assertIn('PRAGMA journal_mode=WAL', own['OPTIONS']['init_command'])
+
+    def test_postgres_pool_replaces_persistent_connections(self):
+        environ = {'DB_ENGINE': 'postgres', 'DB_NAME': 'shop', 'DB_POOL_MAX_SIZE': '8', 'DB_SHARDS': 'shard1'}
+        with mock.patch.dict(os.environ, environ, clear=True):
+            default = default_database(Path('/srv/app'))
+            shards = shard_databases(Path('/srv/app'))
+        with mock.patch.dict(os.environ, {**environ, 'DB_POOL': '0'}, clear=True):
+            unpooled = default_database(Path('/srv/app'))
+
+        self.assertEqual((default['CONN_MAX_AGE'], default['OPTIONS']['pool']['max_size']), (0, 8))
+        self.assertEqual(shards['shard1']['NAME'], 'shop_shard1')
+        self.assertEqual((unpooled['CONN_MAX_AGE'], unpooled['OPTIONS']), (600, {}))
+
+
+class BulkProductUpdateTests(ShopTestMixin, APITestCase):
+    def test_bulk_price_changes_matching_products_only(self):
+        rice = self.create_product(product_code='R1', category='Grocery')
+        oil = self.create_product(product_code='O1', category='Grocery', selling_price=Decimal('10.05'))
+        soap = self.create_product(product_code='S1', category='Toiletries')
+
+        response = self.client.post(
+            '/api/products/bulk-price/', {'operation': 'percent', 'value': '10', 'category': 'Grocery'}, format='json'
+        )
+        self.assertEqual(response.data, {'updated_count': 2})
+        self.assertEqual(
+            [product.selling_price for product in Product.objects.filter(pk__in=[rice.pk, oil.pk, soap.pk]).order_by('pk')],
+            [Decimal('110.00'), Decimal('11.06'), Decimal('100.00')],
+        )
+
+    def test_bulk_price_needs_a_selection(self):
+        response = self.client.post('/api/products/bulk-price/', {'operation': 'set', 'value': '5'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_stock_adjusts_and_reports_missing_and_rejected_codes(self):
+        rice = self.create_product(product_code='R1', stock_quantity=10)
+        oil = self.create_product(product_code='O1', stock_quantity=2)
+
+        response = self.client.post('/api/products/bulk-stock/', {'mode': 'adjust', 'items': [
+            {'product_code': 'R1', 'quantity': 5}, {'product_code': 'R1', 'quantity': -1},
+            {'product_code': 'O1', 'quantity': -3}, {'product_code': 'X9', 'quantity': 1},
+        ]}, format='json')
+
+        self.assertEqual(response.data, {'updated_count': 1, 'missing_codes': ['X9'], 'rejected_codes': ['O1']})
+        rice.refresh_from_db()
+        oil.refresh_from_db()
+        self.assertEqual((rice.stock_quantity, oil.stock_quantity), (14, 2))
+
+
+class ConditionalGetTests(ShopTestMixin, APITestCase):
+    def revalidate(self, path):
+        first = self.client.get(path)
+        self.assertEqual(first.status_code, 200)
+        return self.client.get(path, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    def test_unchanged_product_list_answers_not_modified(self):
+        self.create_product(product_code='R1')
+        response = self.revalidate('/api/products/')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], self.client.get('/api/products/')['ETag'])
+
+    def test_product_change_gives_a_new_etag(self):
+        rice = self.create_product(product_code='R1')
+        etag = self.client.get(f'/api/products/{rice.pk}/')['ETag']
+        self.client.post('/api/products/bulk-stock/', {'items': [{'product_code': 'R1', 'quantity': 3}]}, format='json')
+
+        for path in ('/api/products/', f'/api/products/{rice.pk}/'):
+            response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, path)
+        self.assertEqual(response.data['stock_quantity'], 3)
+
+    def test_unchanged_sales_list_answers_not_modified(self):
+        product = self.create_product()
+        record_sales(self.user, [{'items': [{'product': product, 'quantity': 1}]}])
+        self.assertEqual(self.revalidate('/api/sales/').status_code, 304)
+
+    def test_non_numeric_pk_is_not_found(self):
+        self.assertEqual(self.client.get('/api/products/abc/').status_code, 404)
+        self.assertEqual(self.client.get('/api/sales/abc/').status_code, 404)
+
+
+class ShopProfileTests(ShopTestMixin, APITestCase):
+    def test_snapshot_is_reused_until_the_profile_changes(self):
+        self.assertIsNone(get_shop_profile(self.user)['bill_settings'])
+        with self.assertNumQueries(0):
+            get_shop_profile(self.user)
+
+        BillSettings.objects.create(user=self.user, header='Sharma Stores')
+        self.user.refresh_from_db()
+        self.assertEqual(get_shop_profile(self.user)['bill_settings']['header'], 'Sharma Stores')
+
+    def test_bill_settings_edit_changes_the_etag(self):
+        BillSettings.objects.create(user=self.user)
+        first = self.client.get('/api/bill-settings/mine/')
+        self.assertEqual(self.client.get('/api/bill-settings/mine/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        self.client.patch('/api/bill-settings/mine/', {'header': 'Sharma Stores'}, format='json')
+        response = self.client.get('/api/bill-settings/mine/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual((response.status_code, response.data['header']), (200, 'Sharma Stores'))
+
+
+class ReceiptTests(ShopTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        product = self.create_product(product_name='Basmati Rice Premium Long Grain 5kg')
+        [self.sale], _ = record_sales(self.user, [{'items': [{'product': product, 'quantity': 2}], 'payment_method': 'upi'}])
+
+    def test_text_receipt_fits_the_paper_width(self):
+        response = self.client.get(f'/api/sales/{self.sale.pk}/receipt/', {'width': 32}, HTTP_ACCEPT='text/plain')
+
+        lines = response.content.decode().splitlines()
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertTrue(all(len(line) <= 32 for line in lines), lines)
+        self.assertIn(self.invoice_number(1), response.content.decode())
+        self.assertTrue(any(line.startswith('TOTAL') and line.endswith('200.00') for line in lines), lines)
+
+    def test_escpos_receipt_initialises_and_cuts(self):
+        response = self.client.get(f'/api/sales/{self.sale.pk}/receipt/', {'format': 'escpos'})
+
+        self.assertEqual(response['Content-Type'], 'application/vnd.escpos')
+        self.assertTrue(response.content.startswith(ESCPOS_INIT))
+        self.assertTrue(response.content.endswith(ESCPOS_FEED_AND_CUT))
+        self.assertIn(b'UPI', response.content)
+
+
+class HsnCodeTests(ShopTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        HsnCode.objects.create(code='1006', description='Rice', tax_rate=Decimal('5'))
+
+    def test_product_takes_the_master_rate(self):
+        response = self.client.post('/api/products/', {
+            'product_name': 'Rice', 'product_code': 'R1', 'purchase_price': '40', 'selling_price': '50',
+            'stock_quantity': 5, 'hsn_code': '1006', 'tax_rate': '18',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['tax_rate'], '5.00')
+
+    def test_rate_change_reaches_every_product_with_the_code(self):
+        rice = self.create_product(hsn_code='1006', tax_rate=Decimal('5'))
+        self.assertEqual(self.client.patch('/api/hsn-codes/1006/', {'tax_rate': '12'}, format='json').status_code, 403)
+
+        self.authenticate(self.create_shop('admin@example.com', is_staff=True))
+        self.client.patch('/api/hsn-codes/1006/', {'tax_rate': '12'}, format='json')
+
+        rice.refresh_from_db()
+        self.assertEqual((rice.tax_rate, resolve_tax_rate('1006')), (Decimal('12.00'), Decimal('12.00')))
+
+
+class ReorderSuggestionTests(ShopTestMixin, APITestCase):
+    url = '/api/products/reorder-suggestions/'
+
+    def setUp(self):
+        super().setUp()
+        self.rice = self.create_product(product_code='R1', stock_quantity=30)
+        self.oil = self.create_product(product_code='O1', stock_quantity=5)
+        sales, _ = record_sales(self.user, [{'items': [{'product': self.rice, 'quantity': 2}]} for _ in range(10)])
+        for days_ago, sale in enumerate(sales):
+            Sale.objects.filter(pk=sale.pk).update(sale_date=timezone.now() - timedelta(days=days_ago))
+        call_command('forecast_demand', user=self.user.pk, days=10, stdout=StringIO())
+
+    def test_steady_seller_below_its_reorder_point_is_suggested(self):
+        row, = self.client.get(self.url).data
+        self.assertEqual(
+            (row['product_id'], row['daily_demand'], row['stock_quantity'], row['reorder_point'], row['suggested_quantity']),
+            (self.rice.pk, Decimal('2.00'), 10, 14, 32),
+        )
+
+    def test_all_lists_products_that_need_nothing(self):
+        rows = {row['product_id']: row['suggested_quantity'] for row in self.client.get(self.url, {'all': 'true'}).data}
+        self.assertEqual(rows, {self.rice.pk: 32, self.oil.pk: 0})
+
+
+class LowStockTests(ShopTestMixin, APITestCase):
+    url = '/api/products/low-stock/'
+
+    def setUp(self):
+        super().setUp()
+        self.rice = self.create_product(product_code='R1', supplier='Agro', stock_quantity=10, min_stock_level=5)
+        self.oil = self.create_product(product_code='O1', supplier='Agro', stock_quantity=1, min_stock_level=4)
+
+    def test_sale_queues_and_restock_clears(self):
+        record_sales(self.user, [{'items': [{'product': self.rice, 'quantity': 7}]}])
+        self.assertEqual(
+            [(row['product_code'], row['shortfall']) for row in self.client.get(self.url).data],
+            [('O1', 3), ('R1', 2)],
+        )
+
+        self.client.post('/api/products/bulk-stock/', {'items': [{'product_code': 'R1', 'quantity': 20}]}, format='json')
+        self.assertEqual([row['product_code'] for row in self.client.get(self.url).data], ['O1'])
+
+    def test_supplier_digest(self):
+        group, = self.client.get(self.url, {'digest': 'supplier'}).data
+        self.assertEqual((group['supplier'], group['product_count'], group['total_shortfall']), ('Agro', 1, 3))
+        self.assertEqual(self.client.get(self.url, {'digest': 'category'}).status_code, 400)
+
+
+class ExpiryTests(ShopTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        today = date.today()
+        self.products = {
+            days: self.create_product(product_code=f'P{days}', expiry_date=today + timedelta(days=days))
+            for days in (-1, 0, 3, 20, 60)
+        }
+
+    def test_digest_buckets_and_refresh(self):
+        call_command('build_expiry_digest', stdout=StringIO())
+        buckets = self.client.get('/api/products/expiry-digest/').data['buckets']
+        self.assertEqual(
+            {bucket: value['product_ids'] for bucket, value in buckets.items()},
+            {
+                'expired': [self.products[-1].pk], 'today': [self.products[0].pk],
+                'next_7_days': [self.products[3].pk], 'next_30_days': [self.products[20].pk],
+            },
+        )
+
+        self.create_product(product_code='N1', expiry_date=date.today())
+        self.assertEqual(self.client.get('/api/products/expiry-digest/').data['buckets']['today']['count'], 1)
+        response = self.client.get('/api/products/expiry-digest/', {'refresh': 'true'})
+        self.assertEqual(response.data['buckets']['today']['count'], 2)
+
+    def test_list_reports_days_to_expiry(self):
+        rows = {row['id']: row for row in self.client.get('/api/products/').data}
+        self.assertEqual(
+            (rows[self.products[3].pk]['days_to_expiry'], rows[self.products[3].pk]['expiry_status']),
+            (3, 'Expires in 3 days'),
+        )
+        self.assertEqual(rows[self.products[-1].pk]['expiry_status'], 'Expired')
+
+        expired = self.client.get('/api/products/', {'expiry': 'expired'}).data
+        self.assertEqual([row['id'] for row in expired], [self.products[-1].pk])
+
+
+@override_settings(REPLICA_ALIASES={'default': 'replica', 'shard1': 'shard1_replica'}, REPLICA_STICKY_SECONDS=90)
+class ReplicaRoutingTests(ShopTestMixin, APITestCase):
+    def test_reads_go_to_the_replica_of_the_shop_database(self):
+        def route():
+            read_from_replica()
+            return ReplicaRouter().db_for_read(Product), ReplicaRouter().db_for_read(User)
+
+        with use_database('shard1'):
+            self.assertEqual(contextvars.copy_context().run(route), ('shard1_replica', 'replica'))
+            self.assertIsNone(ReplicaRouter().db_for_read(Product))
+
+    def test_a_shop_that_wrote_reads_the_primary(self):
+        self.create_product(product_code='R1')
+        with mock.patch('api.replicas.read_from_replica') as replica:
+            self.client.get('/api/products/')
+            self.client.get('/api/products/catalog/snapshot/')
+            self.assertEqual(replica.call_count, 1)
+
+            self.client.post('/api/products/bulk-stock/', {'items': [{'product_code': 'R1', 'quantity': 3}]}, format='json')
+            self.client.get('/api/products/')
+            self.assertEqual(replica.call_count, 1)
+
+
+class ExplainQueriesTests(ShopTestMixin, APITestCase):
+    def test_hot_queries_use_the_composite_indexes_and_leave_no_data(self):
+        out = StringIO()
+        call_command(
+            'explain_queries', shops=2, products=50, sales=200, customers=10, repeat=1, compare=True, stdout=out,
+        )
+
+        rows = {line[:28].strip(): line[28:58].strip() for line in out.getvalue().splitlines()}
+        self.assertEqual(rows['sales latest page'], 'sale_shop_date_idx')
+        self.assertEqual(rows['vendors'], 'vendor_shop_created_idx')
+        self.assertEqual(User.objects.filter(email__startswith='explain-').count(), 0)
+        self.assertEqual(Product.objects.using('default').count(), 0)
+
+
+class AsyncEndpointTests(ShopTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product(product_code='R1', barcode='8901', stock_quantity=10, min_stock_level=10)
+        sales, _ = record_sales(self.user, [{'items': [{'product': self.product, 'quantity': 2}]}])
+        self.sale = sales[0]
+
+    async def get(self, path, **params):
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.user).access_token))()
+        response = await AsyncClient().get(path, params, headers={'Authorization': f'Bearer {token}'})
+        return response.status_code, json.loads(response.content)
+
+    async def test_product_lookup(self):
+        status, product = await self.get('/api/async/products/lookup/', barcode='8901')
+        self.assertEqual((status, product['id'], product['stock_quantity']), (200, self.product.pk, 8))
+        self.assertEqual(await self.get('/api/async/products/lookup/', code='R1'), (200, product))
+        self.assertEqual((await self.get('/api/async/products/lookup/', barcode='0000'))[0], 404)
+        self.assertEqual((await self.get('/api/async/products/lookup/'))[0], 400)
+        self.assertEqual((await AsyncClient().get('/api/async/products/lookup/', {'code': 'R1'})).status_code, 401)
+
+    async def test_sale_detail_and_dashboard(self):
+        status, sale = await self.get(f'/api/async/sales/{self.sale.pk}/')
+        self.assertEqual((status, sale['invoice_number'], sale['total_amount']), (200, self.invoice_number(1), '200.00'))
+        self.assertEqual([item['quantity'] for item in sale['items']], [2])
+
+        status, dashboard = await self.get('/api/async/dashboard/')
+        self.assertEqual(dashboard['today'], {'sales': 1, 'total': '200.00'})
+        self.assertEqual((dashboard['low_stock'], [row['id'] for row in dashboard['recent_sales']]), (1, [self.sale.pk]))
+
+
+class BatchTests(ShopTestMixin, APITransactionTestCase):
+    # Sub-requests run on worker threads, which only see committed rows.
+
+    def test_each_request_gets_its_own_slot(self):
+        self.create_product(product_code='R1')
+        etag = self.client.get('/api/products/')['ETag']
+
+        response = self.client.post('/api/batch/', {'requests': [
+            {'path': '/api/user/'},
+            {'path': '/api/products/?is_active=true'},
+            {'path': '/api/products/', 'headers': {'If-None-Match': etag}},
+            {'path': '/api/nowhere/'},
+            {'path': '/api/batch/'},
+            {'path': '/api/async/dashboard/'},
+        ]}, format='json')
+
+        responses = response.data['responses']
+        self.assertEqual([slot['status'] for slot in responses], [200, 200, 304, 404, 400, 400])
+        self.assertEqual(responses[0]['body'][0]['email'], 'shop@example.com')
+        self.assertEqual([product['product_code'] for product in responses[1]['body']], ['R1'])
+
+    def test_only_get_under_api(self):
+        for entry in ({'path': '/admin/'}, {'path': '/api/user/', 'method': 'POST'}):
+            response = self.client.post('/api/batch/', {'requests': [entry]}, format='json')
+            self.assertEqual(response.status_code, 400, entry)
+
+
+class RendererTests(ShopTestMixin, APITestCase):
+    def test_orjson_matches_drf_json(self):
+        data = {
+            'price': Decimal('12.50'), 'at': timezone.now(), 'day': date.today(), 'label': gettext_lazy('Cash'),
+            'note': 'line\u2028break', 1: [None, True, 1.5],
+        }
+        self.assertEqual(OrjsonRenderer().render(data), JSONRenderer().render(data))
+
+    def test_msgpack_both_ways(self):
+        self.create_product(product_code='R1', stock_quantity=2)
+        body = msgpack.packb({'mode': 'adjust', 'items': [{'product_code': 'R1', 'quantity': 3}]})
+        response = self.client.post(
+            '/api/products/bulk-stock/', body, content_type='application/msgpack', HTTP_ACCEPT='application/msgpack'
+        )
+
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), {'updated_count': 1, 'missing_codes': [], 'rejected_codes': []})
+        listed = self.client.get('/api/products/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(msgpack.unpackb(listed.content), json.loads(self.client.get('/api/products/').content))
+
+    def test_large_bodies_are_gzipped(self):
+        self.create_product(product_code='R1')
+        small = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')
+        for number in range(10):
+            self.create_product(product_code=f'P{number}')
+        large = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(small.has_header('Content-Encoding'))
+        self.assertEqual(large['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(large.content))), 11)
+
+
+class ListReadPathTests(ShopTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product(
+            product_code='R1', category='Grain', barcode='8901', tax_rate=Decimal('5'),
+            expiry_date=date.today() + timedelta(days=3),
+        )
+
+    def sell(self, count=1):
+        return record_sales(self.user, [
+            {'customer_name': 'Asha', 'items': [{'product': self.product, 'quantity': 1}]} for _ in range(count)
+        ])[0]
+
+    def test_list_rows_match_the_detail_serializers(self):
+        sale, = self.sell()
+        self.client.post('/api/customers/', {
+            'name': 'Asha', 'phone': '9876543210', 'email': 'asha@example.com', 'address': '1 Road', 'city': 'Pune',
+            'state': 'MH', 'zip': '411001', 'country': 'IN', 'taxId': 'NA', 'notes': 'walk-in',
+        }, format='json')
+
+        self.assertEqual(
+            json.loads(self.client.get('/api/products/').content),
+            [json.loads(self.client.get(f'/api/products/{self.product.pk}/').content)],
+        )
+        self.assertEqual(
+            json.loads(self.client.get('/api/sales/').content)['results'],
+            [json.loads(self.client.get(f'/api/sales/{sale.pk}/').content)],
+        )
+        customer, = json.loads(self.client.get('/api/customers/').content)
+        detail = json.loads(self.client.get(f"/api/customers/{customer['id']}/").content)
+        del detail['user_details']
+        self.assertEqual(customer, detail)
+
+    def test_sale_list_queries_do_not_grow_with_the_page(self):
+        self.sell()
+        with CaptureQueriesContext(connections[shop_db()]) as one:
+            self.client.get('/api/sales/')
+        self.sell(5)
+        with CaptureQueriesContext(connections[shop_db()]) as six:
+            self.client.get('/api/sales/')
+        self.assertEqual(len(six), len(one))
+
+@skipUnless(shard_aliases(), 'DB_SHARDS is empty')
+class ShardingTests(ShopTestMixin, APITransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.shard = shard_aliases()[0]
+        self.user = self.create_shop_on(self.shard)
+        self.authenticate(self.user)
+
+    def create_shop_on(self, alias):
+        # New shops are spread over the databases by id.
+        for n in range(len(self.databases) * 2):
+            user = self.create_shop(f'{alias}-{n}@example.com')
+            if shard_for(user.pk)[0] == alias:
+                return user
+        self.fail(f'no shop was placed on {alias}')
+
+    def sell(self, product_id):
+        response = self.client.post('/api/sales/', {'items': [{'product': product_id, 'quantity': 1, 'sale_price': '1'}]}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data
+
+    def create_product_via_api(self, code):
+        response = self.client.post('/api/products/', {
+            'product_name': 'Rice', 'product_code': code, 'purchase_price': '40', 'selling_price': '100', 'stock_quantity': 10,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data['id']
+
+    def test_shop_rows_live_on_its_shard(self):
+        product_id = self.create_product_via_api('R1')
+        sale = self.sell(product_id)
+
+        self.assertGreaterEqual(product_id, SHARD_ID_RANGE)
+        self.assertTrue(Product.objects.using(self.shard).filter(pk=product_id).exists())
+        self.assertFalse(Product.objects.using('default').filter(pk=product_id).exists())
+        self.assertEqual(sale['invoice_number'], 'INV1-00001')
+        self.assertEqual(self.client.get(f"/api/sales/{sale['id']}/").status_code, 200)
+
+        other = self.create_shop_on('default')
+        self.authenticate(other)
+        self.assertEqual(self.client.get('/api/products/').data, [])
+        self.assertEqual(self.client.get(f"/api/sales/{sale['id']}/").status_code, 404)
+
+    def test_user_listing_reads_each_shop_database(self):
+        product_id = self.create_product_via_api('R1')
+        self.sell(product_id)
+        other = self.create_shop_on('default')
+        self.authenticate(other)
+        self.create_product_via_api('O1')
+
+        users = {user['id']: user for user in self.client.get('/api/users-list/').data}
+        products = users[self.user.pk]['products']
+        self.assertEqual([product['product_code'] for product in products], ['R1'])
+        self.assertEqual([sale['quantity'] for sale in products[0]['sales']], [1])
+        self.assertEqual([product['product_code'] for product in users[other.pk]['products']], ['O1'])
+
+    def test_move_shop(self):
+        product_id = self.create_product_via_api('R1')
+        sale = self.sell(product_id)
+
+        copied = move_shop(self.user, 'default', grace=0)
+
+        self.assertEqual(copied['Sale'], 1)
+        self.assertEqual(shard_for(self.user.pk), ('default', False))
+        self.assertTrue(Sale.objects.using('default').filter(pk=sale['id']).exists())
+        self.assertFalse(Sale.objects.using(self.shard).filter(sold_by_id=self.user.pk).exists())
+        # Ids and invoice numbers survive the move.
+        response = self.client.get(f"/api/sales/{sale['id']}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['invoice_number'], 'INV1-00001')
+        self.assertEqual(response.data['items'][0]['product'], product_id)
+
+    def test_move_refuses_clashing_rows(self):
+        self.create_product_via_api('R1')
+        other = self.create_shop_on('default')
+        self.authenticate(other)
+        self.create_product_via_api('R1')
+
+        with self.assertRaises(ShardMoveError):
+            move_shop(self.user, 'default', grace=0)
+        self.assertEqual(shard_for(self.user.pk), (self.shard, False))
+        self.assertTrue(Product.objects.using(self.shard).filter(created_by_id=self.user.pk).exists())
+
+    def test_writes_wait_while_moving(self):
+        product_id = self.create_product_via_api('R1')
+        set_shop_database(self.user, self.shard, moving=True)
+
+        response = self.client.post('/api/sales/', {'items': [{'product': product_id, 'quantity': 1, 'sale_price': '1'}]}, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.client.get('/api/products/').status_code, 200)
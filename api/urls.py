@@ -1,5 +1,6 @@
 from django.urls import path,include
 from .views import *
+from . import async_views
 from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
@@ -22,6 +23,8 @@ router.register(r'users-list', UserViewSetDetail, basename='users-sales')
 
 router.register(r'tickets', TicketViewSet, basename='ticket')
 
+router.register(r'hsn-codes', HsnCodeViewSet, basename='hsn-code')
+
 
 urlpatterns = [
     path('register/',RegisterView.as_view(),name='register'),
@@ -35,4 +38,19 @@ urlpatterns = [
     path('forgot-password/', ForgotPasswordView.as_view(), name='forgot-password'),
 
     path('check-email/', CheckEmailView.as_view(), name='check-email'),
+
+    path('check-subscription/', CheckSubscriptionStatusAPIView.as_view(), name='check-subscription'),
+
+    path('batch/', BatchView.as_view(), name='batch'),
+
+    path('reports/gstr1/', GstReturnView.as_view(), name='gstr1-report'),
+
+    path('reports/inventory-valuation/', InventoryValuationView.as_view(), name='inventory-valuation'),
+
+    # Async fast path (ASGI only pays off for these; see gunicorn.conf.py).
+    path('async/products/lookup/', async_views.product_lookup, name='async-product-lookup'),
+    path('async/sales/<int:pk>/', async_views.sale_detail, name='async-sale-detail'),
+    path('async/sales/live/', async_views.sales_feed, name='async-sales-feed'),
+    path('async/subscription/', async_views.subscription_status, name='async-subscription-status'),
+    path('async/dashboard/', async_views.dashboard, name='async-dashboard'),
 ]
\ No newline at end of file
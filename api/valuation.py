@@ -0,0 +1,144 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+import pandas as pd
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from .models import Product, SaleItem, SaleItemArchive
+from .tax import TWO_PLACES
+
+
+PRODUCT_COLUMNS = ['id', 'product_code', 'product_name', 'category', 'purchase_price', 'selling_price', 'stock_quantity']
+SALE_COLUMNS = ['product_id', 'sale__sale_date', 'quantity', 'taxable_amount']
+
+# Cumulative revenue share that closes the A and B classes.
+ABC_THRESHOLDS = (0.80, 0.95)
+
+PERIOD_FREQUENCIES = {'day': 'D', 'week': 'W', 'month': 'M'}
+
+# Returned as 2-place decimal strings, like money everywhere else in the API;
+# percentages and counts stay numbers.
+MONEY_COLUMNS = frozenset({
+    'purchase_price', 'selling_price', 'stock_value_cost', 'stock_value_retail', 'unit_margin',
+    'revenue', 'cost', 'gross_margin',
+})
+
+
+def _frame(queryset, columns, money_columns):
+    # Money columns are cast to REAL in SQL: building a Decimal per cell only
+    # to turn it into a float again costs more than the query itself.
+    queryset = queryset.annotate(**{f'{column}_float': Cast(column, FloatField()) for column in money_columns})
+    fetched = [f'{column}_float' if column in money_columns else column for column in columns]
+    return pd.DataFrame.from_records(list(queryset.values_list(*fetched)), columns=columns)
+
+
+def load_products(user):
+    products = _frame(Product.objects.filter(created_by=user), PRODUCT_COLUMNS, ['purchase_price', 'selling_price'])
+    products['stock_quantity'] = products['stock_quantity'].astype(np.int64)
+    products['category'] = products['category'].fillna('Uncategorised')
+    return products
+
+
+def load_sales(user, start, end):
+    # Archived lines too, so periods past the archive horizon still add up.
+    frames = [
+        _frame(
+            model.objects.filter(sale__sold_by=user, sale__sale_date__gte=start, sale__sale_date__lt=end),
+            SALE_COLUMNS, ['taxable_amount'],
+        )
+        for model in (SaleItemArchive, SaleItem)
+    ]
+    sales = pd.concat([frame for frame in frames if not frame.empty] or frames[:1], ignore_index=True)
+    sales['sale__sale_date'] = pd.to_datetime(sales['sale__sale_date'], utc=True)
+    return sales
+
+
+def abc_classes(revenue):
+    """
+    Label each product A/B/C by its place in cumulative revenue (Pareto).
+
+    A product belongs to the class in which its revenue starts, so the item
+    that crosses the 80% line is still an A. Products with no revenue are C.
+    """
+    values = revenue.to_numpy()
+    classes = np.full(len(values), 'C', dtype=object)
+    total = values.sum()
+    if total <= 0:
+        return classes
+
+    order = np.argsort(-values, kind='stable')
+    ranked = values[order]
+    share_before = (np.cumsum(ranked) - ranked) / total
+    labels = np.select([share_before < ABC_THRESHOLDS[0], share_before < ABC_THRESHOLDS[1]], ['A', 'B'], 'C').astype(object)
+    labels[ranked <= 0] = 'C'
+    classes[order] = labels
+    return classes
+
+
+def _money(value):
+    # Computed in floats (numpy ints when a column is all zeros); quantized
+    # once, on the way out, from the shortest repr so 2.675 stays 2.675.
+    amount = Decimal(str(float(value))).quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
+    return str(amount if amount else amount.copy_abs())
+
+
+def _records(frame):
+    frame = frame.round(2)
+    for column in MONEY_COLUMNS.intersection(frame.columns):
+        frame[column] = frame[column].map(_money)
+    return frame.to_dict(orient='records')
+
+
+def inventory_valuation(user, start, end, period='month', limit=100, abc=None):
+    """
+    Stock value, margins and ABC classes for one shop.
+
+    Products and sale lines are each fetched with a single values_list()
+    query into pandas columns; every figure after that is a vectorized
+    column operation or groupby, so cost grows with rows fetched rather than
+    with Python-level loops.
+    """
+    products = load_products(user)
+    sales = load_sales(user, start, end)
+
+    products['stock_value_cost'] = products['purchase_price'] * products['stock_quantity']
+    products['stock_value_retail'] = products['selling_price'] * products['stock_quantity']
+    products['unit_margin'] = products['selling_price'] - products['purchase_price']
+    products['unit_margin_pct'] = np.where(
+        products['selling_price'] > 0, products['unit_margin'] / products['selling_price'] * 100, 0.0
+    )
+
+    purchase_price = products.set_index('id')['purchase_price']
+    sales['cost'] = sales['quantity'] * sales['product_id'].map(purchase_price).fillna(0).to_numpy()
+    sales['gross_margin'] = sales['taxable_amount'] - sales['cost']
+
+    per_product = sales.groupby('product_id')[['quantity', 'taxable_amount', 'cost', 'gross_margin']].sum()
+    products = products.join(per_product, on='id')
+    products[['quantity', 'taxable_amount', 'cost', 'gross_margin']] = products[['quantity', 'taxable_amount', 'cost', 'gross_margin']].fillna(0)
+    products = products.rename(columns={'quantity': 'units_sold', 'taxable_amount': 'revenue'})
+    products['abc_class'] = abc_classes(products['revenue'])
+
+    categories = products.groupby('category')[
+        ['stock_value_cost', 'stock_value_retail', 'revenue', 'cost', 'gross_margin']
+    ].sum().reset_index()
+    categories['margin_pct'] = np.where(categories['revenue'] > 0, categories['gross_margin'] / categories['revenue'] * 100, 0.0)
+
+    sales['period'] = sales['sale__sale_date'].dt.tz_localize(None).dt.to_period(PERIOD_FREQUENCIES[period]).astype(str)
+    periods = sales.groupby('period')[['taxable_amount', 'cost', 'gross_margin']].sum().reset_index()
+    periods = periods.rename(columns={'taxable_amount': 'revenue'})
+
+    totals = products[['stock_value_cost', 'stock_value_retail', 'revenue', 'cost', 'gross_margin']].sum()
+    abc_summary = products.groupby('abc_class').agg(products=('id', 'size'), revenue=('revenue', 'sum'))
+
+    listed = products if abc is None else products[products['abc_class'] == abc]
+    listed = listed.sort_values(['revenue', 'stock_value_cost'], ascending=False).head(limit)
+
+    return {
+        'totals': {key: _money(value) for key, value in totals.items()},
+        'product_count': int(len(products)),
+        'abc': {label: {'products': int(row['products']), 'revenue': _money(row['revenue'])} for label, row in abc_summary.iterrows()},
+        'categories': _records(categories),
+        'periods': _records(periods),
+        'products': _records(listed.drop(columns=['cost'])),
+    }
@@ -14,10 +14,44 @@ from rest_framework import viewsets, filters, permissions
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
 from django.core.files.base import ContentFile
+from asgiref.sync import sync_to_async
+import base64
+import contextvars
+from itertools import groupby
+from operator import itemgetter
+import gzip
+import json
 import time
 import os
-from django.db import transaction
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Max, Value
+from django.db.models.functions import Greatest, Round
 from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from .archive import ARCHIVE_READ_ACTIONS, archived_sale
+from .batch import run_batch
+from .catalog import WatermarkExpired, build_snapshot, catalog_changes, catalog_version, record_tombstone
+from .conditional import ConditionalGetMixin, conditional_response
+from .customers import typeahead as customer_typeahead
+from .events import await_publish, broker, print_channel, wait_for_publish
+from .expiry import annotate_days_to_expiry, get_expiry_digest
+from .filters import SaleFilter
+from .hsn import propagate_hsn_rate
+from .inventory import set_stock_levels
+from .listings import (
+    CUSTOMER_COLUMNS, PRODUCT_COLUMNS, SALE_COLUMNS, ValuesListMixin, customer_rows, product_rows, sale_rows,
+)
+from .live import announce_sales, sales_after
+from .profile_cache import bill_settings_for_request, get_shop_profile, invoice_shop_details, profile_for_request
+from .receipts import get_layout, parse_receipt_width, prints_automatically, queue_receipts, render_escpos_receipt, render_text_receipt
+from .renderers import CSVRenderer, EscPosRenderer, EventStreamRenderer, OrjsonRenderer, PlainTextRenderer
+from .replicas import ReplicaReadMixin
+from .reports import SECTIONS as REPORT_SECTIONS, month_bounds, stream_csv, stream_json
+from .routers import bind_database, served_async, shop_db, streaming_body
+from .sales import record_sales
+from .valuation import PERIOD_FREQUENCIES, inventory_valuation
 
 User = get_user_model()
 
@@ -97,6 +131,23 @@ class UserViewSet(ModelViewSet):
     def get_object(self):
         return self.request.user
 
+    def profile_response(self, request, many=False):
+        # Reads come from the cached shop profile snapshot; the ETag is the
+        # profile version, so an unchanged profile costs no queries at all.
+        def render():
+            profile = profile_for_request(request, get_shop_profile(request.user))
+            return Response([profile] if many else profile)
+
+        return conditional_response(
+            request, render, etag=f"profile:{request.user.id}:{request.user.profile_version}"
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.profile_response(request, many=True)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.profile_response(request)
+
     def get_queryset(self):
         return User.objects.filter(id=self.request.user.id)
 
@@ -116,13 +167,16 @@ class UserViewSet(ModelViewSet):
         self.perform_update(serializer)
         return Response(serializer.data)
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ReplicaReadMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    list_columns = PRODUCT_COLUMNS
+    list_rows = staticmethod(product_rows)
     permission_classes = [IsAuthenticated]
+    replica_actions = ('list', 'retrieve', 'reorder_suggestions', 'low_stock')
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ['product_name', 'product_code', 'barcode']
-    filterset_fields = ['category', 'unit', 'is_active']
+    filterset_fields = ['category', 'unit', 'is_active', 'barcode']
 
 
     def get_queryset(self):
@@ -140,7 +194,24 @@ class ProductViewSet(viewsets.ModelViewSet):
             next_week = today + timedelta(days=7)
             queryset = queryset.filter(expiry_date__range=(today, next_week))
 
-        return queryset
+        return annotate_days_to_expiry(queryset, today)
+
+    # days_to_expiry changes at midnight, so the date is part of both ETags.
+    def get_list_validators(self):
+        count, latest, last_delete = catalog_version(self.request.user)
+        last_modified = max(filter(None, [latest, last_delete]), default=None)
+        return f"products:{count}:{latest}:{last_delete}:{date.today()}", last_modified
+
+    def get_object_validators(self):
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            updated_at = Product.objects.filter(pk=pk, created_by=self.request.user).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError):
+            # Not a valid pk: no validators, get_object() answers 404.
+            return None, None
+        if updated_at is None:
+            return None, None
+        return f"product:{pk}:{updated_at}:{date.today()}", updated_at
 
 
     def perform_create(self, serializer):
@@ -149,13 +220,178 @@ class ProductViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save(updated_by=self.request.user)
 
-class CustomerViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        with transaction.atomic(using=shop_db()):
+            record_tombstone(instance)
+            instance.delete()
+
+    @action(detail=False, methods=['get'], url_path='catalog/snapshot')
+    def catalog_snapshot(self, request):
+        snapshot = build_snapshot(request.user)
+        if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            response = HttpResponse(snapshot, content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(gzip.decompress(snapshot), content_type='application/json')
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+    @action(detail=False, methods=['get'], url_path='catalog/changes')
+    def catalog_changes(self, request):
+        try:
+            since = parse_datetime(request.query_params.get('since', ''))
+        except ValueError:
+            # Well formed but out of range, e.g. month 13.
+            since = None
+        if since is None:
+            return Response({'error': 'A valid since watermark is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+
+        try:
+            payload = catalog_changes(request.user, since)
+        except WatermarkExpired:
+            return Response(
+                {'error': 'Watermark is too old, download the catalog snapshot again'},
+                status=status.HTTP_410_GONE
+            )
+        return HttpResponse(payload, content_type='application/json')
+
+    @action(detail=False, methods=['post'], url_path='bulk-price')
+    def bulk_price(self, request):
+        serializer = BulkPriceUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        queryset = Product.objects.filter(created_by=request.user)
+        if 'category' in data:
+            queryset = queryset.filter(category=data['category'])
+        if 'ids' in data:
+            queryset = queryset.filter(id__in=data['ids'])
+        if 'product_codes' in data:
+            queryset = queryset.filter(product_code__in=data['product_codes'])
+
+        field = data['field']
+        value = data['value']
+        if data['operation'] == 'percent':
+            new_price = F(field) * (Decimal('1') + value / Decimal('100'))
+        elif data['operation'] == 'amount':
+            new_price = F(field) + value
+        else:
+            new_price = Value(value)
+        new_price = Round(Greatest(new_price, Value(Decimal('0'))), 2, output_field=DecimalField(max_digits=10, decimal_places=2))
+
+        # One UPDATE ... SET price = f(price) instead of a save() per product.
+        with transaction.atomic(using=shop_db()):
+            updated = queryset.update(**{field: new_price, 'updated_at': timezone.now()})
+
+        return Response({'updated_count': updated})
+
+    @action(detail=False, methods=['post'], url_path='bulk-stock')
+    def bulk_stock(self, request):
+        serializer = BulkStockUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        quantities = {}
+        for item in data['items']:
+            if data['mode'] == 'adjust':
+                quantities[item['product_code']] = quantities.get(item['product_code'], 0) + item['quantity']
+            else:
+                quantities[item['product_code']] = item['quantity']
+
+        with transaction.atomic(using=shop_db()):
+            updated, missing, rejected = set_stock_levels(request.user, quantities, mode=data['mode'])
+
+        return Response({
+            'updated_count': len(updated),
+            'missing_codes': missing,
+            'rejected_codes': rejected,
+        })
+
+    @action(detail=False, methods=['get'], url_path='reorder-suggestions')
+    def reorder_suggestions(self, request):
+        """
+        Precomputed reorder points (see forecast_demand). Only products at or
+        below their reorder point are listed unless ?all=true.
+        """
+        suggestions = (
+            ReorderSuggestion.objects.filter(user=request.user, product__is_active=True)
+            .annotate(suggested_quantity=Greatest(F('order_up_to') - F('product__stock_quantity'), Value(0)))
+        )
+        if request.query_params.get('all', '').lower() not in ('1', 'true'):
+            suggestions = suggestions.filter(product__stock_quantity__lte=F('reorder_point'), suggested_quantity__gt=0)
+
+        rows = (
+            suggestions
+            .order_by('-suggested_quantity', 'product_id')
+            .values(
+                'product_id', 'product__product_code', 'product__product_name', 'product__supplier',
+                'product__stock_quantity', 'product__min_stock_level', 'daily_demand', 'safety_stock',
+                'reorder_point', 'order_up_to', 'suggested_quantity', 'computed_at',
+            )
+        )
+        return Response([
+            {key.replace('product__', ''): value for key, value in row.items()}
+            for row in rows
+        ])
+
+    @action(detail=False, methods=['get'], url_path='expiry-digest')
+    def expiry_digest(self, request):
+        """
+        Counts and product ids per expiry window, precomputed nightly by
+        build_expiry_digest. ?refresh=true rebuilds the shop's digest now.
+        """
+        refresh = request.query_params.get('refresh', '').lower() in ('1', 'true')
+        digest = get_expiry_digest(request.user, refresh=refresh)
+        return Response({
+            'as_of': digest.as_of,
+            'computed_at': digest.computed_at,
+            'buckets': digest.buckets,
+        })
+
+    @action(detail=False, methods=['get'], url_path='low-stock')
+    def low_stock(self, request):
+        """
+        Products below min_stock_level, read from the maintained queue rather
+        than by scanning the catalog. ?digest=supplier groups them per supplier.
+        """
+        digest = request.query_params.get('digest')
+        if digest not in (None, 'supplier'):
+            return Response({'error': 'digest must be supplier'}, status=status.HTTP_400_BAD_REQUEST)
+
+        entries = LowStockEntry.objects.filter(user=request.user)
+        ordering = ('supplier', '-shortfall', 'product_id') if digest else ('-shortfall', 'product_id')
+        rows = [
+            {key.replace('product__', ''): value for key, value in row.items()}
+            for row in entries.order_by(*ordering).values(
+                'product_id', 'product__product_code', 'product__product_name', 'supplier',
+                'stock_quantity', 'min_stock_level', 'shortfall', 'flagged_at',
+            )
+        ]
+        if not digest:
+            return Response(rows)
+
+        return Response([
+            {
+                'supplier': supplier,
+                'product_count': len(products),
+                'total_shortfall': sum(product['shortfall'] for product in products),
+                'products': products,
+            }
+            for supplier, products in ((supplier, list(group)) for supplier, group in groupby(rows, key=itemgetter('supplier')))
+        ])
+
+class CustomerViewSet(ReplicaReadMixin, ValuesListMixin, viewsets.ModelViewSet):
     serializer_class = CustomerSerializer
+    list_columns = CUSTOMER_COLUMNS
+    list_rows = staticmethod(customer_rows)
     permission_classes = [IsAuthenticated]
+    replica_actions = ('list', 'retrieve', 'sales')
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     search_fields = ['name', 'phone', 'email', 'city']
     filterset_fields = ['customerType', 'status', 'country']
-    ordering_fields = ['name', 'created_at', 'updated_at']
+    ordering_fields = ['name', 'created_at', 'updated_at', 'visit_count', 'lifetime_value', 'last_purchase_at']
     ordering = ['-created_at']
 
     def get_queryset(self):
@@ -180,6 +416,19 @@ class CustomerViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(customer)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def typeahead(self, request):
+        return Response(customer_typeahead(request.user, request.query_params.get('q', '')))
+
+    @action(detail=True, methods=['get'])
+    def sales(self, request, pk=None):
+        customer = self.get_object()
+        paginator = StandardResultsSetPagination()
+        page = paginator.paginate_queryset(
+            customer.sales.prefetch_related('items').order_by('-sale_date'), request, view=self
+        )
+        return paginator.get_paginated_response(SaleSerializer(page, many=True).data)
+
     @action(detail=True, methods=['post'], serializer_class=CustomerStatusSerializer)
     def set_status(self, request, pk=None):
         customer = self.get_object()
@@ -247,18 +496,50 @@ class BillSettingsViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get', 'put', 'patch'])
     def mine(self, request):
-        instance, created = BillSettings.objects.get_or_create(user=request.user)
-        
         if request.method == 'GET':
-            serializer = self.get_serializer(instance)
-            return Response(serializer.data)
-        
-        elif request.method in ['PUT', 'PATCH']:
+            def render():
+                snapshot = get_shop_profile(request.user)
+                if snapshot['bill_settings'] is not None:
+                    return Response(bill_settings_for_request(request, snapshot))
+                instance, created = BillSettings.objects.get_or_create(user=request.user)
+                return Response(self.get_serializer(instance).data)
+
+            return conditional_response(
+                request, render, etag=f"bill-settings:{request.user.id}:{request.user.profile_version}"
+            )
+
+        instance, created = BillSettings.objects.get_or_create(user=request.user)
+        if request.method in ['PUT', 'PATCH']:
             serializer = self.get_serializer(instance, data=request.data, partial=request.method == 'PATCH')
             serializer.is_valid(raise_exception=True)
             serializer.save()
             return Response(serializer.data)
 
+class HsnCodeViewSet(viewsets.ModelViewSet):
+    queryset = HsnCode.objects.all()
+    serializer_class = HsnCodeSerializer
+    filter_backends = [SearchFilter, DjangoFilterBackend]
+    search_fields = ['code', 'description']
+    filterset_fields = ['kind']
+    lookup_field = 'code'
+
+    def get_permissions(self):
+        if self.action in ['list', 'retrieve']:
+            return [IsAuthenticated()]
+        return [IsAuthenticated(), permissions.IsAdminUser()]
+
+    def perform_update(self, serializer):
+        previous_rate = serializer.instance.tax_rate
+        with transaction.atomic():
+            hsn = serializer.save()
+            if hsn.tax_rate != previous_rate:
+                propagate_hsn_rate(hsn)
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            propagate_hsn_rate(serializer.save())
+
+
 class DataBackupViewSet(viewsets.ModelViewSet):
     queryset = DataBackup.objects.filter(is_active=True)
     serializer_class = DataBackupSerializer
@@ -383,15 +664,22 @@ from xhtml2pdf import pisa
 from rest_framework.pagination import PageNumberPagination
 
 
+# Seconds between comment frames on idle event streams, so proxies keep them open.
+PRINT_QUEUE_KEEPALIVE = 15
+
+
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class SaleViewSet(viewsets.ModelViewSet):
+class SaleViewSet(ReplicaReadMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Sale.objects.all().order_by('-sale_date')
     serializer_class = SaleSerializer
+    list_columns = SALE_COLUMNS
+    list_rows = staticmethod(sale_rows)
     permission_classes = [IsAuthenticated]
+    replica_actions = ('list', 'retrieve', 'sale_pdf')
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     pagination_class = StandardResultsSetPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -402,43 +690,241 @@ class SaleViewSet(viewsets.ModelViewSet):
         'invoice_number',
     ]
 
-    filterset_fields = {
-        'sale_date': ['date__gte', 'date__lte'],
-        'total_amount': ['gte', 'lte'],
-    }
+    filterset_class = SaleFilter
     
-    def perform_create(self, serializer):
-        serializer.save(sold_by=self.request.user)
-
     def get_queryset(self):
         return Sale.objects.filter(sold_by=self.request.user)
 
-    
+    def get_object(self):
+        # Archived sales stay readable (detail, PDF, receipt) but not editable.
+        try:
+            return super().get_object()
+        except Http404:
+            if self.action not in ARCHIVE_READ_ACTIONS:
+                raise
+            try:
+                sale = archived_sale(self.request.user, self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+            except (TypeError, ValueError):
+                sale = None
+            if sale is None:
+                raise
+            return sale
+
+    def get_list_validators(self):
+        stats = Sale.objects.filter(sold_by=self.request.user).aggregate(count=Count('id'), latest=Max('updated_at'))
+        return f"sales:{stats['count']}:{stats['latest']}", stats['latest']
+
+    def get_object_validators(self):
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            updated_at = Sale.objects.filter(pk=pk, sold_by=self.request.user).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError):
+            # Not a valid pk: no validators, get_object() answers 404.
+            return None, None
+        if updated_at is None:
+            return None, None
+        return f"sale:{pk}:{updated_at}", updated_at
+
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """
+        Upload a batch of offline sales in one round trip.
+
+        Every sale carries a client-generated idempotency_key; keys already
+        seen for this shop are reported as duplicates instead of creating a
+        second invoice. New sales are written together in one transaction.
+        Sales beyond the stock on hand are still recorded (stock stops at
+        zero); the shortfall is listed under ``oversold``.
+        """
+        batch = SaleSyncSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+
+        # Each entry is validated on its own, so one bad sale does not hold
+        # back the rest and only validated keys reach the lookups below.
+        entries = []
+        for entry in batch.validated_data['sales']:
+            serializer = SyncSaleSerializer(data=entry)
+            if serializer.is_valid():
+                entries.append((serializer.validated_data['idempotency_key'], dict(serializer.validated_data), None))
+            else:
+                entries.append((entry.get('idempotency_key'), None, serializer.errors))
+
+        keys = [key for key, data, _ in entries if data is not None]
+        existing = dict(
+            SaleSyncKey.objects.filter(user=request.user, idempotency_key__in=keys)
+            .values_list('idempotency_key', 'sale__invoice_number')
+        )
+        product_ids = {item['product'] for _, data, _ in entries if data is not None for item in data['items']}
+        products = Product.objects.filter(created_by=request.user, id__in=product_ids).in_bulk()
+
+        results = []
+        pending = []
+        repeated = []
+        seen = set()
+        for key, data, errors in entries:
+            if errors is not None:
+                results.append({'idempotency_key': key, 'status': 'error', 'errors': errors})
+                continue
+
+            if key in existing or key in seen:
+                result = {'idempotency_key': key, 'status': 'duplicate', 'invoice_number': existing.get(key)}
+                results.append(result)
+                if key in seen:
+                    repeated.append(result)
+                continue
+
+            missing = [item['product'] for item in data['items'] if item['product'] not in products]
+            if missing:
+                results.append({'idempotency_key': key, 'status': 'error', 'errors': {'items': f'Unknown products: {missing}'}})
+                continue
+
+            data['items'] = [{'product': products[item['product']], 'quantity': item['quantity']} for item in data['items']]
+            data.pop('idempotency_key')
+            seen.add(key)
+            result = {'idempotency_key': key, 'status': 'created'}
+            results.append(result)
+            pending.append((key, data, result))
+
+        oversold = []
+        if pending:
+            try:
+                with transaction.atomic(using=shop_db()):
+                    # These sales already happened at the counter: record them
+                    # even past the stock on hand, and report the shortfall.
+                    sales, oversold = record_sales(
+                        request.user, [data for _, data, _ in pending], allow_oversell=True,
+                    )
+                    SaleSyncKey.objects.bulk_create([
+                        SaleSyncKey(user=request.user, idempotency_key=key, sale=sale)
+                        for (key, _, _), sale in zip(pending, sales)
+                    ])
+            except IntegrityError:
+                # Another upload of the same keys won the race; retrying reports them as duplicates.
+                return Response({'error': 'Sync conflict, please retry.'}, status=status.HTTP_409_CONFLICT)
+
+            invoices = {}
+            queue_receipts(request.user, sales)
+            announce_sales(request.user, sales)
+            for (key, _, result), sale in zip(pending, sales):
+                result.update({'sale_id': sale.id, 'invoice_number': sale.invoice_number})
+                invoices[key] = sale.invoice_number
+            for result in repeated:
+                result['invoice_number'] = invoices[result['idempotency_key']]
+
+        created_count = len(pending)
+        response = {
+            'created_count': created_count,
+            'duplicate_count': sum(1 for result in results if result['status'] == 'duplicate'),
+            'error_count': sum(1 for result in results if result['status'] == 'error'),
+            'results': results,
+            'oversold': oversold,
+        }
+        if response['error_count']:
+            return Response(response, status=status.HTTP_207_MULTI_STATUS)
+        return Response(response, status=status.HTTP_201_CREATED if created_count else status.HTTP_200_OK)
+
+
+    def perform_create(self, serializer):
+        sale = serializer.save(sold_by=self.request.user)
+        queue_receipts(self.request.user, [sale])
+        announce_sales(self.request.user, [sale])
+
+    @action(detail=True, methods=['get'], renderer_classes=[PlainTextRenderer, EscPosRenderer])
+    def receipt(self, request, pk=None):
+        sale = self.get_object()
+        width = parse_receipt_width(request.query_params.get('width'))
+        layout = get_layout(request.user, width)
+        if request.accepted_renderer.format == 'escpos':
+            return Response(render_escpos_receipt(sale, layout))
+        return Response(render_text_receipt(sale, layout))
+
+    @action(detail=False, methods=['get'], url_path='print-queue', renderer_classes=[EventStreamRenderer])
+    def print_queue(self, request):
+        """
+        Server-sent event stream of receipts for a local print agent.
+
+        Each sale made while the shop prints automatically is pushed as an
+        ESC/POS receipt (base64). Sales are read from the database, woken
+        early by queue_receipts in this process, so sales made on other
+        worker processes are printed too. Under ASGI the stream waits on the
+        event loop, so an idle agent holds no thread; under WSGI it keeps a
+        worker thread, as before.
+        """
+        width = parse_receipt_width(request.query_params.get('width'))
+        user = request.user
+        channel = print_channel(user.id)
+
+        def last_sale_id():
+            return sales_after(user).values_list('id', flat=True).last() or 0
+
+        def receipt_events(last_id):
+            # (new last id, events): every new sale moves the stream on, but
+            # receipts are only sent while the shop prints automatically.
+            sales = list(sales_after(user, last_id))
+            if not sales or not prints_automatically(user):
+                return (sales[-1].id if sales else last_id), ''
+            layout = get_layout(user, width)
+            events = []
+            for sale in sales:
+                payload = json.dumps({
+                    'sale_id': sale.id,
+                    'invoice_number': sale.invoice_number,
+                    'escpos': base64.b64encode(render_escpos_receipt(sale, layout)).decode(),
+                })
+                events.append(f"id: {sale.id}\nevent: receipt\ndata: {payload}\n\n")
+            return sales[-1].id, ''.join(events)
+
+        def stream():
+            subscriber = broker.subscribe(channel)
+            try:
+                last_id = last_sale_id()
+                yield 'retry: 3000\n\n'
+                sent_at = time.monotonic()
+                while True:
+                    wait_for_publish(subscriber)
+                    last_id, events = receipt_events(last_id)
+                    if events:
+                        yield events
+                    elif time.monotonic() - sent_at >= PRINT_QUEUE_KEEPALIVE:
+                        yield ': keepalive\n\n'
+                    else:
+                        continue
+                    sent_at = time.monotonic()
+            finally:
+                broker.unsubscribe(channel, subscriber)
+
+        # Reading and rendering use the shop's database: run them in this request's context.
+        render = sync_to_async(contextvars.copy_context().run)
+
+        async def astream():
+            subscriber = broker.subscribe_async(channel)
+            try:
+                last_id = await render(last_sale_id)
+                yield 'retry: 3000\n\n'
+                sent_at = time.monotonic()
+                while True:
+                    await await_publish(subscriber)
+                    last_id, events = await render(receipt_events, last_id)
+                    if events:
+                        yield events
+                    elif time.monotonic() - sent_at >= PRINT_QUEUE_KEEPALIVE:
+                        yield ': keepalive\n\n'
+                    else:
+                        continue
+                    sent_at = time.monotonic()
+            finally:
+                broker.unsubscribe(channel, subscriber)
+
+        body = astream() if served_async(request) else bind_database(stream())
+        response = StreamingHttpResponse(body, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
     @action(detail=True, methods=['get'])
     def sale_pdf(self, request, pk=None):
         sale = self.get_object()
-        user = request.user  # The logged-in user
-
-        # Get bank details if available
-        bank_details = getattr(user, 'bank_details', None)
-
-        # Get terms & conditions if available
-        terms = user.terms.order_by('order').values_list('term', flat=True)
-
-        shop_details = {
-            'shop_name': user.shop_name,
-            'address': user.address or '',
-            'phone': user.phone,
-            'email': user.email,
-            'gst_number': user.gst_number or '',
-            'upi_id': user.upi_id or '',
-            'signature': user.signature.url if user.signature else None,
-            'bank_name': bank_details.bank_name if bank_details else '',
-            'account_number': bank_details.account_number if bank_details else '',
-            'ifsc_code': bank_details.ifsc_code if bank_details else '',
-            'branch': bank_details.branch if bank_details else '',
-            'terms': list(terms),  # Pass as list so template can loop
-        }
+        shop_details = invoice_shop_details(get_shop_profile(request.user))
 
         context = {
             'sale': sale,
@@ -506,10 +992,11 @@ class TicketViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class UserViewSetDetail(viewsets.ReadOnlyModelViewSet):
+class UserViewSetDetail(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserProductsWithSalesSerializer
     permission_classes = [permissions.IsAuthenticated]
+    replica_actions = ('list', 'retrieve', 'details')
 
     @action(detail=True, methods=['get'])
     def details(self, request, pk=None):
@@ -551,6 +1038,7 @@ class ProductImportView(APIView):
                 'stock_quantity': 'stock_quantity',
                 'min_stock_level': 'min_stock_level',
                 'barcode': 'barcode',
+                'hsn_code': 'hsn_code',
                 'tax_rate': 'tax_rate',
                 'discount': 'discount',
                 'expiry_date': 'expiry_date',
@@ -663,3 +1151,107 @@ class CheckSubscriptionStatusAPIView(APIView):
             "end_date": latest.end_date,
             "status": latest.status
         })
+
+
+
+class BatchView(APIView):
+    """
+    Several GET requests in one round trip, e.g. everything the POS loads at
+    startup: {"requests": [{"path": "/api/user/"}, ...]}. The caller is
+    authenticated once and the reads run concurrently; the response holds
+    one {status, body} per request, in order.
+    """
+    permission_classes = [IsAuthenticated]
+    reads_only = True
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'responses': run_batch(request, serializer.validated_data['requests'])})
+
+
+
+class GstReturnView(ReplicaReadMixin, APIView):
+    """
+    GSTR-1 style return for one month: B2B invoices, B2C (small) summary and
+    a rate-wise summary, aggregated in the database and streamed as JSON or
+    CSV (?format=csv, one section at a time).
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [OrjsonRenderer, CSVRenderer]
+    replica_actions = ('get',)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # CSV is only ever streamed; errors are JSON whichever format was asked for.
+        if isinstance(response, Response) and response.accepted_renderer.format == 'csv':
+            response.accepted_renderer = OrjsonRenderer()
+            response.accepted_media_type = OrjsonRenderer.media_type
+        return response
+
+    def get(self, request):
+        try:
+            start, end = month_bounds(request.query_params.get('month', ''))
+        except ValueError:
+            return Response({'error': 'month must be given as YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+
+        section = request.query_params.get('section')
+        if section is not None and section not in REPORT_SECTIONS:
+            return Response(
+                {'error': f"section must be one of {', '.join(REPORT_SECTIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if request.accepted_renderer.format == 'csv':
+            section = section or 'b2b'
+            response = StreamingHttpResponse(streaming_body(request, stream_csv(request.user, section, start, end)), content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="gstr1_{start:%Y_%m}_{section}.csv"'
+            return response
+
+        sections = [section] if section else list(REPORT_SECTIONS)
+        return StreamingHttpResponse(
+            streaming_body(request, stream_json(request.user, sections, start, end)), content_type='application/json',
+        )
+
+
+
+class InventoryValuationView(ReplicaReadMixin, APIView):
+    """
+    Stock valuation, gross margin per product, category and period, and ABC
+    classes for the shop. Defaults to the last 30 days of sales.
+    """
+    permission_classes = [IsAuthenticated]
+    replica_actions = ('get',)
+
+    def get(self, request):
+        bounds = {}
+        for name in ('from', 'to'):
+            value = request.query_params.get(name)
+            if not value:
+                continue
+            try:
+                bounds[name] = parse_datetime(value)
+            except ValueError:
+                bounds[name] = None
+            if bounds[name] is None:
+                return Response(
+                    {'error': f'{name} must be an ISO 8601 date or date and time, e.g. 2025-04-01 or 2025-04-01T09:30:00'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        end = bounds.get('to') or timezone.now()
+        start = bounds.get('from') or end - timedelta(days=30)
+        start, end = (value if timezone.is_aware(value) else timezone.make_aware(value) for value in (start, end))
+
+        period = request.query_params.get('period', 'month')
+        if period not in PERIOD_FREQUENCIES:
+            return Response({'error': 'period must be day, week or month'}, status=status.HTTP_400_BAD_REQUEST)
+        abc = request.query_params.get('abc')
+        if abc is not None and abc not in ('A', 'B', 'C'):
+            return Response({'error': 'abc must be A, B or C'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # head(-n) would drop the last n rows instead.
+            limit = max(1, min(int(request.query_params.get('limit', 100)), 1000))
+        except ValueError:
+            limit = 100
+
+        return Response(inventory_valuation(request.user, start, end, period=period, limit=limit, abc=abc))
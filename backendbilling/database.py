@@ -0,0 +1,127 @@
+"""
+DATABASES entries built from environment variables.
+
+DB_ENGINE selects the backend: ``sqlite`` (default) or ``postgres``.
+"""
+import os
+
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# single writer, NORMAL sync is safe under WAL and avoids an fsync per
+# commit, and busy_timeout makes a blocked writer wait instead of failing
+# with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+}
+
+# NORMAL sync is only safe under WAL.
+BUNDLED_SQLITE_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+
+def _env(name, default=None):
+    return os.environ.get(name, default)
+
+
+def sqlite_database(path, pragmas=None, conn_max_age=None, read_only=False):
+    pragmas = {**SQLITE_PRAGMAS, **(pragmas or {})}
+    if read_only:
+        pragmas['query_only'] = 'ON'
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        # Keep connections open between requests so the pragmas and page
+        # cache are paid for once per worker rather than per request.
+        'CONN_MAX_AGE': int(_env('DB_CONN_MAX_AGE', 600)) if conn_max_age is None else conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(f"PRAGMA {name}={value}" for name, value in pragmas.items()),
+            # Take the write lock at BEGIN, so a transaction that reads then
+            # writes waits on busy_timeout instead of failing to upgrade.
+            'transaction_mode': 'DEFERRED' if read_only else 'IMMEDIATE',
+            'timeout': 20,
+        },
+    }
+
+
+def postgres_database(name=None, pool=True, host=None):
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': name or _env('DB_NAME', 'billing'),
+        'USER': _env('DB_USER', 'billing'),
+        'PASSWORD': _env('DB_PASSWORD', ''),
+        'HOST': host or _env('DB_HOST', 'localhost'),
+        'PORT': _env('DB_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    if pool:
+        # psycopg's pool owns connection reuse, so Django must not keep them.
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS']['pool'] = {
+            'min_size': int(_env('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(_env('DB_POOL_MAX_SIZE', 20)),
+            'timeout': int(_env('DB_POOL_TIMEOUT', 10)),
+        }
+    else:
+        database['CONN_MAX_AGE'] = int(_env('DB_CONN_MAX_AGE', 600))
+    return database
+
+
+def default_database(base_dir):
+    if _env('DB_ENGINE', 'sqlite') == 'postgres':
+        return postgres_database(pool=_env('DB_POOL', '1') != '0')
+    path = _env('SQLITE_PATH')
+    if path:
+        return sqlite_database(path)
+    # The checkout's db.sqlite3 is committed: WAL would rewrite its header and
+    # leave -wal/-shm files beside it, so it keeps the rollback journal. Set
+    # SQLITE_PATH to a database of your own to run it in WAL mode.
+    return sqlite_database(base_dir / 'db.sqlite3', pragmas=BUNDLED_SQLITE_PRAGMAS)
+
+
+def shard_databases(base_dir, default=''):
+    """
+    Extra aliases that hold shop data, from DB_SHARDS (comma separated),
+    else ``default``.
+    SQLite shards are files in SQLITE_SHARD_DIR; PostgreSQL shards are
+    databases named ``<DB_NAME>_<alias>`` on the same server.
+    """
+    aliases = [alias.strip() for alias in _env('DB_SHARDS', default).split(',') if alias.strip()]
+    if _env('DB_ENGINE', 'sqlite') == 'postgres':
+        name = _env('DB_NAME', 'billing')
+        pool = _env('DB_POOL', '1') != '0'
+        return {alias: postgres_database(name=f"{name}_{alias}", pool=pool) for alias in aliases}
+    shard_dir = _env('SQLITE_SHARD_DIR', base_dir)
+    return {alias: sqlite_database(os.path.join(shard_dir, f"{alias}.sqlite3")) for alias in aliases}
+
+
+def replica_alias(alias):
+    return 'replica' if alias == 'default' else f"{alias}_replica"
+
+
+def replica_databases(databases):
+    """
+    A read replica for every database in ``databases`` when DB_REPLICAS=1.
+    SQLite replicas are copies next to the primary file (``<name>.replica.sqlite3``)
+    refreshed by the sync_replica command; PostgreSQL replicas are the
+    same database names on DB_REPLICA_HOST, kept up by streaming replication.
+    """
+    if _env('DB_REPLICAS', '0') != '1':
+        return {}
+    replicas = {}
+    for alias, database in databases.items():
+        if database['ENGINE'] == 'django.db.backends.sqlite3':
+            root, ext = os.path.splitext(str(database['NAME']))
+            replica = sqlite_database(f"{root}.replica{ext}", read_only=True)
+        else:
+            replica = postgres_database(
+                name=database['NAME'], pool=database['CONN_MAX_AGE'] == 0, host=_env('DB_REPLICA_HOST'),
+            )
+        # Tests read the primary through the replica alias.
+        replica['TEST'] = {'MIRROR': alias}
+        replicas[replica_alias(alias)] = replica
+    return replicas
@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
+
+from .database import default_database, replica_alias, replica_databases, shard_databases
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,13 +51,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'corsheaders.middleware.CorsMiddleware'
+    'corsheaders.middleware.CorsMiddleware',
+    'api.routers.ShopDatabaseMiddleware',
 ]
 
 ROOT_URLCONF = 'backendbilling.urls'
@@ -80,13 +85,32 @@ WSGI_APPLICATION = 'backendbilling.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Configured from the environment, see backendbilling/database.py.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': default_database(BASE_DIR),
 }
 
+# Shop data (products, sales, customers, vendors) can be spread over extra
+# databases; users and the shop -> database map stay on default.
+# See api/routers.py and the move_shop command. Tests always get a shard (in
+# memory, like any SQLite test database) so the routing is exercised;
+# DB_SHARDS overrides it.
+TESTING = sys.argv[1:2] == ['test']
+SHARD_DATABASES = shard_databases(BASE_DIR, default='shard1' if TESTING else '')
+DATABASES.update(SHARD_DATABASES)
+SHARD_ALIASES = list(SHARD_DATABASES)
+
+# Optional read replicas (DB_REPLICAS=1). Read-only list, detail and report
+# endpoints read from them, except for a shop that wrote within the last
+# REPLICA_STICKY_SECONDS, which keeps reading its own writes from the
+# primary. SQLite replicas are refreshed by the sync_replica command.
+REPLICA_DATABASES = replica_databases(DATABASES)
+REPLICA_ALIASES = {alias: replica_alias(alias) for alias in DATABASES if replica_alias(alias) in REPLICA_DATABASES}
+DATABASES.update(REPLICA_DATABASES)
+REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 90))
+
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter', 'api.routers.ShardRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -134,8 +158,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.ShopJWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.OrjsonRenderer',
+        'api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.OrjsonParser',
+        'api.renderers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
@@ -158,3 +193,12 @@ AUTH_USER_MODEL = 'api.User'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+
+# Scheduled jobs, installed with `python manage.py crontab add`.
+CRONJOBS = [
+    ('5 0 * * *', 'django.core.management.call_command', ['build_expiry_digest']),
+    ('30 1 * * *', 'django.core.management.call_command', ['forecast_demand']),
+    ('30 2 * * *', 'django.core.management.call_command', ['archive_sales']),
+]
+if REPLICA_DATABASES:
+    CRONJOBS.append(('* * * * *', 'django.core.management.call_command', ['sync_replica']))
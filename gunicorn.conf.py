@@ -0,0 +1,35 @@
+"""
+Gunicorn serving the ASGI application on uvicorn workers:
+
+    gunicorn -c gunicorn.conf.py
+
+The async endpoints (api.async_views) run on each worker's event loop. The
+DRF views still work, but Django runs every sync view of a worker in one
+shared thread, so slow sync endpoints (PDFs, imports) need enough workers.
+Streaming bodies must be async iterators here (see api.routers.streaming_body
+and the print queue): a sync one is collected whole before the first byte.
+
+Any worker count works for the event streams (the sales feed and the print
+queue): api.events.Broker only wakes streams in its own process, and each
+stream also reads the database every EVENT_POLL_INTERVAL seconds, so a sale
+taken by another worker reaches it within that interval. That is one small
+query per open stream per interval.
+"""
+import multiprocessing
+import os
+
+
+wsgi_app = 'backendbilling.asgi:application'
+worker_class = 'uvicorn_worker.UvicornWorker'
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then so a leak in a long-lived process stays small.
+max_requests = 5000
+max_requests_jitter = 500
+
+accesslog = '-'